@@ -6,10 +6,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from step01_table_detector import detect_and_crop_candidates
-from step02_table_classifier import is_table_image
+from step02_table_classifier import is_table_image, OLLAMA_MODEL
 from step03_table_analyzer import analyze_table_semantic
 
 from step04_table_embedder import embed_tables_for_rag
+from ollama_client import get_client
+from instrumentation import get_metrics
 
 def process_pdf_for_table_rag(pdf_path):
     print("="*50)
@@ -18,31 +20,40 @@ def process_pdf_for_table_rag(pdf_path):
     
     # API Key check removed (Using Local Ollama)
     print("Using Local Vision Model (Ollama)")
+    run = get_metrics()
 
     # 1. Detect Rectangles (Broad candidates)
     print("\n[Step 1] Detecting Candidates (OpenCV)...")
     candidate_dir = "candidates_temp"
-    candidates = detect_and_crop_candidates(pdf_path, output_dir=candidate_dir)
+    with run.stage("step1_detect") as stage:
+        candidates = detect_and_crop_candidates(pdf_path, output_dir=candidate_dir)
+        stage.add("candidates", len(candidates))
     
     if not candidates:
         print("No candidates found.")
         return
 
     print(f"\n[Step 2] Classifying Candidates ({len(candidates)} items)...")
+    # Load the vision model once and keep it resident for Steps 2 and 3
+    with run.stage("vision_model_warmup"):
+        get_client().warmup(OLLAMA_MODEL)
     
     valid_tables = []
     discarded_count = 0
     
     for img_path in candidates:
         # 2. Classify (Vision LLM)
-        is_table = is_table_image(img_path)
+        with run.stage("step2_classify", candidates=1):
+            is_table = is_table_image(img_path)
         
         if is_table:
             print(f"  [ACCEPTED] {os.path.basename(img_path)}")
             valid_tables.append(img_path)
+            run.count("tables_accepted")
         else:
             print(f"  [DISCARDED] {os.path.basename(img_path)}")
             discarded_count += 1
+            run.count("candidates_discarded")
             try:
                 os.remove(img_path)
             except: 
@@ -57,15 +68,20 @@ def process_pdf_for_table_rag(pdf_path):
     
     rag_dir = "final_tables_rag"
     for img_path in valid_tables:
-        analyze_table_semantic(img_path, output_dir=rag_dir)
+        with run.stage("step3_analyze", tables=1):
+            analyze_table_semantic(img_path, output_dir=rag_dir)
         
     # 4. Embed
-    embed_tables_for_rag(tables_dir=rag_dir)
+    with run.stage("step4_embed"):
+        embed_tables_for_rag(tables_dir=rag_dir)
         
+    print(f"\nOllama metrics: {get_client().metrics.summary()}")
+
     print("\n" + "="*50)
     print("PIPELINE COMPLETE")
     print(f"Check '{rag_dir}/' for results and Qdrant DB.")
     print("="*50)
+    run.export("vision_pipeline")
 
 if __name__ == "__main__":
     # Default to PDF in parent folder if running from subfolder
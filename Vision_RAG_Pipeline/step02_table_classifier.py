@@ -1,10 +1,17 @@
-import ollama
+import os
+import sys
 from PIL import Image
 import io
 
+# Shared Ollama client lives at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ollama_client import get_client
+
 # Local model to use (Ensure you ran 'ollama pull llava' or 'ollama pull qwen2.5-vl')
 # You can change this to "qwen2.5-vl" if you have it.
 OLLAMA_MODEL = "llava"
+# A one-word answer should never take long; fail fast instead of hanging the pipeline
+CLASSIFY_TIMEOUT = 60.0
 
 def is_table_image(image_path):
     """
@@ -35,7 +42,7 @@ TABLE
 or
 NOT_TABLE"""
 
-        response = ollama.chat(
+        response = get_client().chat(
             model=OLLAMA_MODEL,
             messages=[
                 {
@@ -43,7 +50,9 @@ NOT_TABLE"""
                     'content': prompt,
                     'images': [image_path] # Pass direct path
                 }
-            ]
+            ],
+            options={'temperature': 0.1, 'num_predict': 8},
+            timeout=CLASSIFY_TIMEOUT
         )
         
         answer = response['message']['content'].strip().upper()
@@ -1,10 +1,15 @@
 import os
+import sys
 import json
 import shutil
-import ollama
+
+# Shared Ollama client lives at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ollama_client import get_client
 
 # Local model
 OLLAMA_MODEL = "llava"
+ANALYZE_TIMEOUT = 300.0
 
 def analyze_table_semantic(image_path, output_dir="final_tables_rag"):
     """
@@ -52,7 +57,7 @@ Ensure the output is ONLY valid JSON. Do not add markdown blocks like ```json.
 """
 
     try:
-        response = ollama.chat(
+        response = get_client().chat(
             model=OLLAMA_MODEL,
             messages=[
                 {
@@ -61,7 +66,8 @@ Ensure the output is ONLY valid JSON. Do not add markdown blocks like ```json.
                     'images': [image_path]
                 }
             ],
-            options={'temperature': 0.1} # Low temp for valid JSON
+            options={'temperature': 0.1}, # Low temp for valid JSON
+            timeout=ANALYZE_TIMEOUT
         )
         
         content = response['message']['content']
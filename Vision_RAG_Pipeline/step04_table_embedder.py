@@ -1,12 +1,21 @@
 import os
+import re
+import sys
 import glob
 import json
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+# Shared model registry lives at the repo root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from model_registry import use_embed_model
 
 QDRANT_PATH = "./qdrant_vision_db"
 COLLECTION_NAME = "vision_tables"
+# Table folders are named after their candidate image: p{page}_tbl_{n}
+FOLDER_PAGE = re.compile(r"^p(\d+)_")
+# Payload fields the query side filters on
+PAYLOAD_INDEXES = {"type": models.PayloadSchemaType.KEYWORD, "page": models.PayloadSchemaType.INTEGER}
 
 def embed_tables_for_rag(tables_dir="final_tables_rag"):
     """
@@ -22,49 +31,57 @@ def embed_tables_for_rag(tables_dir="final_tables_rag"):
             collection_name=COLLECTION_NAME,
             vectors_config=models.VectorParams(size=1024, distance=models.Distance.COSINE),
         )
+    existing = client.get_collection(COLLECTION_NAME).payload_schema or {}
+    for field, schema in PAYLOAD_INDEXES.items():
+        if field not in existing:
+            client.create_payload_index(collection_name=COLLECTION_NAME, field_name=field, field_schema=schema)
 
     # 2. Load Model
+    # Shared with the rest of the process: loaded once even when chained after text ingest,
+    # and leased only for this step so an idle timer may unload it afterwards
     print("Loading Embedding Model (BGE-M3)...")
-    embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
+    with use_embed_model(backend="torch") as embed_model:
 
-    # 3. Scan for processed tables
-    # Structure: tables_dir/tbl_page_X_.../explanation.txt
-    table_folders = glob.glob(os.path.join(tables_dir, "*"))
-    
-    points = []
-    
-    for i, folder in enumerate(table_folders):
-        # json_path = os.path.join(folder, "table.json") # Unused: We rely on the Canonicalized Summary text only
-        txt_path = os.path.join(folder, "explanation.txt")
-        image_path = os.path.join(folder, "image.png") # If we decided to copy/move it here
-        
-        # If image wasn't copied to folder, we might need to find original?
-        # My analyzer script didn't move the image. It kept it in 'candidates_temp'? 
-        # Actually my analyzer saved 'image.png' (implied copy? No, I wrote logic comments but didn't actually shutil copy).
-        # Let's assume analyzer saves `explanation.txt`.
-        
-        if not os.path.exists(txt_path):
-            continue
-            
-        with open(txt_path, "r", encoding="utf-8") as f:
-            summary = f.read()
+        # 3. Scan for processed tables
+        # Structure: tables_dir/tbl_page_X_.../explanation.txt
+        table_folders = glob.glob(os.path.join(tables_dir, "*"))
+
+        points = []
+
+        for i, folder in enumerate(table_folders):
+            # json_path = os.path.join(folder, "table.json") # Unused: We rely on the Canonicalized Summary text only
+            txt_path = os.path.join(folder, "explanation.txt")
+            image_path = os.path.join(folder, "image.png") # If we decided to copy/move it here
+
+            # If image wasn't copied to folder, we might need to find original?
+            # My analyzer script didn't move the image. It kept it in 'candidates_temp'?
+            # Actually my analyzer saved 'image.png' (implied copy? No, I wrote logic comments but didn't actually shutil copy).
+            # Let's assume analyzer saves `explanation.txt`.
+
+            if not os.path.exists(txt_path):
+                continue
+
+            with open(txt_path, "r", encoding="utf-8") as f:
+                summary = f.read()
+
+            vector = embed_model.get_text_embedding(summary)
+
+            # Original Image Path logic is tricky if we deleted candidates.
+            # But 'valid_tables' in pipeline exists.
+            # For a robust system, analyzer SHOULD copy the image to the final folder.
+
+            page_match = FOLDER_PAGE.match(os.path.basename(folder))
+            points.append(models.PointStruct(
+                id=i,
+                vector=vector,
+                payload={
+                    "summary": summary,
+                    "folder": folder,
+                    "type": "table_rag",
+                    "page": int(page_match.group(1)) if page_match else None,
+                }
+            ))
 
-        vector = embed_model.get_text_embedding(summary)
-        
-        # Original Image Path logic is tricky if we deleted candidates.
-        # But 'valid_tables' in pipeline exists.
-        # For a robust system, analyzer SHOULD copy the image to the final folder.
-        
-        points.append(models.PointStruct(
-            id=i,
-            vector=vector,
-            payload={
-                "summary": summary,
-                "folder": folder,
-                "type": "table_rag"
-            }
-        ))
-        
     if points:
         client.upsert(collection_name=COLLECTION_NAME, points=points)
         print(f"Indexed {len(points)} tables.")
@@ -5,7 +5,7 @@ from vision_pipeline_step1 import extract_tables_from_pdf
 from vision_pipeline_step2 import analyze_table_image
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+from model_registry import get_embed_model
 
 # Initialize Qdrant
 QDRANT_PATH = "./qdrant_vision_db"
@@ -78,7 +78,7 @@ def process_pdf_for_table_rag(pdf_path):
 
     print("\n=== Step 3 & 4: Embedding & Storage ===")
     client = setup_qdrant()
-    embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
+    embed_model = get_embed_model(backend="torch")
 
     points = []
     for i, item in enumerate(json_results):
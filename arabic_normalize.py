@@ -0,0 +1,50 @@
+import re
+
+# Arabic-Indic (U+0660..) and Extended/Persian (U+06F0..) digits -> Western digits
+DIGIT_MAP = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+DIACRITICS = re.compile(r"[\u064B-\u0652\u0670\u0640]")  # Harakat, dagger alif, tatweel
+BIDI_CONTROLS = re.compile(r"[\u200e\u200f\u202a-\u202e\u2066-\u2069]")
+NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_digits(text):
+    return text.translate(DIGIT_MAP)
+
+
+def normalize_arabic(text):
+    """
+    Canonical form for matching (never for display):
+    - Arabic-Indic digits -> Western, thousands separators removed
+    - diacritics, tatweel and bidi control characters removed
+    - alef variants -> ا, ى -> ي, ة -> ه, ؤ -> و, ئ -> ي
+    - PDF ligature glitches: "اال" (e.g. "األول") -> "الا" ("الاول") and a word-initial
+      "امل" (e.g. "املوظف") -> "الم" ("الموظف")
+    - lowercase Latin, single spaces
+    """
+    if not text:
+        return ""
+    text = normalize_digits(text)
+    text = BIDI_CONTROLS.sub("", text)
+    text = DIACRITICS.sub("", text)
+    text = re.sub(r"(?<=\d)[,٬](?=\d{3})", "", text)
+    text = re.sub("[أإآٱ]", "ا", text)
+    text = text.replace("ى", "ي").replace("ة", "ه").replace("ؤ", "و").replace("ئ", "ي")
+    text = fix_ligatures(text)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def fix_ligatures(text):
+    text = text.replace("اال", "الا")
+    return re.sub(r"(?<!\w)امل", "الم", text)
+
+
+def compact(text):
+    """normalize_arabic without any spaces/punctuation; robust to the split words pdfplumber produces."""
+    # Re-run the ligature fix: removing spaces can re-form "ا ألولى" -> "االولي"
+    return fix_ligatures(NON_WORD.sub("", normalize_arabic(text)).replace("_", ""))
+
+
+def char_ngrams(text, n=3):
+    text = compact(text)
+    return {text[i:i + n] for i in range(max(len(text) - n + 1, 0))}
@@ -0,0 +1,218 @@
+import os
+import re
+import json
+from arabic_normalize import normalize_arabic, normalize_digits
+
+# Written by each index build into indexes/<version>/ when versioned builds are in use,
+# see article_index_path()
+ARTICLE_INDEX_PATH = "article_index.json"
+
+# Heading lines are short; longer lines mentioning "المادة (N)" are cross-references
+MAX_HEADING_CHARS = 100
+
+ORDINALS = {
+    "الاول": 1, "الثاني": 2, "الثالث": 3, "الرابع": 4, "الخامس": 5,
+    "السادس": 6, "السابع": 7, "الثامن": 8, "التاسع": 9, "العاشر": 10,
+    # OCR variant of الثاني seen in the Marker output ("الثانب")
+    "الثانب": 2,
+}
+
+# Patterns run on normalize_arabic() output (digits already Western, alef/ta marbuta unified).
+# A mention inside a clause ("... بالماده (110) من هذه اللايحه") is a cross-reference:
+# a heading's "الماده" starts a word and is not followed by "من".
+# "(40) مكرر" is a separate article inserted after Article 40.
+ARTICLE_HEADING = re.compile(r"(?<!\w)الماده\s*[()]\s*(\d+)\s*[()](\s*مكرر)?(?!\s*من(?!\w))")
+BAB_HEADING = re.compile(r"الباب\s+(ال\w+)")
+FASL_HEADING = re.compile(r"الفصل\s+(ال\w+)")
+
+ARTICLE_QUERY = re.compile(r"ماده\s*(?:رقم\s*)?[()\[]?\s*(\d+)\s*[)\]]?(\s*مكرر)?"
+                           r"|\b(?:article|art\.?)\s*(?:no\.?\s*)?(\d+)(\s*bis)?")
+BAB_QUERY = re.compile(r"الباب\s+(ال\w+|\d+)|\b(?:chapter|part)\s+(\d+)")
+FASL_QUERY = re.compile(r"الفصل\s+(ال\w+|\d+)|\bsection\s+(\d+)")
+
+# Words that only ask to see what a reference says ("ما نص المادة 12؟", "show article 12").
+# A question with any other word ("هل تنطبق المادة 12 على المتعاقدين؟") needs an answer instead.
+DISPLAY_WORDS = {normalize_arabic(word) for word in (
+    "ما ماذا هو هي نص تنص ينص يقول تقول يتضمن تتضمن محتوي مضمون مواد اعرض اعرضي عرض اذكر اقرا "
+    "اعطني لي ال بال في من هذه اللائحة القانون "
+    "what does do is are the of in text say says show me display give read contents content please"
+).split()}
+
+
+def _heading_text(line):
+    return normalize_arabic(line.replace("*", "").lstrip("#> ").strip())
+
+
+def _ordinal(word):
+    if word is None:
+        return None
+    if word.isdigit():
+        return int(word)
+    return ORDINALS.get(word)
+
+
+class HeadingTracker:
+    """
+    Follows the current chapter ("bab-fasl" key) and article through document lines.
+    Shared by the article index and the chunk metadata in chunk_process.
+    """
+    def __init__(self):
+        self.bab, self.fasl = None, None
+        self.article = None
+
+    @property
+    def chapter(self):
+        return f"{self.bab}-{self.fasl or 0}" if self.bab else None
+
+    def feed(self, line):
+        """
+        Updates the state from one line. Returns (is_chapter_heading, article_key),
+        article_key being the "N" (or "N مكرر") of an article heading line, else None.
+        """
+        heading = _heading_text(line)
+        if not 0 < len(heading) <= MAX_HEADING_CHARS:
+            return False, None
+
+        bab_match = BAB_HEADING.search(heading)
+        fasl_match = FASL_HEADING.search(heading)
+        if bab_match and _ordinal(bab_match.group(1)):
+            self.bab, self.fasl = _ordinal(bab_match.group(1)), None
+        if fasl_match and _ordinal(fasl_match.group(1)) and ("(" in heading or ")" in heading or bab_match):
+            self.fasl = _ordinal(fasl_match.group(1))
+        is_chapter = bool((bab_match or fasl_match) and self.bab)
+
+        number = None
+        article_match = ARTICLE_HEADING.search(heading)
+        if article_match:
+            number = article_match.group(1) + (" مكرر" if article_match.group(2) else "")
+            self.article = int(article_match.group(1))
+        return is_chapter, number
+
+
+def build_article_index(sections):
+    """
+    Builds {"articles": {n: {...}}, "chapters": {"bab-fasl": {...}}} from the text
+    sections produced by chunk_process.load_and_chunk, in document order.
+    An article runs from its "المادة (N)" heading line to the next one; a chapter
+    is the latest "الباب X ((الفصل Y))" heading.
+    """
+    articles, chapters = {}, {}
+    current_article = None
+    tracker = HeadingTracker()
+
+    for section in sections:
+        for line in section.split("\n"):
+            is_chapter, number = tracker.feed(line)
+            if is_chapter:
+                chapters.setdefault(tracker.chapter, {"bab": tracker.bab, "fasl": tracker.fasl,
+                                                      "title": line.strip("#*> ").strip(), "articles": []})
+            if number:
+                current_article = articles.setdefault(
+                    number, {"number": tracker.article, "title": line.strip("#*> ").strip(),
+                             "chapter": tracker.chapter, "lines": []})
+                if current_article["chapter"] in chapters and \
+                        tracker.article not in chapters[current_article["chapter"]]["articles"]:
+                    chapters[current_article["chapter"]]["articles"].append(tracker.article)
+
+            if current_article is not None and line.strip():
+                current_article["lines"].append(line.rstrip())
+
+    for article in articles.values():
+        article["text"] = "\n".join(article.pop("lines"))
+    return {"articles": articles, "chapters": chapters}
+
+
+def article_index_path(version=None):
+    """
+    indexes/<version>/article_index.json, else ARTICLE_INDEX_PATH. Without a version, the
+    promoted one's, falling back to ARTICLE_INDEX_PATH for versions built before it was kept there.
+    """
+    from vector_backend import INDEXES_DIR, current_version
+    if version:
+        return os.path.join(INDEXES_DIR, version, ARTICLE_INDEX_PATH)
+    version = current_version()
+    path = os.path.join(INDEXES_DIR, version, ARTICLE_INDEX_PATH) if version else ARTICLE_INDEX_PATH
+    return path if os.path.exists(path) else ARTICLE_INDEX_PATH
+
+
+def save_article_index(index, path=ARTICLE_INDEX_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+    print(f"Article index saved to '{path}': {len(index['articles'])} articles, "
+          f"{len(index['chapters'])} chapters.")
+
+
+def detect_reference(question):
+    """
+    Finds a direct article/chapter reference in a question (Arabic or English,
+    Arabic-Indic or Western digits). Returns ("article", "45"), ("article", "40 مكرر"),
+    ("chapter", "2-1") or None.
+    """
+    text = normalize_arabic(normalize_digits(question))
+
+    match = ARTICLE_QUERY.search(text)
+    if match:
+        bis = " مكرر" if match.group(2) or match.group(4) else ""
+        return "article", str(int(match.group(1) or match.group(3))) + bis
+
+    bab_match = BAB_QUERY.search(text)
+    if bab_match:
+        bab = _ordinal(bab_match.group(1) or bab_match.group(2))
+        fasl_match = FASL_QUERY.search(text)
+        fasl = _ordinal(fasl_match.group(1) or fasl_match.group(2)) if fasl_match else None
+        if bab:
+            return "chapter", f"{bab}-{fasl or 0}"
+    return None
+
+
+def is_display_request(question):
+    """True when a question only asks for the text of the article/chapter it names."""
+    text = normalize_arabic(normalize_digits(question))
+    for pattern in (ARTICLE_QUERY, BAB_QUERY, FASL_QUERY):
+        text = pattern.sub(" ", text)
+    return all(word in DISPLAY_WORDS for word in re.findall(r"\w+", text))
+
+
+class ArticleRouter:
+    """Answers "what does Article 45 say" style questions straight from the article index."""
+    def __init__(self, index_path=ARTICLE_INDEX_PATH):
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        self.articles = index["articles"]
+        self.chapters = index["chapters"]
+
+    def route(self, question):
+        """
+        Returns {kind, key, title, text, display} for a resolvable reference, else None.
+        display is False when the question asks something about the article rather than
+        for its text; chapters are only routed for display requests.
+        """
+        reference = detect_reference(question)
+        if reference is None:
+            return None
+        kind, key = reference
+        display = is_display_request(question)
+
+        if kind == "article" and key in self.articles:
+            article = self.articles[key]
+            return {"kind": kind, "key": key, "title": article["title"], "text": article["text"],
+                    "display": display}
+
+        if kind == "chapter" and display:
+            # "الباب الثاني" without a section: list every section of that chapter
+            if key.endswith("-0") and key not in self.chapters:
+                bab = key.split("-")[0]
+                parts = [c for k, c in self.chapters.items() if k.split("-")[0] == bab]
+            else:
+                parts = [self.chapters[key]] if key in self.chapters else []
+            if parts:
+                text = "\n".join(f"{c['title']}: المواد {', '.join(str(n) for n in c['articles'])}"
+                                 for c in parts)
+                return {"kind": kind, "key": key, "title": parts[0]["title"], "text": text, "display": display}
+        return None
+
+
+def load_router(index_path=None):
+    """Router over the promoted version's article index (see article_index_path), or None."""
+    index_path = index_path or article_index_path()
+    return ArticleRouter(index_path) if os.path.exists(index_path) else None
@@ -0,0 +1,171 @@
+import os
+import csv
+import json
+import time
+import queue
+import argparse
+import threading
+from query_rag_ollama import build_query_engine, find_direct_answer, LLM_MODEL
+from table_fact_store import TableFactStore, FACTS_DB
+from article_router import load_router
+
+BATCH_SIZE = int(os.environ.get("HR_BATCH_SIZE", "32"))
+# Retrieved batches waiting for generation; bounds memory while keeping the LLM busy
+PREFETCH_BATCHES = 2
+
+_DONE = object()
+
+
+def load_questions(path):
+    """Reads [{id, question}] from a .jsonl file ("question", optional "id") or a .csv with a "question" column."""
+    questions = []
+    if path.lower().endswith(".csv"):
+        with open(path, "r", encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+
+    for i, row in enumerate(rows):
+        text = (row.get("question") or "").strip()
+        if text:
+            questions.append({"id": row.get("id") or str(i + 1), "question": text})
+    return questions
+
+
+def _source_record(hit):
+    return {
+        "score": hit.score,
+        "text": hit.node.get_content()[:300],
+        "metadata": hit.node.metadata,
+    }
+
+
+def _retrieve_batches(rag, items, batch_size, out_queue):
+    """
+    Producer: embeds each batch in one BGE-M3 call, searches all stores with one
+    batched query per source and runs rerank/packing, then hands the batch on.
+    """
+    from llama_index.core.schema import QueryBundle
+
+    try:
+        for start in range(0, len(items), batch_size):
+            batch = items[start:start + batch_size]
+            texts = [item["question"] for item in batch]
+
+            # 1. Batched embedding (BGE-M3 has no query instruction, so text == query embedding)
+            t0 = time.perf_counter()
+            embeddings = rag["embed_model"].get_text_embedding_batch(texts)
+            embed_s = (time.perf_counter() - t0) / len(batch)
+
+            # 2. Vectorized retrieval across the batch
+            t0 = time.perf_counter()
+            results = rag["retriever"].retrieve_batch(embeddings, query_strs=texts)
+            retrieve_s = (time.perf_counter() - t0) / len(batch)
+
+            # 3. Rerank + token-budget packing, per question
+            for item, embedding, nodes in zip(batch, embeddings, results):
+                bundle = QueryBundle(item["question"], embedding=embedding)
+                t0 = time.perf_counter()
+                for postprocessor in rag["postprocessors"]:
+                    nodes = postprocessor.postprocess_nodes(nodes, query_bundle=bundle)
+                item["bundle"] = bundle
+                item["nodes"] = nodes
+                item["timings"] = {
+                    "embed_s": embed_s,
+                    "retrieve_s": retrieve_s,
+                    "postprocess_s": time.perf_counter() - t0,
+                }
+                item["queued_at"] = time.perf_counter()
+            out_queue.put(batch)
+    except Exception as e:
+        out_queue.put(e)
+    finally:
+        out_queue.put(_DONE)
+
+
+def run_batch(input_path, output_path, batch_size=BATCH_SIZE, prefetch=PREFETCH_BATCHES, model_name=LLM_MODEL):
+    """
+    Answers every question in input_path and writes one JSON line per question to
+    output_path. Retrieval for the next batches runs while the LLM is generating.
+    """
+    questions = load_questions(input_path)
+    print(f"Loaded {len(questions)} questions from {input_path}")
+
+    # 1. Deterministic fast paths (article references, exact table facts) need no models
+    facts = TableFactStore(FACTS_DB) if os.path.exists(FACTS_DB) else None
+    router = load_router()
+    direct, pending = [], []
+    for item in questions:
+        answer = find_direct_answer(item["question"], router, facts)
+        if answer:
+            direct.append((item, answer))
+        else:
+            pending.append(item)
+    print(f"{len(direct)} answered directly, {len(pending)} need retrieval + generation")
+
+    rag = build_query_engine(model_name=model_name) if pending else None
+
+    start = time.perf_counter()
+    written = 0
+    with open(output_path, "w", encoding="utf-8") as out:
+        def write(record):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        for item, answer in direct:
+            write({"id": item["id"], "question": item["question"], "answer": answer["answer"],
+                   "path": answer["path"], "sources": [{"citation": answer["source"]}], "timings": {}})
+            written += 1
+
+        if rag is not None:
+            # 2. Producer thread keeps up to `prefetch` retrieved batches ahead of generation
+            batches = queue.Queue(maxsize=max(1, prefetch))
+            producer = threading.Thread(target=_retrieve_batches,
+                                        args=(rag, pending, batch_size, batches), daemon=True)
+            producer.start()
+
+            # 3. Generation on this thread, one question at a time (Ollama serializes anyway)
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    break
+                if isinstance(batch, Exception):
+                    raise batch
+
+                for item in batch:
+                    timings = item["timings"]
+                    timings["queue_wait_s"] = time.perf_counter() - item["queued_at"]
+                    t0 = time.perf_counter()
+                    try:
+                        answer = str(rag["engine"].synthesize(item["bundle"], item["nodes"]))
+                        error = None
+                    except Exception as e:
+                        answer, error = "", str(e)
+                    timings["generate_s"] = time.perf_counter() - t0
+
+                    record = {"id": item["id"], "question": item["question"], "answer": answer,
+                              "path": "rag", "sources": [_source_record(h) for h in item["nodes"]],
+                              "timings": timings}
+                    if error:
+                        record["error"] = error
+                    write(record)
+                    written += 1
+                print(f"  {written}/{len(questions)} answered ({time.perf_counter() - start:.1f}s)")
+            producer.join()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nWrote {written} answers to '{output_path}' in {elapsed:.1f}s "
+          f"({written / elapsed if elapsed else 0.0:.2f} questions/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of HR questions in batch.")
+    parser.add_argument("input", help=".jsonl (field 'question', optional 'id') or .csv with a 'question' column")
+    parser.add_argument("output", help="output .jsonl, one answer per line")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--prefetch", type=int, default=PREFETCH_BATCHES,
+                        help="retrieved batches kept ahead of generation")
+    parser.add_argument("--model", default=LLM_MODEL)
+    args = parser.parse_args()
+    run_batch(args.input, args.output, args.batch_size, args.prefetch, args.model)
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+from datetime import datetime
+from arabic_normalize import compact
+from article_router import article_index_path
+
+GOLDEN_SET_PATH = os.path.join("benchmarks", "golden_set_v1.jsonl")
+RESULTS_DIR = os.path.join("benchmarks", "results")
+RECALL_AT = (1, 3, 5, 10)
+# Leading chunk lines used to place a retrieved chunk inside an article
+LOCATE_LINES = 3
+
+# Settings that change retrieval results; all of them go into the config hash
+CONFIG_ENV = [
+    "HR_VECTOR_BACKEND", "HR_VECTOR_DTYPE", "HR_PREFILTER_DIM", "HR_PREFILTER_CANDIDATES",
+    "HR_EMBED_BACKEND", "HR_RERANK_MODEL", "HR_RERANK_TOP_N", "HR_CONTEXT_TOKENS", "HR_DEDUP_THRESHOLD",
+]
+
+
+def load_golden_set(path=GOLDEN_SET_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def dir_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * p / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+class ChunkLocator:
+    """
+    Maps a retrieved chunk to the article(s) it belongs to, using the article index
+    written at chunking time, and to its table index for table chunks.
+    """
+    def __init__(self, index_path=None):
+        index_path = index_path or article_index_path()
+        with open(index_path, "r", encoding="utf-8") as f:
+            articles = json.load(f)["articles"]
+        self.article_keys = {int(n): compact(a["text"]) for n, a in articles.items()}
+
+    def locate(self, node):
+        if node.metadata.get("type") == "table":
+            return set(), {node.metadata.get("original_index")}
+        lines = [line for line in node.get_content().split("\n") if line.strip()][:LOCATE_LINES]
+        key = compact("\n".join(lines))
+        if not key:
+            return set(), set()
+        return {n for n, text in self.article_keys.items() if key in text}, set()
+
+
+def is_relevant(item, located):
+    articles, tables = located
+    return bool(articles & set(item.get("articles", []))) or bool(tables & set(item.get("tables", [])))
+
+
+def config_snapshot(golden_path):
+    """Everything that identifies a comparable run; hashed into config_hash."""
+    config = {name: os.environ.get(name) for name in CONFIG_ENV}
+    config["golden_set"] = os.path.basename(golden_path)
+    config["golden_set_sha256"] = file_sha256(golden_path)
+    index_path = article_index_path()
+    if os.path.exists(index_path):
+        config["article_index_sha256"] = file_sha256(index_path)
+    digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    return config, digest
+
+
+def run_benchmark(golden_path=GOLDEN_SET_PATH, ingest=False, warmup=3):
+    """
+    Runs every golden question through the query-time retrieval stack (embedding,
+    fan-out search, rerank and packing; no generation) and scores the results.
+    """
+    from llama_index.core.schema import QueryBundle
+    from query_rag_ollama import build_query_engine
+    from vector_backend import active_store_path, close_vector_store, current_version, version_store_path
+
+    golden = load_golden_set(golden_path)
+    config, config_hash = config_snapshot(golden_path)
+
+    # 1. Optional ingest (chunk + dedup + embed), timed end to end
+    # With versioned builds the fresh index is a new, unpromoted version and is benchmarked as such
+    ingest_s, version = None, None
+    if ingest:
+        start = time.perf_counter()
+        if current_version():
+            from index_versions import build_version
+            version = build_version(validate=False)
+        else:
+            from embed_process import run_embedding
+            # Close the ingest client first: local-mode Qdrant locks its folder per client,
+            # and build_query_engine() reopens the same store below
+            close_vector_store(run_embedding())
+        ingest_s = time.perf_counter() - start
+
+    index_path = version_store_path(version) if version else active_store_path()
+    locator = ChunkLocator(article_index_path(version) if version else None)
+    rag = build_query_engine(index_version=version)
+    retriever, postprocessors = rag["retriever"], rag["postprocessors"]
+
+    def retrieve(question):
+        bundle = QueryBundle(question)
+        candidates = retriever.retrieve(bundle)
+        context = candidates
+        for postprocessor in postprocessors:
+            context = postprocessor.postprocess_nodes(context, query_bundle=bundle)
+        return candidates, context
+
+    # 2. Warm-up queries (first calls pay lazy init / cache misses), not scored
+    for item in golden[:warmup]:
+        retrieve(item["question"])
+
+    # 3. Scored run
+    per_query, latencies = [], []
+    for item in golden:
+        start = time.perf_counter()
+        candidates, context = retrieve(item["question"])
+        latency = time.perf_counter() - start
+        latencies.append(latency)
+
+        hits = [is_relevant(item, locator.locate(hit.node)) for hit in candidates]
+        first_hit = hits.index(True) + 1 if True in hits else None
+        per_query.append({
+            "id": item["id"],
+            "question": item["question"],
+            "first_relevant_rank": first_hit,
+            "in_context": any(is_relevant(item, locator.locate(hit.node)) for hit in context),
+            "context_chunks": len(context),
+            "latency_ms": 1000 * latency,
+        })
+
+    n = len(per_query)
+    ranks = [q["first_relevant_rank"] for q in per_query]
+    metrics = {f"recall@{k}": sum(1 for r in ranks if r and r <= k) / n for k in RECALL_AT}
+    metrics["mrr"] = sum(1.0 / r for r in ranks if r) / n
+    metrics["context_recall"] = sum(1 for q in per_query if q["in_context"]) / n
+    latency_ms = [1000 * t for t in latencies]
+    metrics.update({
+        "latency_p50_ms": percentile(latency_ms, 50),
+        "latency_p95_ms": percentile(latency_ms, 95),
+        "latency_p99_ms": percentile(latency_ms, 99),
+        "ingest_s": ingest_s,
+        "index_bytes": dir_size(index_path) if os.path.exists(index_path) else None,
+    })
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config_hash": config_hash,
+        "config": config,
+        "questions": n,
+        "metrics": metrics,
+        "per_query": per_query,
+    }
+
+
+def print_report(result, baseline=None):
+    print(f"\nRetrieval benchmark ({result['config']['golden_set']}, {result['questions']} questions, "
+          f"config {result['config_hash']})")
+    for name, value in result["metrics"].items():
+        line = f"  {name:<16} {value if value is None else round(value, 4)}"
+        previous = (baseline or {}).get("metrics", {}).get(name)
+        if previous is not None and value is not None:
+            line += f"   (baseline {round(previous, 4)}, delta {value - previous:+.4f})"
+        print(line)
+    missed = [q["id"] for q in result["per_query"] if q["first_relevant_rank"] is None]
+    if missed:
+        print(f"  no relevant chunk retrieved: {', '.join(missed)}")
+
+
+def save_result(result, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = result["timestamp"].replace(":", "").replace("-", "")
+    path = os.path.join(results_dir, f"{stamp}_{result['config_hash']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    print(f"Results saved to '{path}'")
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval quality/latency benchmark over the golden set.")
+    parser.add_argument("--golden", default=GOLDEN_SET_PATH)
+    parser.add_argument("--ingest", action="store_true", help="re-run chunking + embedding first and time it")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    result = run_benchmark(args.golden, ingest=args.ingest)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    save_result(result)
@@ -1,6 +1,15 @@
 import re
 import os
-from llama_index.core.schema import TextNode
+from llama_index.core.schema import TextNode, NodeRelationship, RelatedNodeInfo
+from article_router import build_article_index, save_article_index, HeadingTracker, ARTICLE_INDEX_PATH
+
+# Marker names extracted images "_page_N_Picture_M" (N from 0); they are the only page
+# markers in its markdown, so a chunk's page is the last image reference before it
+PAGE_REF = re.compile(r"_page_(\d+)_")
+TABLE_PLACEHOLDER_REF = re.compile(r"\[TABLE_PLACEHOLDER_(\d+)\]")
+# Location metadata for filtered search (payload-indexed in Qdrant); kept out of the
+# embedded text and the LLM prompt so adding it does not change any vector
+LOCATION_METADATA_KEYS = ["page", "page_end", "bab", "chapter", "articles"]
 
 def extract_tables(text):
     """
@@ -19,7 +28,69 @@ def extract_tables(text):
     text_without_tables = re.sub(table_pattern, replace_func, text, flags=re.DOTALL)
     return tables, text_without_tables
 
-def load_and_chunk(md_file_path="sharjah_hr_law 8_marker.md"):
+def section_locations(sections):
+    """
+    Walks the text sections in document order and returns (one location dict per section,
+    {table_index: location}) with the page(s), chapter and article(s) each one belongs to.
+    """
+    tracker = HeadingTracker()
+    page = 1
+    section_meta, table_meta = [], {}
+
+    def location(articles):
+        meta = {"page": page, "bab": tracker.bab, "chapter": tracker.chapter, "articles": articles}
+        return {key: value for key, value in meta.items() if value not in (None, [])}
+
+    for section in sections:
+        start_page, start_chapter, start_article = page, tracker.chapter, tracker.article
+        headed, first_chapter = [], None
+        for line in section.split("\n"):
+            page_match = PAGE_REF.search(line)
+            if page_match:
+                page = int(page_match.group(1)) + 1
+            is_chapter, number = tracker.feed(line)
+            if number and tracker.article not in headed:
+                headed.append(tracker.article)
+            # The chapter of a section is the one in force at its first heading
+            if is_chapter or number:
+                first_chapter = first_chapter or tracker.chapter
+            table_match = TABLE_PLACEHOLDER_REF.search(line)
+            if table_match:
+                current = [tracker.article] if tracker.article else []
+                table_meta[int(table_match.group(1))] = location(current)
+
+        # A section without an article heading continues the article it starts in
+        articles = headed or ([start_article] if start_article else [])
+        meta = location(articles)
+        meta["page"], meta["page_end"] = start_page, page
+        chapter = first_chapter or start_chapter or tracker.chapter
+        if chapter:
+            meta["chapter"], meta["bab"] = chapter, int(chapter.split("-")[0])
+        section_meta.append(meta)
+    return section_meta, table_meta
+
+def _set_location(node, meta):
+    node.metadata.update(meta)
+    for key in LOCATION_METADATA_KEYS:
+        if key not in node.excluded_embed_metadata_keys:
+            node.excluded_embed_metadata_keys.append(key)
+        if key not in node.excluded_llm_metadata_keys:
+            node.excluded_llm_metadata_keys.append(key)
+
+def tag_document(nodes, doc_id):
+    """
+    Marks nodes as belonging to one corpus document: metadata["doc_id"] for filtering and
+    the SOURCE relationship, which vector stores use to delete a document's chunks.
+    """
+    for node in nodes:
+        node.metadata["doc_id"] = doc_id
+        if "doc_id" not in node.excluded_embed_metadata_keys:
+            node.excluded_embed_metadata_keys.append("doc_id")
+        node.relationships[NodeRelationship.SOURCE] = RelatedNodeInfo(node_id=doc_id)
+    return nodes
+
+def load_and_chunk(md_file_path="sharjah_hr_law 8_marker.md", doc_id=None,
+                   debug_path="chunks_debug.txt", article_index_path=None):
     print(f"Loading {md_file_path}...")
     
     if not os.path.exists(md_file_path):
@@ -57,22 +128,42 @@ def load_and_chunk(md_file_path="sharjah_hr_law 8_marker.md"):
     if current_chunk:
         nodes.append(TextNode(text=current_chunk.strip()))
 
+    # Article/chapter index for direct-address queries ("what does Article 45 say"),
+    # written only when the caller asks for it
+    if article_index_path:
+        save_article_index(build_article_index([node.text for node in nodes]), article_index_path)
+
+    # Page / chapter / article of every chunk, for filtered search
+    section_meta, table_meta = section_locations([node.text for node in nodes])
+    for node, meta in zip(nodes, section_meta):
+        # "type" is new on text chunks, so it stays out of their embedded text too
+        node.metadata["type"] = "text"
+        node.excluded_embed_metadata_keys.append("type")
+        node.excluded_llm_metadata_keys.append("type")
+        _set_location(node, meta)
+
     # Add Table Nodes (High Priority)
     for i, table_text in enumerate(tables):
         # We create a node specifically for the table.
         # Adding some context "Table" helps retrieval
         node = TextNode(text=f"Table {i+1}:\n{table_text}")
         node.metadata = {"type": "table", "original_index": i}
+        _set_location(node, table_meta.get(i, {}))
         nodes.append(node)
 
     print(f"Total Text Chunks (Sections): {len(nodes) - len(tables)}")
     print(f"Total Table Chunks: {len(tables)}")
 
+    if doc_id:
+        tag_document(nodes, doc_id)
+
     # DEBUG: Save chunks to file for inspection
-    print("Saving chunks to 'chunks_debug.txt' and printing to console...")
-    with open("chunks_debug.txt", "w", encoding="utf-8") as f:
+    print(f"Saving chunks to '{debug_path}' and printing to console...")
+    with open(debug_path, "w", encoding="utf-8") as f:
         for i, node in enumerate(nodes):
-            header = f"--- CHUNK {i+1} ({node.metadata.get('type', 'text')}) ---"
+            header = (f"--- CHUNK {i+1} ({node.metadata.get('type', 'text')}, "
+                      f"page {node.metadata.get('page')}, chapter {node.metadata.get('chapter')}, "
+                      f"articles {node.metadata.get('articles', [])}) ---")
             content = node.text
             divider = "="*50
             
@@ -89,4 +180,4 @@ def load_and_chunk(md_file_path="sharjah_hr_law 8_marker.md"):
 
 if __name__ == "__main__":
     # Test the chunking independently
-    load_and_chunk()
+    load_and_chunk(article_index_path=ARTICLE_INDEX_PATH)
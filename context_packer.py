@@ -0,0 +1,103 @@
+import re
+from typing import Any
+from pydantic import Field, PrivateAttr
+from llama_index.core import Settings
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def query_terms(text):
+    return {w for w in WORD_PATTERN.findall(text.lower()) if len(w) > 1}
+
+
+def split_spans(text):
+    """Paragraph-level spans; falls back to lines for sections without blank lines."""
+    spans = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    if len(spans) <= 1:
+        spans = [line.strip() for line in text.split("\n") if line.strip()]
+    return spans
+
+
+class TokenBudgetPacker(BaseNodePostprocessor):
+    """
+    Packs retrieved nodes into a fixed token budget instead of passing whole chunks.
+
+    1. Drops candidates whose score is more than max_score_gap below the best one.
+    2. Adds nodes best-first while they fit.
+    3. A node that does not fit is cut down to its most query-relevant spans
+       (paragraphs, ranked by term overlap with the question), kept in document order.
+    Leftover candidates are dropped once the budget is spent, so top_k becomes dynamic.
+    """
+    token_budget: int = Field(default=1500)
+    max_score_gap: float = Field(default=0.15)
+    min_span_tokens: int = Field(default=40)
+
+    _last_report: Any = PrivateAttr(default=None)
+
+    @classmethod
+    def class_name(cls):
+        return "TokenBudgetPacker"
+
+    @property
+    def last_report(self):
+        return self._last_report
+
+    def _count(self, text):
+        return len(Settings.tokenizer(text))
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        report = {"candidates": len(nodes), "kept": 0, "dropped_by_score": 0, "trimmed": 0,
+                  "dropped_by_budget": 0, "context_tokens": 0}
+        if not nodes:
+            self._last_report = report
+            return nodes
+
+        nodes = sorted(nodes, key=lambda n: n.score or 0.0, reverse=True)
+        best = nodes[0].score or 0.0
+        kept_by_score = [n for n in nodes if (n.score or 0.0) >= best - self.max_score_gap]
+        report["dropped_by_score"] = len(nodes) - len(kept_by_score)
+
+        terms = query_terms(query_bundle.query_str) if query_bundle else set()
+        packed, used = [], 0
+        for node in kept_by_score:
+            remaining = self.token_budget - used
+            if remaining < self.min_span_tokens:
+                report["dropped_by_budget"] += 1
+                continue
+
+            text = node.node.get_content()
+            tokens = self._count(text)
+            if tokens > remaining:
+                text, tokens = self._best_spans(text, terms, remaining)
+                if not text:
+                    report["dropped_by_budget"] += 1
+                    continue
+                trimmed = node.node.model_copy(deep=True)
+                trimmed.set_content(text)
+                node = NodeWithScore(node=trimmed, score=node.score)
+                report["trimmed"] += 1
+
+            packed.append(node)
+            used += tokens
+
+        report["kept"] = len(packed)
+        report["context_tokens"] = used
+        self._last_report = report
+        return packed
+
+    def _best_spans(self, text, terms, budget):
+        spans = split_spans(text)
+        # The first span is the section header; keep it for context when it fits
+        ranked = sorted(range(1, len(spans)), key=lambda i: len(query_terms(spans[i]) & terms),
+                        reverse=True)
+        chosen, used = [], 0
+        for i in [0] + ranked:
+            cost = self._count(spans[i])
+            if used + cost <= budget:
+                chosen.append(i)
+                used += cost
+        if chosen == [0] and len(spans) > 1:
+            return "", 0  # Only the header fitted; not worth a slot
+        return "\n\n".join(spans[i] for i in sorted(chosen)), used
@@ -0,0 +1,248 @@
+import os
+import re
+import json
+import time
+import glob
+import hashlib
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from instrumentation import get_metrics
+
+CORPUS_DIR = "corpus"
+ARTIFACTS_DIR = "corpus_artifacts"
+MANIFEST_PATH = "corpus_manifest.json"
+# Documents processed at once; each worker runs Marker + pdfplumber for one PDF
+INGEST_WORKERS = int(os.environ.get("HR_INGEST_WORKERS", "2"))
+
+# Per-document stages, in order; "index" runs in the parent over all documents at once.
+# The article index (ArticleRouter) and table facts (TableFactStore) cover the main law
+# only, so no per-document tables or article index are produced here
+DOCUMENT_STAGES = ["marker", "text"]
+STAGES = DOCUMENT_STAGES + ["index"]
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_doc_id(pdf_path, sha256):
+    """Readable, stable id: file stem (spaces -> _) plus the first 8 hex digits of its hash."""
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    slug = re.sub(r"[^\w-]+", "_", stem).strip("_") or "doc"
+    return f"{slug}-{sha256[:8]}"
+
+
+def doc_paths(doc_id, artifacts_dir=ARTIFACTS_DIR):
+    """Artifact namespace of one document (what the single-document scripts write to the repo root)."""
+    base = os.path.join(artifacts_dir, doc_id)
+    return {
+        "dir": base,
+        "marker_md": os.path.join(base, "marker.md"),
+        "text": os.path.join(base, "rag_text_only.txt"),
+        "chunks_debug": os.path.join(base, "chunks_debug.txt"),
+    }
+
+
+class CorpusManifest:
+    """
+    corpus_manifest.json: {doc_id: {file, sha256, stages: {stage: {status, seconds, finished, error}}}}.
+    Saved atomically after every change so an interrupted ingest resumes where it stopped.
+    """
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.documents = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.documents = json.load(f)["documents"]
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"updated": datetime.now().isoformat(timespec="seconds"),
+                       "documents": self.documents}, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
+
+    def register(self, doc_id, pdf_path, sha256):
+        entry = self.documents.get(doc_id)
+        if entry is None or entry["sha256"] != sha256:
+            entry = {"file": pdf_path, "sha256": sha256, "stages": {}}
+            self.documents[doc_id] = entry
+        entry["file"] = pdf_path
+        return entry
+
+    def done_stages(self, doc_id):
+        stages = self.documents[doc_id]["stages"]
+        return {name for name, info in stages.items() if info["status"] == "done"}
+
+    def status(self, doc_id):
+        stages = self.documents[doc_id]["stages"]
+        if any(info["status"] == "failed" for info in stages.values()):
+            return "failed"
+        return "done" if all(stages.get(s, {}).get("status") == "done" for s in STAGES) else "pending"
+
+
+def _run_stage(stage, pdf_path, paths):
+    # Imported here: each worker process loads only what its stages need
+    if stage == "marker":
+        from parse_with_marker import parse_with_marker
+        if parse_with_marker(pdf_path, output_file=paths["marker_md"]) is None:
+            raise RuntimeError("Marker conversion failed")
+    elif stage == "text":
+        from extract_text_no_tables import extract_text_excluding_tables
+        extract_text_excluding_tables(pdf_path, output_file=paths["text"])
+
+
+def process_document(pdf_path, doc_id, done, artifacts_dir=ARTIFACTS_DIR):
+    """
+    Runs the per-document stages not yet in `done` (worker process).
+    Returns (doc_id, {stage: result}); stops at the first failing stage.
+    """
+    paths = doc_paths(doc_id, artifacts_dir)
+    os.makedirs(paths["dir"], exist_ok=True)
+    results = {}
+    for stage in DOCUMENT_STAGES:
+        if stage in done:
+            continue
+        start = time.perf_counter()
+        try:
+            _run_stage(stage, pdf_path, paths)
+            results[stage] = {"status": "done"}
+        except Exception as e:
+            results[stage] = {"status": "failed", "error": str(e)}
+        results[stage]["seconds"] = round(time.perf_counter() - start, 2)
+        results[stage]["finished"] = datetime.now().isoformat(timespec="seconds")
+        if results[stage]["status"] == "failed":
+            break
+    return doc_id, results
+
+
+def index_documents(manifest, doc_ids, artifacts_dir=ARTIFACTS_DIR, embed_workers=None, remove_doc_ids=(),
+                    store_path=None):
+    """
+    Chunks every listed document, tags nodes with doc_id and (re)indexes them into the
+    one text index (store_path, see ingest_corpus); chunks of remove_doc_ids (deleted/changed
+    files) are dropped in the same pass.
+    """
+    from chunk_process import load_and_chunk
+    from embed_process import index_nodes
+    from vector_backend import close_vector_store
+
+    nodes = []
+    for doc_id in doc_ids:
+        paths = doc_paths(doc_id, artifacts_dir)
+        nodes.extend(load_and_chunk(paths["marker_md"], doc_id=doc_id, debug_path=paths["chunks_debug"]))
+
+    start = time.perf_counter()
+    close_vector_store(index_nodes(nodes, embed_workers, replace_doc_ids=list(doc_ids) + list(remove_doc_ids),
+                                   store_path=store_path))
+    seconds = round(time.perf_counter() - start, 2)
+    for doc_id in doc_ids:
+        manifest.documents[doc_id]["stages"]["index"] = {
+            "status": "done", "seconds": seconds, "chunks": sum(1 for n in nodes if n.metadata["doc_id"] == doc_id),
+            "finished": datetime.now().isoformat(timespec="seconds"),
+        }
+    manifest.save()
+
+
+def ingest_corpus(corpus_dir=CORPUS_DIR, workers=INGEST_WORKERS, artifacts_dir=ARTIFACTS_DIR,
+                  manifest_path=MANIFEST_PATH, force=False, embed_workers=None, promote=False):
+    run = get_metrics()
+    manifest = CorpusManifest(manifest_path)
+
+    # 1. Scan and hash; a changed file gets a new doc_id and starts over
+    pdfs = sorted(glob.glob(os.path.join(corpus_dir, "**", "*.pdf"), recursive=True))
+    print(f"Corpus: {len(pdfs)} PDFs in '{corpus_dir}'")
+    current = {}
+    with run.stage("hash", documents=len(pdfs)):
+        for pdf_path in pdfs:
+            sha256 = file_sha256(pdf_path)
+            doc_id = make_doc_id(pdf_path, sha256)
+            manifest.register(doc_id, pdf_path, sha256)
+            if force:
+                manifest.documents[doc_id]["stages"] = {}
+            current[doc_id] = pdf_path
+
+    # Documents whose file vanished or changed (old hash = old doc_id) leave the index
+    stale = [doc_id for doc_id in manifest.documents if doc_id not in current]
+    manifest.save()
+
+    # 2. Per-document pipelines in parallel (spawn: Marker/torch must not be forked)
+    pending = {doc_id: manifest.done_stages(doc_id) for doc_id in current
+               if not set(DOCUMENT_STAGES) <= manifest.done_stages(doc_id)}
+    print(f"{len(pending)} documents need parsing/extraction, {workers} workers")
+    if pending:
+        with run.stage("documents", documents=len(pending)), \
+                ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+            futures = [pool.submit(process_document, current[doc_id], doc_id, done, artifacts_dir)
+                       for doc_id, done in pending.items()]
+            for future in as_completed(futures):
+                doc_id, results = future.result()
+                manifest.documents[doc_id]["stages"].update(results)
+                manifest.save()
+                failed = [s for s, r in results.items() if r["status"] == "failed"]
+                print(f"  [{'FAILED' if failed else 'OK'}] {doc_id} "
+                      + ", ".join(f"{s} {r['seconds']}s" for s, r in results.items()))
+                run.count("documents_failed" if failed else "documents_parsed")
+
+    # 3. One index for the whole corpus; only new/changed documents are (re)embedded
+    to_index = [doc_id for doc_id in current
+                if "marker" in manifest.done_stages(doc_id) and "index" not in manifest.done_stages(doc_id)]
+    # Once a version is promoted, changes go into a copy of it (validated, then promoted
+    # with --promote); the live store stays read-only for the query processes
+    from vector_backend import current_version
+    version, store_path = None, None
+    if (to_index or stale) and current_version():
+        from index_versions import fork_version
+        version, store_path = fork_version(source=f"corpus_ingest {corpus_dir}")
+    if stale:
+        print(f"Removing {len(stale)} stale documents from the index: {', '.join(stale)}")
+    if to_index:
+        print(f"Indexing {len(to_index)} documents...")
+        with run.stage("index", documents=len(to_index)):
+            index_documents(manifest, to_index, artifacts_dir, embed_workers, remove_doc_ids=stale,
+                            store_path=store_path)
+    elif stale:
+        # Local Qdrant allows one client per folder, so the store is only opened here when
+        # there is nothing to index
+        from embed_process import delete_documents
+        from vector_backend import open_vector_store, finalize_vector_store, close_vector_store
+        vector_store = open_vector_store(path=store_path, write=True)
+        delete_documents(vector_store, stale)
+        finalize_vector_store(vector_store)
+        close_vector_store(vector_store)
+    if version:
+        from index_versions import validate_version, promote as promote_version
+        if validate_version(version) and promote:
+            promote_version(version)
+        else:
+            print(f"Index version '{version}' built; promote with: python index_versions.py promote {version}")
+    for doc_id in stale:
+        del manifest.documents[doc_id]
+    manifest.save()
+
+    statuses = {doc_id: manifest.status(doc_id) for doc_id in current}
+    print("\nCorpus ingest summary:")
+    for doc_id, status in statuses.items():
+        print(f"  {status:<8} {doc_id}")
+    run.export("corpus_ingest")
+    return statuses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest a directory of PDFs into the shared text index.")
+    parser.add_argument("corpus_dir", nargs="?", default=CORPUS_DIR)
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="documents processed in parallel")
+    parser.add_argument("--embed-workers", default=None, help="sharded embedding workers (see HR_EMBED_WORKERS)")
+    parser.add_argument("--artifacts-dir", default=ARTIFACTS_DIR)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--force", action="store_true", help="re-run every stage for every document")
+    parser.add_argument("--promote", action="store_true", help="promote the new index version if validation passes")
+    args = parser.parse_args()
+    ingest_corpus(args.corpus_dir, args.workers, args.artifacts_dir, args.manifest, args.force, args.embed_workers,
+                  args.promote)
@@ -0,0 +1,70 @@
+import time
+from typing import Any
+from pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore
+
+# Small multilingual (incl. Arabic) cross-encoder, ~118M params; fast enough on CPU once int8
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class CrossEncoderRerank(BaseNodePostprocessor):
+    """
+    Re-scores a wide candidate pool with a local cross-encoder and keeps top_n.
+    Runs batched on CPU; with quantize=True the Linear layers are converted to
+    int8 (torch dynamic quantization) at load time.
+    """
+    model: str = Field(default=DEFAULT_RERANK_MODEL)
+    top_n: int = Field(default=3)
+    batch_size: int = Field(default=16)
+    max_length: int = Field(default=512)
+    quantize: bool = Field(default=True)
+    num_threads: int = Field(default=0)
+
+    _encoder: Any = PrivateAttr(default=None)
+    _last_report: Any = PrivateAttr(default=None)
+
+    @classmethod
+    def class_name(cls):
+        return "CrossEncoderRerank"
+
+    @property
+    def last_report(self):
+        return self._last_report
+
+    def load(self):
+        if self._encoder is not None:
+            return self._encoder
+
+        import torch
+        from sentence_transformers import CrossEncoder
+
+        print(f"Loading reranker {self.model} (int8: {self.quantize})...")
+        start = time.perf_counter()
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        encoder = CrossEncoder(self.model, device="cpu", max_length=self.max_length)
+        if self.quantize:
+            encoder.model = torch.quantization.quantize_dynamic(
+                encoder.model, {torch.nn.Linear}, dtype=torch.qint8)
+        encoder.model.eval()
+        self._encoder = encoder
+        print(f"Reranker ready in {time.perf_counter() - start:.1f}s")
+        return encoder
+
+    def _postprocess_nodes(self, nodes, query_bundle=None):
+        if query_bundle is None or len(nodes) <= 1:
+            # Nothing was reranked for this question; don't leave the previous report behind
+            self._last_report = None
+            return nodes[:self.top_n]
+
+        encoder = self.load()
+        start = time.perf_counter()
+        pairs = [(query_bundle.query_str, n.node.get_content()) for n in nodes]
+        scores = encoder.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        elapsed = time.perf_counter() - start
+
+        ranked = sorted(zip(nodes, scores), key=lambda item: float(item[1]), reverse=True)
+        self._last_report = {"candidates": len(nodes), "kept": min(self.top_n, len(nodes)),
+                             "rerank_ms": 1000 * elapsed}
+        return [NodeWithScore(node=n.node, score=float(s)) for n, s in ranked[:self.top_n]]
@@ -0,0 +1,163 @@
+import os
+import re
+import time
+import queue
+import threading
+from arabic_normalize import char_ngrams, normalize_arabic
+from instrumentation import get_metrics
+
+# Per-request latency budgets for the query CLI, measured from the moment the question
+# is asked (retrieval included). Missing either one cancels generation and returns an
+# extractive answer from the retrieved chunks instead. HR_ANSWER_BUDGET=0 disables both.
+TTFT_BUDGET_S = float(os.environ.get("HR_TTFT_BUDGET", "20"))
+ANSWER_BUDGET_S = float(os.environ.get("HR_ANSWER_BUDGET", "60"))
+# Sentences quoted in an extractive answer
+FALLBACK_SENTENCES = int(os.environ.get("HR_FALLBACK_SENTENCES", "3"))
+
+FALLBACK_LABEL = "[Fallback: extractive answer from the retrieved text, not generated]"
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?؟؛:])\s+|\n+")
+MIN_SENTENCE_CHARS = 15
+# Definite article and common conjunction/preposition prefixes dropped before word matching
+WORD_PREFIX = re.compile(r"^(?:وال|بال|فال|كال|لل|ال)")
+
+
+def source_label(node):
+    """Human-readable citation from the chunk's location metadata."""
+    meta = node.metadata
+    if meta.get("type") == "table":
+        label = f"Table {meta.get('original_index', 0) + 1}"
+    elif meta.get("type") in ("table_rag", "table_vision"):
+        label = f"Table image {os.path.basename(meta.get('folder', ''))}".strip()
+    elif meta.get("articles"):
+        label = "Article " + ", ".join(str(n) for n in meta["articles"])
+    else:
+        label = "Text section"
+    if meta.get("page"):
+        label += f" (page {meta['page']})"
+    return label
+
+
+def split_sentences(text):
+    return [s.strip() for s in SENTENCE_SPLIT.split(text) if len(s.strip()) >= MIN_SENTENCE_CHARS]
+
+
+def _terms(text):
+    words = (WORD_PREFIX.sub("", w) for w in re.findall(r"\w+", normalize_arabic(text)))
+    return {w for w in words if len(w) > 2}
+
+
+def sentence_score(query_terms, query_grams, sentence):
+    """Share of question words in the sentence; character trigrams break ties between close wordings."""
+    words = len(query_terms & _terms(sentence)) / max(len(query_terms), 1)
+    grams = len(query_grams & char_ngrams(sentence)) / max(len(query_grams), 1)
+    return words + 0.1 * grams
+
+
+def extractive_answer(question, nodes, reason, max_sentences=FALLBACK_SENTENCES):
+    """
+    Picks the sentences of the retrieved chunks that best match the question (chunk
+    rank breaks ties) and quotes each with its neighbours, the matching sentence in
+    bold. Returns (text, sources).
+    """
+    query_terms, query_grams = _terms(question), char_ngrams(question)
+    candidates = []
+    for rank, hit in enumerate(nodes):
+        sentences = split_sentences(hit.node.get_content())
+        for i, sentence in enumerate(sentences):
+            score = sentence_score(query_terms, query_grams, sentence)
+            candidates.append((score - 0.01 * rank, rank, i, sentences))
+
+    lines = [FALLBACK_LABEL, f"({reason})", ""]
+    sources = []
+    for score, rank, i, sentences in sorted(candidates, key=lambda c: c[0], reverse=True)[:max_sentences]:
+        before = sentences[i - 1] + " " if i > 0 else ""
+        after = " " + sentences[i + 1] if i + 1 < len(sentences) else ""
+        label = source_label(nodes[rank].node)
+        lines.append(f"- {before}**{sentences[i]}**{after}")
+        lines.append(f"  Source: {label}")
+        if label not in sources:
+            sources.append(label)
+    if not candidates:
+        lines.append("No retrieved text matched the question.")
+    return "\n".join(lines), sources
+
+
+def build_prompt(question, nodes):
+    """The same text QA prompt the default (compact) synthesizer sends for one LLM call."""
+    from llama_index.core.prompts.default_prompts import DEFAULT_TEXT_QA_PROMPT
+    from llama_index.core.schema import MetadataMode
+    context = "\n\n".join(hit.node.get_content(metadata_mode=MetadataMode.LLM) for hit in nodes)
+    return DEFAULT_TEXT_QA_PROMPT.format(context_str=context, query_str=question)
+
+
+def answer_with_deadline(rag, question, ttft_budget=TTFT_BUDGET_S, total_budget=ANSWER_BUDGET_S, embedding=None):
+    """
+    Retrieves (reusing the question's embedding when the caller has one), then streams
+    the answer under both budgets. Returns
+    {answer, fallback, reason, sources, timings}; on a missed budget the stream is
+    cancelled (Ollama stops generating when the connection closes) and the answer is
+    extractive.
+    """
+    from llama_index.core.schema import QueryBundle
+    from ollama_client import StreamCancel
+
+    start = time.perf_counter()
+    bundle = QueryBundle(question, embedding=embedding)
+    nodes = rag["retriever"].retrieve(bundle)
+    for postprocessor in rag["postprocessors"]:
+        nodes = postprocessor.postprocess_nodes(nodes, query_bundle=bundle)
+    timings = {"retrieve_s": time.perf_counter() - start}
+
+    # 1. Generation streams on a worker thread; this thread only waits on the queue
+    deltas = queue.Queue()
+    # Cancelling also drops the HTTP connection, so Ollama stops on the prompt right away
+    cancel = StreamCancel()
+    remaining = max(total_budget - (time.perf_counter() - start), 0.1)
+
+    def generate():
+        try:
+            for chunk in rag["llm"].stream_complete(build_prompt(question, nodes), cancel_event=cancel,
+                                                    timeout=remaining):
+                deltas.put(("delta", chunk.delta))
+            deltas.put(("done", None))
+        except Exception as e:
+            deltas.put(("error", e))
+
+    threading.Thread(target=generate, daemon=True, name="deadline-generate").start()
+
+    # 2. Collect tokens until done or a budget runs out
+    text, reason, first_token = "", None, None
+    while reason is None:
+        elapsed = time.perf_counter() - start
+        if first_token is None:
+            budget, budget_name = min(ttft_budget, total_budget), "first token"
+        else:
+            budget, budget_name = total_budget, "answer"
+        try:
+            kind, value = deltas.get(timeout=max(budget - elapsed, 0.0))
+        except queue.Empty:
+            reason = f"no {budget_name} within {budget:g}s"
+            break
+        if kind == "delta":
+            if first_token is None and value:
+                first_token = time.perf_counter()
+                timings["ttft_s"] = first_token - start
+            text += value or ""
+        elif kind == "error":
+            reason = f"generation failed: {value}"
+        else:
+            break
+
+    timings["total_s"] = time.perf_counter() - start
+    if reason is None:
+        sources = []
+        for hit in nodes:
+            label = source_label(hit.node)
+            if label not in sources:
+                sources.append(label)
+        return {"answer": text.strip(), "fallback": False, "reason": None, "sources": sources, "timings": timings}
+
+    cancel.set()
+    get_metrics().count("answer_fallbacks")
+    answer, sources = extractive_answer(question, nodes, reason)
+    return {"answer": answer, "fallback": True, "reason": reason, "sources": sources, "timings": timings}
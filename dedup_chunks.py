@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import zlib
+import numpy as np
+from arabic_normalize import char_ngrams
+
+DEDUP_REPORT_PATH = "dedup_report.json"
+
+# Character 5-grams of the normalized, space-free text: robust to the split words
+# and stray spaces pdfplumber/Marker produce around repeated boilerplate
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+LSH_BANDS = 16
+# Candidate pairs are confirmed with the exact shingle Jaccard (HR_DEDUP_THRESHOLD=1.1 disables merging)
+JACCARD_THRESHOLD = float(os.environ.get("HR_DEDUP_THRESHOLD", "0.85"))
+
+_PRIME = (1 << 61) - 1
+# Metadata kept on merged nodes for citations, never embedded or shown to the LLM
+DEDUP_METADATA_KEYS = ["source_locations", "duplicate_count"]
+
+
+def shingles(text):
+    return char_ngrams(text, n=SHINGLE_SIZE)
+
+
+def minhash_signatures(shingle_sets, num_perm=NUM_PERM, seed=0):
+    """(n_docs, num_perm) MinHash signatures from universal hashes a*x+b mod p over crc32 shingle ids."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    signatures = np.full((len(shingle_sets), num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for i, grams in enumerate(shingle_sets):
+        if not grams:
+            continue
+        ids = np.array([zlib.crc32(g.encode("utf-8")) for g in grams], dtype=np.uint64)
+        # a, ids < 2^32, so a*ids fits in uint64 before the modulus
+        hashed = (np.outer(ids, a) + b) % _PRIME
+        signatures[i] = hashed.min(axis=0)
+    return signatures
+
+
+def lsh_candidate_pairs(signatures, bands=LSH_BANDS):
+    """Pairs of documents sharing at least one identical band of their signature."""
+    rows = signatures.shape[1] // bands
+    pairs = set()
+    for band in range(bands):
+        buckets = {}
+        for doc, sig in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(sig.tobytes(), []).append(doc)
+        for docs in buckets.values():
+            for i in range(len(docs)):
+                for j in range(i + 1, len(docs)):
+                    pairs.add((docs[i], docs[j]))
+    return pairs
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, x, y):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            # The earliest chunk stays the group root (document order is preserved)
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+
+def _location(node, position):
+    if node.metadata.get("type") == "table":
+        location = f"table {node.metadata.get('original_index', position) + 1}"
+    else:
+        location = f"chunk {position + 1}"
+    doc_id = node.metadata.get("doc_id")
+    return f"{doc_id}: {location}" if doc_id else location
+
+
+def dedup_nodes(nodes, threshold=JACCARD_THRESHOLD, report_path=DEDUP_REPORT_PATH):
+    """
+    Collapses near-identical chunks (same type, shingle Jaccard >= threshold) into
+    the first occurrence. The kept node records every merged position in
+    metadata["source_locations"] and takes over the merged nodes' article numbers, so
+    article-scoped searches still find it. Writes a JSON report of the merges and returns
+    the remaining nodes in document order.
+    """
+    print(f"Near-duplicate check over {len(nodes)} chunks...")
+    start = time.perf_counter()
+
+    # 1. Shingle + MinHash + LSH buckets
+    shingle_sets = [shingles(node.text) for node in nodes]
+    signatures = minhash_signatures(shingle_sets)
+    candidates = lsh_candidate_pairs(signatures)
+
+    # 2. Confirm candidates with the exact Jaccard; text never merges with tables, and
+    # chunks of different corpus documents stay apart so a document can be replaced alone
+    uf = _UnionFind(len(nodes))
+    similarities = {}
+    for i, j in candidates:
+        if nodes[i].metadata.get("type") != nodes[j].metadata.get("type"):
+            continue
+        if nodes[i].metadata.get("doc_id") != nodes[j].metadata.get("doc_id"):
+            continue
+        a, b = shingle_sets[i], shingle_sets[j]
+        if not a or not b:
+            continue
+        jaccard = len(a & b) / len(a | b)
+        if jaccard >= threshold:
+            uf.union(i, j)
+            similarities[(i, j)] = jaccard
+
+    groups = {}
+    for i in range(len(nodes)):
+        groups.setdefault(uf.find(i), []).append(i)
+
+    # 3. Keep the first node of each group, record where the others were
+    kept, merges = [], []
+    for root in sorted(groups):
+        members = groups[root]
+        node = nodes[root]
+        if len(members) > 1:
+            node.metadata["source_locations"] = [_location(nodes[m], m) for m in members]
+            node.metadata["duplicate_count"] = len(members)
+            if any("articles" in nodes[m].metadata for m in members):
+                node.metadata["articles"] = sorted({n for m in members for n in nodes[m].metadata.get("articles") or []})
+            for key in DEDUP_METADATA_KEYS:
+                if key not in node.excluded_embed_metadata_keys:
+                    node.excluded_embed_metadata_keys.append(key)
+                if key not in node.excluded_llm_metadata_keys:
+                    node.excluded_llm_metadata_keys.append(key)
+            merges.append({
+                "kept": _location(node, root),
+                "merged": [_location(nodes[m], m) for m in members[1:]],
+                "min_jaccard": min((s for pair, s in similarities.items()
+                                    if pair[0] in members and pair[1] in members), default=None),
+                "preview": node.text[:120],
+            })
+        kept.append(node)
+
+    report = {
+        "chunks_in": len(nodes),
+        "chunks_out": len(kept),
+        "removed": len(nodes) - len(kept),
+        "threshold": threshold,
+        "candidate_pairs": len(candidates),
+        "seconds": time.perf_counter() - start,
+        "merges": merges,
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+
+    print(f"Dedup: {len(nodes)} -> {len(kept)} chunks ({report['removed']} near-duplicates merged "
+          f"in {len(merges)} groups, {report['seconds']:.2f}s). Report: '{report_path}'")
+    return kept
+
+
+if __name__ == "__main__":
+    from chunk_process import load_and_chunk
+    dedup_nodes(load_and_chunk())
@@ -1,37 +1,125 @@
+import time
 from llama_index.core import VectorStoreIndex, Settings
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.vector_stores.qdrant import QdrantVectorStore
 from llama_index.core.storage import StorageContext
-import qdrant_client
 from chunk_process import load_and_chunk
+from article_router import ARTICLE_INDEX_PATH
+from vector_backend import open_vector_store, finalize_vector_store, writable_store_path, VECTOR_BACKEND
+from dedup_chunks import dedup_nodes
+from sharded_embed import resolve_workers, embed_nodes_sharded
+from instrumentation import get_metrics
+from model_registry import use_embed_model, get_registry
+
+# Nodes per vector store upsert in sharded mode
+UPSERT_BATCH_SIZE = 256
+
+def run_embedding(workers=None, md_file_path="sharjah_hr_law 8_marker.md", store_path=None,
+                  article_index_path=ARTICLE_INDEX_PATH):
+    # Fail before chunking writes the article index: once a version is promoted, builds
+    # go through index_versions.build_version, which keeps the article index in the version
+    writable_store_path(store_path)
 
-def run_embedding():
     # 1. Get Nodes from the chunking module
     # This calls the function solely dedicated to preparing the data
-    nodes = load_and_chunk("sharjah_hr_law 8_marker.md")
+    run = get_metrics()
+    with run.stage("chunking") as stage:
+        nodes = load_and_chunk(md_file_path, article_index_path=article_index_path)
+        stage.add("chunks", len(nodes))
+
+    vector_store = index_nodes(nodes, workers, store_path=store_path)
+    run.export("embed_process")
+    print("\n".join(get_registry().summary_lines()))
+    return vector_store
+
+
+def index_nodes(nodes, workers=None, replace_doc_ids=(), store_path=None):
+    """
+    Dedups, embeds and stores nodes in the text index at store_path (a versioned build),
+    or the legacy path when no version has been promoted; the live version is never
+    written in place. Chunks of every doc_id in replace_doc_ids are deleted first, so
+    re-ingesting a document replaces it. Returns the vector store.
+    """
+    run = get_metrics()
+    # Repeated headers/footers, definitions and table fragments are embedded once
+    with run.stage("dedup") as stage:
+        stage.add("chunks_in", len(nodes))
+        nodes = dedup_nodes(nodes)
+        stage.add("chunks_out", len(nodes))
+
+    # HR_EMBED_WORKERS / workers > 0: embed in parallel worker processes, then upsert
+    workers = resolve_workers(workers)
+    if workers > 0:
+        return run_sharded_embedding(nodes, workers, replace_doc_ids, store_path)
 
     # 2. Setup Encoding (BGE-M3)
+    # fp32 torch model from the shared registry: stored vectors are always full precision.
+    # Leased for this ingest only (loading is timed as "load_model_bge-m3"), so an idle
+    # timer may give its memory back afterwards
     print("Initializing BGE-M3 Embedding Model...")
-    embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3")
-    Settings.embed_model = embed_model
     Settings.llm = None
+    with use_embed_model(backend="torch") as embed_model:
+        # 3. Setup Vector DB (Local Qdrant by default, or the memory-mapped store)
+        print(f"Initializing Vector Store (backend: {VECTOR_BACKEND})...")
+        vector_store = open_vector_store(path=store_path, write=True)
+        delete_documents(vector_store, replace_doc_ids)
+        storage_context = StorageContext.from_defaults(vector_store=vector_store)
+
+        # 4. Index and Persist
+        print("Generating Embeddings & Indexing...")
+        # This step triggers the heavy lifting: running text through BGE-M3
+        with run.stage("embed_and_index", embeddings=len(nodes)):
+            index = VectorStoreIndex(
+                nodes=nodes,
+                storage_context=storage_context,
+                embed_model=embed_model,
+            )
+
+    with run.stage("finalize_store"):
+        finalize_vector_store(vector_store)
+
+    print("--- Indexing Complete! ---")
+    print(f"Data saved ({VECTOR_BACKEND} backend)")
+    return vector_store
+
+
+def delete_documents(vector_store, doc_ids):
+    """Removes earlier chunks of re-ingested documents (nothing to remove on a fresh index)."""
+    for doc_id in doc_ids:
+        try:
+            vector_store.delete(doc_id)
+        except Exception as e:
+            print(f"Warning: could not delete old chunks of '{doc_id}': {e}")
+
+
+def run_sharded_embedding(nodes, workers, replace_doc_ids=(), store_path=None):
+    """Embeds nodes across worker processes and upserts them in input order."""
+    # 1. Embed (each worker loads its own BGE-M3; the parent never loads the model)
+    run = get_metrics()
+    start = time.perf_counter()
+    with run.stage("embed_sharded", embeddings=len(nodes)):
+        embed_nodes_sharded(nodes, workers)
 
-    # 3. Setup Qdrant Vector DB (Local)
-    print("Initializing Qdrant Database (Local)...")
-    client = qdrant_client.QdrantClient(path="./qdrant_db")
-    vector_store = QdrantVectorStore(client=client, collection_name="hr_law_collection")
-    storage_context = StorageContext.from_defaults(vector_store=vector_store)
+    # 2. Upsert in fixed-size batches, in chunk order
+    print(f"Initializing Vector Store (backend: {VECTOR_BACKEND})...")
+    vector_store = open_vector_store(path=store_path, write=True)
+    delete_documents(vector_store, replace_doc_ids)
+    with run.stage("upsert", nodes=len(nodes)):
+        for i in range(0, len(nodes), UPSERT_BATCH_SIZE):
+            vector_store.add(nodes[i:i + UPSERT_BATCH_SIZE])
 
-    # 4. Index and Persist
-    print("Generating Embeddings & Indexing...")
-    # This step triggers the heavy lifting: running text through BGE-M3
-    index = VectorStoreIndex(
-        nodes=nodes,
-        storage_context=storage_context,
-    )
+    with run.stage("finalize_store"):
+        finalize_vector_store(vector_store)
 
+    elapsed = time.perf_counter() - start
     print("--- Indexing Complete! ---")
-    print("Data saved to ./qdrant_db")
+    print(f"Data saved ({VECTOR_BACKEND} backend): {len(nodes)} chunks in {elapsed:.1f}s "
+          f"({len(nodes) / elapsed if elapsed else 0.0:.1f} chunks/sec end to end)")
+    return vector_store
 
 if __name__ == "__main__":
-    run_embedding()
+    # Once versioned builds are in use, a rebuild goes into a new version (promote it separately)
+    from vector_backend import current_version
+    if current_version():
+        from index_versions import build_version
+        build_version()
+    else:
+        run_embedding()
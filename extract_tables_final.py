@@ -1,9 +1,10 @@
-import pdfplumber
 import pandas as pd
 from bidi.algorithm import get_display
 import os
 
 import json
+from instrumentation import get_metrics
+from pdf_page_cache import cached_pages
 
 # We intentionally removed arabic_reshaper because Method C (Bidi Only) was verified as correct.
 
@@ -43,7 +44,14 @@ def repair_text(text):
     
     return text
 
-def extract_tables_final(pdf_path):
+# pdfplumber table_settings for extract_tables(); part of the page cache key
+TABLE_SETTINGS = {}
+
+def raw_page_tables(page):
+    """Slow pdfplumber pass for one page: raw cells of every table, before repair/bidi (cached)."""
+    return page.extract_tables(TABLE_SETTINGS)
+
+def extract_tables_final(pdf_path, json_path="extracted_tables.json", chunks_path="rag_table_chunks_final.txt"):
     print(f"Processing full document: {pdf_path}...")
     
     output_dir = "extracted_tables_final"
@@ -54,16 +62,22 @@ def extract_tables_final(pdf_path):
     # Dictionary to store table data for JSON export
     all_tables_data = []
     total_tables = 0
+    run = get_metrics()
 
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            page_tables = page.extract_tables()
-            
+    # Raw cells come from the page cache; pdfplumber only runs for uncached pages
+    with run.stage("table_extract") as stage:
+        pages = cached_pages(pdf_path, "tables", TABLE_SETTINGS, raw_page_tables, stage)
+        stage.add("pages", len(pages))
+
+    with run.stage("table_repair") as stage:
+        for page_number, page_tables in pages:
+            i = page_number - 1
             if not page_tables:
                 continue
                 
             print(f"Page {i+1}: Found {len(page_tables)} tables")
             total_tables += len(page_tables)
+            stage.add("tables", len(page_tables))
             
             for j, table_data in enumerate(page_tables):
                 cleaned_data = [[cell if cell is not None else "" for cell in row] for row in table_data]
@@ -97,12 +111,11 @@ def extract_tables_final(pdf_path):
                 rag_chunks.append(f"--- Table from Page {i+1} ---\n{rag_chunk}")
 
     # Save to JSON
-    json_path = "extracted_tables.json"
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(all_tables_data, f, ensure_ascii=False, indent=4)
 
     # Save all RAG chunks
-    with open("rag_table_chunks_final.txt", "w", encoding="utf-8") as f:
+    with open(chunks_path, "w", encoding="utf-8") as f:
         f.write("\n\n".join(rag_chunks))
         
     print("\n" + "="*50)
@@ -110,8 +123,10 @@ def extract_tables_final(pdf_path):
     print(f"Total Tables Extracted: {total_tables}")
     print(f"JSON saved to: '{json_path}'")
     print(f"CSVs saved to: '{output_dir}/'")
-    print(f"RAG Text File: 'rag_table_chunks_final.txt'")
+    print(f"RAG Text File: '{chunks_path}'")
     print("="*50)
+    run.export("extract_tables_final")
+    return json_path
 
 if __name__ == "__main__":
     extract_tables_final("sharjah_hr_law 8.pdf")
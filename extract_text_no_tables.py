@@ -1,7 +1,8 @@
-import pdfplumber
 from bidi.algorithm import get_display
 import re
 import os
+from instrumentation import get_metrics
+from pdf_page_cache import cached_pages
 
 def repair_text(text):
     if not text: return ""
@@ -26,64 +27,81 @@ def repair_text(text):
     
     return text
 
-def extract_text_excluding_tables(pdf_path):
+# pdfplumber extract_text() settings; part of the page cache key
+TEXT_SETTINGS = {}
+
+def raw_page_text(page):
+    """Slow pdfplumber pass for one page: unrepaired text lines outside any table (cached)."""
+    # 1. Find Tables
+    tables = page.find_tables()
+
+    # 2. Define a filter to ignore text inside tables
+    def not_inside_tables(obj):
+        # Check if object (char) is inside any detected table bbox
+        obj_x = (obj['x0'] + obj['x1']) / 2
+        obj_y = (obj['top'] + obj['bottom']) / 2
+
+        for table in tables:
+            tx, ty, bx, by = table.bbox
+            if tx <= obj_x <= bx and ty <= obj_y <= by:
+                return False # It IS inside a table, so filter it OUT
+        return True
+
+    # 3. Create a filtered version of the page (Text Only)
+    clean_page = page.filter(not_inside_tables) if tables else page
+
+    # 4. Extract Text
+    content = clean_page.extract_text(**TEXT_SETTINGS)
+    return {"lines": content.split('\n') if content else [], "tables": len(tables)}
+
+def clean_lines(lines):
+    """Fast pass: repair_text + bidi display order, re-run on cached pages after rule changes."""
+    cleaned_lines = []
+    for line in lines:
+        line = repair_text(line)
+
+        # Apply Bidi ONLY if line has Arabic
+        if re.search(r'[\u0600-\u06FF]', line):
+            line = get_display(line)
+
+        cleaned_lines.append(line)
+    return cleaned_lines
+
+def extract_text_excluding_tables(pdf_path, output_file="rag_text_only.txt"):
     print(f"Processing text from {pdf_path} (Excluding Tables)...")
     
     rag_text_chunks = []
-    
-    with pdfplumber.open(pdf_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            # 1. Find Tables
-            tables = page.find_tables()
-            
-            # 2. Define a filter to ignore text inside tables
-            def not_inside_tables(obj):
-                # Check if object (char) is inside any detected table bbox
-                obj_x = (obj['x0'] + obj['x1']) / 2
-                obj_y = (obj['top'] + obj['bottom']) / 2
-                
-                for table in tables:
-                    tx, ty, bx, by = table.bbox
-                    if tx <= obj_x <= bx and ty <= obj_y <= by:
-                        return False # It IS inside a table, so filter it OUT
-                return True
-
-            # 3. Create a filtered version of the page (Text Only)
-            if tables:
-                clean_page = page.filter(not_inside_tables)
-            else:
-                clean_page = page
-            
-            # 4. Extract Text
-            content = clean_page.extract_text()
-            
-            if not content:
+    run = get_metrics()
+
+    # Raw page text comes from the page cache; pdfplumber only runs for uncached pages
+    with run.stage("text_extract") as stage:
+        pages = cached_pages(pdf_path, "text", TEXT_SETTINGS, raw_page_text, stage)
+        stage.add("pages", len(pages))
+
+    with run.stage("text_repair") as stage:
+        for page_number, raw in pages:
+            if raw["tables"]:
+                stage.add("pages_with_tables")
+            if not raw["lines"]:
                 continue
-                
+
             # 5. Fix Arabic/English
-            cleaned_lines = []
-            for line in content.split('\n'):
-                line = repair_text(line)
-                
-                # Apply Bidi ONLY if line has Arabic
-                if re.search(r'[\u0600-\u06FF]', line):
-                    line = get_display(line)
-                
-                cleaned_lines.append(line)
-            
+            cleaned_lines = clean_lines(raw["lines"])
             final_text = "\n".join(cleaned_lines)
+            stage.add("lines", len(cleaned_lines))
             
             # Add to list
-            chunk = f"--- Page {i+1} Text ---\n{final_text}\n"
+            chunk = f"--- Page {page_number} Text ---\n{final_text}\n"
             rag_text_chunks.append(chunk)
 
     # Save Results
-    output_file = "rag_text_only.txt"
     with open(output_file, "w", encoding="utf-8") as f:
         f.write("\n".join(rag_text_chunks))
         
     print(f"\nExtraction Complete.")
     print(f"Text (without tables) saved to: '{output_file}'")
+    run.export("extract_text_no_tables")
+    return output_file
 
 if __name__ == "__main__":
     extract_text_excluding_tables("sharjah_hr_law 8.pdf")
@@ -0,0 +1,218 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from llama_index.core import Settings
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.vector_stores import VectorStoreQuery
+
+
+def _with_scores(result):
+    scores = result.similarities or [None] * len(result.nodes)
+    return [NodeWithScore(node=node, score=score) for node, score in zip(result.nodes, scores)]
+
+
+def vector_store_source(vector_store):
+    """
+    Search function for a llama_index vector store (e.g. the hr_law_collection text index).
+    filters: optional MetadataFilters, applied by the store before scoring.
+    """
+    def search(embedding, k, filters=None):
+        return _with_scores(vector_store.query(
+            VectorStoreQuery(query_embedding=embedding, similarity_top_k=k, filters=filters)))
+
+    def batch(embeddings, k):
+        # MmapVectorStore scores a whole batch with one matmul, Qdrant takes one batched
+        # request; other stores loop
+        if hasattr(vector_store, "query_batch"):
+            return [_with_scores(r) for r in vector_store.query_batch(embeddings, k)]
+        if getattr(vector_store, "client", None) is not None and hasattr(vector_store.client, "query_batch_points"):
+            return _qdrant_batch(vector_store, embeddings, k)
+        return [search(e, k) for e in embeddings]
+
+    search.batch = batch
+    return search
+
+
+def _qdrant_batch(vector_store, embeddings, k):
+    """Batched search of a QdrantVectorStore; payloads hold the serialized llama_index nodes."""
+    from qdrant_client.http import models
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+    requests = [models.QueryRequest(query=e, limit=k, with_payload=True) for e in embeddings]
+    responses = vector_store.client.query_batch_points(collection_name=vector_store.collection_name,
+                                                       requests=requests)
+    return [[NodeWithScore(node=metadata_dict_to_node(point.payload), score=point.score) for point in r.points]
+            for r in responses]
+
+
+def _qdrant_filter(filters):
+    """Qdrant filter for the equality MetadataFilters the query side builds (search_scope.scope_filters)."""
+    from qdrant_client.http import models
+    return models.Filter(must=[models.FieldCondition(key=f.key, match=models.MatchValue(value=f.value))
+                               for f in filters.filters])
+
+
+def vision_table_source(client, collection_name):
+    """
+    Search function for the vision_tables collection written by step04_table_embedder.
+    Its payloads are plain {summary, folder, type, page} dicts, not llama_index nodes.
+    """
+    def to_nodes(points):
+        results = []
+        for point in points:
+            payload = point.payload or {}
+            node = TextNode(
+                id_=f"vision-{point.id}",
+                text=payload.get("summary", ""),
+                metadata={"type": payload.get("type", "table_rag"), "folder": payload.get("folder", ""),
+                          "page": payload.get("page")},
+            )
+            results.append(NodeWithScore(node=node, score=point.score))
+        return results
+
+    def search(embedding, k, filters=None):
+        points = client.query_points(collection_name=collection_name, query=embedding, limit=k, with_payload=True,
+                                     query_filter=_qdrant_filter(filters) if filters else None).points
+        return to_nodes(points)
+
+    def batch(embeddings, k):
+        from qdrant_client.http import models
+        requests = [models.QueryRequest(query=e, limit=k, with_payload=True) for e in embeddings]
+        responses = client.query_batch_points(collection_name=collection_name, requests=requests)
+        return [to_nodes(r.points) for r in responses]
+
+    search.batch = batch
+    return search
+
+
+class FanOutRetriever(BaseRetriever):
+    """
+    Embeds the query once, searches every source concurrently and merges the
+    ranked lists with reciprocal-rank fusion (RRF).
+
+    sources: {name: search(embedding, k, filters=None)}; quotas: {name: max slots in the final top_k}.
+    Results are ordered by fused rank; each NodeWithScore keeps its original cosine
+    similarity as score (all sources use BGE-M3, so similarities are comparable).
+
+    scope_fn(query_str) -> {name: MetadataFilters or None} narrows the search when the
+    question names its scope: a source mapped to filters is searched with them, one mapped
+    to None is skipped, unlisted sources are searched as usual. A filtered search that
+    finds nothing is retried unfiltered, so a wrong guess never empties the answer.
+    """
+    def __init__(self, sources, top_k=5, quotas=None, per_source_k=8, rrf_k=60, embed_model=None,
+                 scope_fn=None):
+        super().__init__()
+        self._sources = sources
+        self._top_k = top_k
+        self._quotas = quotas or {}
+        self._per_source_k = per_source_k
+        self._rrf_k = rrf_k
+        self._embed_model = embed_model
+        self._scope_fn = scope_fn
+        self._pool = ThreadPoolExecutor(max_workers=len(sources), thread_name_prefix="fanout")
+        self.last_timings = {}
+
+    def _retrieve(self, query_bundle):
+        embed_model = self._embed_model or Settings.embed_model
+        self.last_timings = {}
+
+        start = time.perf_counter()
+        embedding = query_bundle.embedding
+        if embedding is None:
+            embedding = embed_model.get_query_embedding(query_bundle.query_str)
+        embed_time = time.perf_counter() - start
+
+        scopes = self._scope_fn(query_bundle.query_str) if self._scope_fn else {}
+        start = time.perf_counter()
+        ranked = self._search_all(embedding, scopes)
+        search_time = time.perf_counter() - start
+
+        self.last_timings.update({"embed_s": embed_time, "search_s": search_time})
+        return self._fuse(ranked)
+
+    def retrieve_batch(self, embeddings, query_strs=None):
+        """
+        Retrieval for many pre-computed query embeddings at once: one batched search
+        per source (run concurrently), then per-query fusion. Returns one list per query.
+        With query_strs and a scope_fn, scoped queries are searched one by one with their filters.
+        """
+        scopes = [self._scope_fn(q) if self._scope_fn and q else {} for q in query_strs or [None] * len(embeddings)]
+
+        def run(name, search):
+            hits = [None] * len(embeddings)
+            plain = [i for i, scope in enumerate(scopes) if name not in scope]
+            try:
+                batch = getattr(search, "batch", None)
+                if batch is not None and plain:
+                    found = batch([embeddings[i] for i in plain], self._per_source_k)
+                else:
+                    found = [search(embeddings[i], self._per_source_k) for i in plain]
+                for i, result in zip(plain, found):
+                    hits[i] = result
+                for i, scope in enumerate(scopes):
+                    if name in scope:
+                        hits[i] = self._search_scoped(search, embeddings[i], scope[name])
+            except Exception as e:
+                print(f"Warning: batch search in '{name}' failed: {e}")
+                return name, [[] for _ in embeddings]
+            return name, hits
+
+        futures = [self._pool.submit(run, name, search) for name, search in self._sources.items()]
+        per_source = dict(future.result() for future in futures)
+        return [self._fuse({name: hits[i] for name, hits in per_source.items()})
+                for i in range(len(embeddings))]
+
+    def _search_scoped(self, search, embedding, filters):
+        if filters is None:
+            return []
+        hits = search(embedding, self._per_source_k, filters=filters)
+        return hits or search(embedding, self._per_source_k)
+
+    def _search_all(self, embedding, scopes=None):
+        scopes = scopes or {}
+
+        def timed(name, search):
+            start = time.perf_counter()
+            try:
+                if name in scopes:
+                    hits = self._search_scoped(search, embedding, scopes[name])
+                else:
+                    hits = search(embedding, self._per_source_k)
+            except Exception as e:
+                # One missing/broken store must not take the whole answer down
+                print(f"Warning: search in '{name}' failed: {e}")
+                hits = []
+            return name, hits, time.perf_counter() - start
+
+        futures = [self._pool.submit(timed, name, search) for name, search in self._sources.items()]
+        ranked = {}
+        for future in futures:
+            name, hits, elapsed = future.result()
+            ranked[name] = hits
+            self.last_timings[f"search_{name}_s"] = elapsed
+        return ranked
+
+    def _fuse(self, ranked):
+        fused = {}
+        for name, hits in ranked.items():
+            for rank, hit in enumerate(hits):
+                key = (name, hit.node.node_id)
+                if key not in fused:
+                    fused[key] = [0.0, name, hit]
+                fused[key][0] += 1.0 / (self._rrf_k + rank + 1)
+
+        ordered = sorted(fused.values(), key=lambda item: item[0], reverse=True)
+
+        # Fill top_k in fused order while respecting per-source quotas,
+        # then top up from whatever the quotas held back
+        selected, held_back, used = [], [], {}
+        for _, name, hit in ordered:
+            if used.get(name, 0) < self._quotas.get(name, self._top_k):
+                selected.append(hit)
+                used[name] = used.get(name, 0) + 1
+            else:
+                held_back.append(hit)
+            if len(selected) == self._top_k:
+                break
+        selected.extend(held_back[:self._top_k - len(selected)])
+        return selected
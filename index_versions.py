@@ -0,0 +1,289 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+from datetime import datetime
+from article_router import article_index_path
+from vector_backend import (
+    INDEXES_DIR, CURRENT_POINTER, VECTOR_BACKEND,
+    current_version, version_store_path, open_vector_store, close_vector_store,
+)
+
+# Smoke validation: golden-set questions must find a relevant chunk in the top SMOKE_K
+SMOKE_K = 10
+SMOKE_MIN_RECALL = float(os.environ.get("HR_SMOKE_MIN_RECALL", "0.7"))
+# Versions kept on disk by prune (the current one is always kept)
+KEEP_VERSIONS = 3
+# How often a query process checks the CURRENT pointer for a new version
+RELOAD_CHECK_SECONDS = 2.0
+
+HISTORY_PATH = os.path.join(INDEXES_DIR, "history.jsonl")
+BUILD_INFO = "build.json"
+
+
+def new_version_name():
+    return datetime.now().strftime("v%Y%m%d-%H%M%S")
+
+
+def _info_path(version):
+    return os.path.join(INDEXES_DIR, version, BUILD_INFO)
+
+
+def read_build_info(version):
+    with open(_info_path(version), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_build_info(version, info):
+    tmp_path = _info_path(version) + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(info, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, _info_path(version))
+
+
+def list_versions():
+    if not os.path.isdir(INDEXES_DIR):
+        return []
+    return sorted(name for name in os.listdir(INDEXES_DIR)
+                  if os.path.exists(_info_path(name)))
+
+
+def smoke_test(vector_store, golden_path=None, k=SMOKE_K, version=None):
+    """Recall@k of the golden set against one store (vector search only, no rerank)."""
+    from llama_index.core.vector_stores import VectorStoreQuery
+    from benchmark_retrieval import ChunkLocator, is_relevant, load_golden_set, percentile, GOLDEN_SET_PATH
+    from model_registry import get_query_embed_model
+
+    golden = load_golden_set(golden_path or GOLDEN_SET_PATH)
+    # Relevance is judged against the article index built with that store
+    locator = ChunkLocator(article_index_path(version) if version else None)
+    embed_model = get_query_embed_model()
+    embeddings = embed_model.get_text_embedding_batch([item["question"] for item in golden])
+
+    hits, latencies = 0, []
+    for item, embedding in zip(golden, embeddings):
+        start = time.perf_counter()
+        result = vector_store.query(VectorStoreQuery(query_embedding=embedding, similarity_top_k=k))
+        latencies.append(1000 * (time.perf_counter() - start))
+        if any(is_relevant(item, locator.locate(node)) for node in result.nodes):
+            hits += 1
+    return {
+        "questions": len(golden),
+        f"recall@{k}": hits / len(golden),
+        "search_p95_ms": percentile(latencies, 95),
+    }
+
+
+def build_version(version=None, workers=None, md_file_path="sharjah_hr_law 8_marker.md", validate=True):
+    """
+    Builds a complete index into indexes/<version>/ without touching the live one, then
+    runs the smoke set against it. Returns the version name.
+    """
+    from embed_process import run_embedding
+
+    version = version or new_version_name()
+    store_path = version_store_path(version)
+    if os.path.exists(store_path):
+        raise FileExistsError(f"Index version '{version}' already exists")
+    os.makedirs(store_path)
+
+    info = {"version": version, "backend": VECTOR_BACKEND, "source": md_file_path,
+            "created": datetime.now().isoformat(timespec="seconds"), "validated": False}
+    _write_build_info(version, info)
+
+    print(f"Building index version '{version}' ({VECTOR_BACKEND}) in {store_path}...")
+    start = time.perf_counter()
+    vector_store = run_embedding(workers, md_file_path, store_path=store_path,
+                                 article_index_path=article_index_path(version))
+    info["build_s"] = round(time.perf_counter() - start, 1)
+    _write_build_info(version, info)
+
+    if validate:
+        validate_version(version, vector_store)
+    close_vector_store(vector_store)
+    return version
+
+
+def fork_version(version=None, source="incremental"):
+    """
+    Starts a new version as a copy of the live one, for incremental ingest (adding or
+    replacing documents) without writing the store queries are reading. Validate and
+    promote it like a full build. Returns (version, store_path).
+    """
+    live = current_version()
+    if not live:
+        raise RuntimeError("No promoted index version to fork")
+    version = version or new_version_name()
+    store_path = version_store_path(version)
+    if os.path.exists(store_path):
+        raise FileExistsError(f"Index version '{version}' already exists")
+    print(f"Copying live index version '{live}' to '{version}'...")
+    shutil.copytree(version_store_path(live), store_path)
+    # The corpus ingest does not rebuild the article index, so the fork keeps the live one
+    if os.path.exists(article_index_path()):
+        shutil.copy2(article_index_path(), article_index_path(version))
+    _write_build_info(version, {"version": version, "backend": VECTOR_BACKEND, "source": source, "parent": live,
+                                "created": datetime.now().isoformat(timespec="seconds"), "validated": False})
+    return version, store_path
+
+
+def validate_version(version, vector_store=None):
+    """Smoke-tests a built version and records the result; promote() refuses unvalidated builds."""
+    info = read_build_info(version)
+    owns_store = vector_store is None
+    if owns_store:
+        vector_store = open_vector_store(backend=info["backend"], path=version_store_path(version, info["backend"]))
+    try:
+        report = smoke_test(vector_store, version=version)
+    finally:
+        if owns_store:
+            close_vector_store(vector_store)
+
+    recall = report[f"recall@{SMOKE_K}"]
+    info["smoke"] = report
+    info["validated"] = recall >= SMOKE_MIN_RECALL
+    _write_build_info(version, info)
+    print(f"Smoke test '{version}': recall@{SMOKE_K} {recall:.3f} "
+          f"(minimum {SMOKE_MIN_RECALL}) -> {'PASS' if info['validated'] else 'FAIL'}")
+    return info["validated"]
+
+
+def promote(version, force=False):
+    """Points indexes/CURRENT at version with an atomic rename; query processes switch on their next check."""
+    info = read_build_info(version)
+    if not info.get("validated") and not force:
+        raise RuntimeError(f"Version '{version}' has not passed validation (use force to override)")
+
+    previous = current_version()
+    tmp_path = CURRENT_POINTER + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, CURRENT_POINTER)
+
+    with open(HISTORY_PATH, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"promoted": version, "previous": previous,
+                            "at": datetime.now().isoformat(timespec="seconds")}) + "\n")
+    print(f"Promoted index version '{version}' (previous: {previous})")
+
+
+def rollback():
+    """Re-promotes the version that was live before the current one."""
+    if not os.path.exists(HISTORY_PATH):
+        raise RuntimeError("No promotion history to roll back")
+    with open(HISTORY_PATH, "r", encoding="utf-8") as f:
+        history = [json.loads(line) for line in f if line.strip()]
+    current = current_version()
+    for entry in reversed(history):
+        if entry["promoted"] == current and entry["previous"]:
+            promote(entry["previous"], force=True)
+            return entry["previous"]
+    raise RuntimeError(f"No earlier version recorded for '{current}'")
+
+
+def prune(keep=KEEP_VERSIONS):
+    """Deletes the oldest versions beyond `keep`, never the current one."""
+    current = current_version()
+    versions = list_versions()
+    removable = [v for v in versions[:-keep] if v != current] if keep else [v for v in versions if v != current]
+    for version in removable:
+        shutil.rmtree(os.path.join(INDEXES_DIR, version))
+        print(f"Removed index version '{version}'")
+    return removable
+
+
+class VersionedTextSource:
+    """
+    FanOutRetriever source that follows indexes/CURRENT. A promoted version is opened on a
+    background thread while queries keep using the old one, then swapped in; the old store
+    is closed one swap later so in-flight searches finish on it. With version given, that
+    version is searched and CURRENT is not followed (benchmarks of an unpromoted build).
+    """
+    def __init__(self, check_seconds=RELOAD_CHECK_SECONDS, version=None):
+        from fanout_retriever import vector_store_source
+        self._make_source = vector_store_source
+        self.check_seconds = check_seconds
+        self.pinned = version is not None
+        self.version = version or current_version()
+        self.store = open_vector_store(path=version_store_path(version) if version else None)
+        self._search = vector_store_source(self.store)
+        self._retired = None
+        self._checked = time.monotonic()
+        self._loading = False
+        self._lock = threading.Lock()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self.pinned or now - self._checked < self.check_seconds:
+            return
+        with self._lock:
+            self._checked = now
+            version = current_version()
+            if not version or version == self.version or self._loading:
+                return
+            self._loading = True
+        threading.Thread(target=self._load, args=(version,), daemon=True).start()
+
+    def _load(self, version):
+        try:
+            store = open_vector_store(path=version_store_path(version))
+            with self._lock:
+                if self._retired is not None:
+                    close_vector_store(self._retired)
+                self._retired = self.store
+                self.store, self._search, self.version = store, self._make_source(store), version
+            print(f"\n(Switched to index version '{version}')")
+        except Exception as e:
+            print(f"\nWarning: could not open index version '{version}': {e}")
+        finally:
+            self._loading = False
+
+    def as_source(self):
+        def search(embedding, k, filters=None):
+            self._maybe_reload()
+            return self._search(embedding, k, filters=filters)
+
+        def batch(embeddings, k):
+            self._maybe_reload()
+            return self._search.batch(embeddings, k)
+
+        search.batch = batch
+        return search
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Versioned (blue/green) text index builds.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="build and validate a new version")
+    build.add_argument("--version")
+    build.add_argument("--workers", default=None)
+    build.add_argument("--promote", action="store_true", help="promote if validation passes")
+    commands.add_parser("validate").add_argument("version")
+    promote_cmd = commands.add_parser("promote")
+    promote_cmd.add_argument("version")
+    promote_cmd.add_argument("--force", action="store_true")
+    commands.add_parser("rollback")
+    commands.add_parser("list")
+    commands.add_parser("prune").add_argument("--keep", type=int, default=KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        name = build_version(args.version, args.workers)
+        if args.promote and read_build_info(name)["validated"]:
+            promote(name)
+    elif args.command == "validate":
+        validate_version(args.version)
+    elif args.command == "promote":
+        promote(args.version, args.force)
+    elif args.command == "rollback":
+        rollback()
+    elif args.command == "list":
+        live = current_version()
+        for name in list_versions():
+            info = read_build_info(name)
+            smoke = info.get("smoke", {})
+            print(f"{'*' if name == live else ' '} {name}  {info['backend']:<6} "
+                  f"validated={info.get('validated')}  recall@{SMOKE_K}={smoke.get(f'recall@{SMOKE_K}')}")
+    elif args.command == "prune":
+        prune(args.keep)
@@ -0,0 +1,139 @@
+import os
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Shared stage timing and counters for the ingest, vision and query pipelines.
+# Recording is a perf_counter() pair plus a dict update under a lock, cheap enough
+# to stay on in production; reports are only written when a pipeline finishes.
+METRICS_DIR = os.environ.get("HR_METRICS_DIR", "run_reports")
+# "1" also writes a Prometheus text-format file next to each JSON report
+METRICS_PROM = os.environ.get("HR_METRICS_PROM", "0") == "1"
+
+
+class Stage:
+    """Handle yielded by RunMetrics.stage(); counts items processed inside the stage."""
+    def __init__(self):
+        self.items = {}
+
+    def add(self, name, n=1):
+        self.items[name] = self.items.get(name, 0) + n
+
+
+class RunMetrics:
+    """
+    Stage timings ({stage: runs, total_s, max_s, items}) and free-standing counters
+    for one process run. Items counted in a stage are reported as per-second rates
+    over that stage's time (pages/s, embeddings/s, ...).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = datetime.now()
+        self.t0 = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name, **items):
+        handle = Stage()
+        for key, n in items.items():
+            handle.add(key, n)
+        start = time.perf_counter()
+        try:
+            yield handle
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                entry = self.stages.setdefault(name, {"runs": 0, "total_s": 0.0, "max_s": 0.0, "items": {}})
+                entry["runs"] += 1
+                entry["total_s"] += elapsed
+                entry["max_s"] = max(entry["max_s"], elapsed)
+                for key, n in handle.items.items():
+                    entry["items"][key] = entry["items"].get(key, 0) + n
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def report(self, run_name="run"):
+        with self._lock:
+            stages = {name: dict(entry, items=dict(entry["items"])) for name, entry in self.stages.items()}
+            counters = dict(self.counters)
+        for entry in stages.values():
+            entry["rates_per_s"] = {key: n / entry["total_s"] if entry["total_s"] else 0.0
+                                    for key, n in entry["items"].items()}
+        return {
+            "run": run_name,
+            "started": self.started.isoformat(timespec="seconds"),
+            "wall_s": time.perf_counter() - self.t0,
+            "stages": stages,
+            "counters": counters,
+        }
+
+    def prometheus_text(self, run_name="run"):
+        """Prometheus exposition format (text/plain; version 0.0.4)."""
+        report = self.report(run_name)
+        stages = sorted(report["stages"].items())
+        run = f'run="{_label(run_name)}"'
+
+        # Each metric family is one contiguous group, as the format requires
+        lines = ["# TYPE hr_stage_seconds_total counter"]
+        lines += [f'hr_stage_seconds_total{{{run},stage="{_label(name)}"}} {entry["total_s"]:.6f}'
+                  for name, entry in stages]
+        lines.append("# TYPE hr_stage_runs_total counter")
+        lines += [f'hr_stage_runs_total{{{run},stage="{_label(name)}"}} {entry["runs"]}'
+                  for name, entry in stages]
+        lines.append("# TYPE hr_stage_items_total counter")
+        lines += [f'hr_stage_items_total{{{run},stage="{_label(name)}",item="{_label(key)}"}} {n}'
+                  for name, entry in stages for key, n in sorted(entry["items"].items())]
+        lines.append("# TYPE hr_events_total counter")
+        lines += [f'hr_events_total{{{run},name="{_label(name)}"}} {n}'
+                  for name, n in sorted(report["counters"].items())]
+        return "\n".join(lines) + "\n"
+
+    def summary_lines(self, run_name="run"):
+        report = self.report(run_name)
+        lines = [f"Run metrics ({run_name}, {report['wall_s']:.1f}s wall):"]
+        for name, entry in report["stages"].items():
+            rates = ", ".join(f"{n} {key} ({entry['rates_per_s'][key]:.1f}/s)"
+                              for key, n in entry["items"].items())
+            lines.append(f"  {name:<28} {entry['total_s']:8.2f}s  x{entry['runs']:<4} {rates}")
+        for name, n in report["counters"].items():
+            lines.append(f"  {name:<28} {n}")
+        return lines
+
+    def export(self, run_name, metrics_dir=None):
+        """Writes the JSON run report (and the Prometheus file if enabled); returns the JSON path."""
+        metrics_dir = metrics_dir or METRICS_DIR
+        os.makedirs(metrics_dir, exist_ok=True)
+        stamp = self.started.strftime("%Y%m%d_%H%M%S")
+        # pid keeps reports of parallel worker processes apart
+        path = os.path.join(metrics_dir, f"{run_name}_{stamp}_{os.getpid()}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(run_name), f, ensure_ascii=False, indent=1)
+        if METRICS_PROM:
+            with open(path[:-len(".json")] + ".prom", "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text(run_name))
+        print("\n".join(self.summary_lines(run_name)))
+        print(f"Run report saved to '{path}'")
+        return path
+
+
+def _label(value):
+    return re.sub(r'["\\\n]', "_", str(value))
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Process-wide RunMetrics shared by every pipeline stage."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = RunMetrics()
+        return _metrics
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from mock_ollama_server import start_mock_server, add_sim_arguments, sim_options
+from benchmark_retrieval import percentile, GOLDEN_SET_PATH, RESULTS_DIR
+
+PHASES = ["queue", "embed", "retrieve", "rerank_pack", "ttft", "generate", "total"]
+
+
+class QueryPath:
+    """
+    The query_rag_ollama pipeline split into timed phases. Generation streams through
+    the same LLM and synthesizer mode as RetrieverQueryEngine, so time-to-first-token
+    is measurable.
+    """
+    def __init__(self, rag):
+        from llama_index.core import get_response_synthesizer
+        self.rag = rag
+        self.synthesizer = get_response_synthesizer(llm=rag["llm"], streaming=True)
+
+    def run(self, question):
+        from llama_index.core.schema import QueryBundle
+        timings = {}
+
+        start = time.perf_counter()
+        embedding = self.rag["embed_model"].get_query_embedding(question)
+        timings["embed"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bundle = QueryBundle(question, embedding=embedding)
+        nodes = self.rag["retriever"].retrieve(bundle)
+        timings["retrieve"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for postprocessor in self.rag["postprocessors"]:
+            nodes = postprocessor.postprocess_nodes(nodes, query_bundle=bundle)
+        timings["rerank_pack"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        response = self.synthesizer.synthesize(bundle, nodes)
+        first_token = None
+        for delta in response.response_gen:
+            if first_token is None and delta:
+                first_token = time.perf_counter()
+        end = time.perf_counter()
+        timings["ttft"] = (first_token or end) - start
+        timings["generate"] = end - start
+        return timings
+
+
+def run_load_test(questions, concurrency=4, rate=0.0, total=None, seed=0):
+    """
+    Replays questions (cycled up to `total` requests) against the query path.
+    rate > 0: open loop, Poisson arrivals at `rate` requests/s; rate = 0: closed loop,
+    every request queued at once. Queue delay is arrival -> a worker picking it up.
+    """
+    from query_rag_ollama import build_query_engine
+
+    rag = build_query_engine()
+    path = QueryPath(rag)
+    # First request pays model load / lazy init on every stage, keep it out of the numbers
+    print("Warm-up request...")
+    path.run(questions[0])
+
+    total = total or len(questions)
+    rng = random.Random(seed)
+    results, errors = [], []
+    lock = threading.Lock()
+
+    def handle(question, arrived):
+        picked = time.perf_counter()
+        try:
+            timings = path.run(question)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+            return
+        timings["queue"] = picked - arrived
+        timings["total"] = time.perf_counter() - arrived
+        with lock:
+            results.append(timings)
+
+    print(f"Load test: {total} requests, concurrency {concurrency}, "
+          f"{'closed loop' if not rate else f'{rate} req/s Poisson arrivals'}")
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(total):
+            if rate:
+                time.sleep(rng.expovariate(rate))
+            pool.submit(handle, questions[i % len(questions)], time.perf_counter())
+    wall = time.perf_counter() - start
+
+    phases = {}
+    for phase in PHASES:
+        values = [1000 * r[phase] for r in results]
+        phases[phase] = {f"p{p}_ms": percentile(values, p) for p in (50, 95, 99)}
+        phases[phase]["mean_ms"] = sum(values) / len(values) if values else None
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "concurrency": concurrency,
+        "arrival_rate": rate,
+        "requests": total,
+        "completed": len(results),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_s": wall,
+        "throughput_rps": len(results) / wall if wall else 0.0,
+        "phases": phases,
+        "ollama": rag["llm"].client.metrics.summary(),
+    }
+
+
+def print_report(report):
+    print(f"\nCompleted {report['completed']}/{report['requests']} requests in {report['wall_s']:.1f}s "
+          f"({report['throughput_rps']:.2f} req/s, {report['errors']} errors)")
+    print(f"  {'phase':<12} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    for phase, stats in report["phases"].items():
+        cells = " ".join(f"{stats[k]:>10.1f}" if stats[k] is not None else f"{'-':>10}"
+                         for k in ("p50_ms", "p95_ms", "p99_ms"))
+        print(f"  {phase:<12} {cells}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrency/arrival-rate load test of the query path.")
+    parser.add_argument("--questions", default=GOLDEN_SET_PATH, help=".jsonl or .csv with a 'question' field")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0.0, help="arrivals per second (0 = closed loop)")
+    parser.add_argument("--requests", type=int, default=None, help="total requests (default: one per question)")
+    parser.add_argument("--mock", action="store_true", help="generate against a local mock Ollama server")
+    add_sim_arguments(parser)
+    args = parser.parse_args()
+
+    if args.mock:
+        # Must happen before ollama_client is imported (it reads OLLAMA_HOST at import)
+        _, url = start_mock_server(**sim_options(args))
+        os.environ["OLLAMA_HOST"] = url
+        print(f"Using mock Ollama at {url}")
+
+    from batch_query import load_questions
+    questions = [item["question"] for item in load_questions(args.questions)]
+    report = run_load_test(questions, args.concurrency, args.rate, args.requests)
+    report["mock"] = sim_options(args) if args.mock else None
+    print_report(report)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(RESULTS_DIR, f"load_{report['timestamp'].replace(':', '').replace('-', '')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    print(f"Report saved to '{out_path}'")
@@ -0,0 +1,373 @@
+import os
+import re
+import json
+import time
+import shutil
+import numpy as np
+from typing import Any
+from pydantic import PrivateAttr
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore, VectorStoreQueryResult, MetadataFilters, FilterOperator, FilterCondition,
+)
+from llama_index.core.vector_stores.utils import node_to_metadata_dict, metadata_dict_to_node
+from reduced_prefilter import ReducedPrefilter, PREFILTER_DIRNAME
+
+# Rows scored per matmul block; keeps the float32 upcast of a block small
+SCORE_BLOCK_ROWS = 16384
+SUPPORTED_DTYPES = ("float16", "int8")
+# Data files of stores persisted before meta.json named its files
+LEGACY_FILES = {"vectors": "vectors.npy", "scales": "scales.npy", "nodes": "nodes.jsonl"}
+DATA_FILE = re.compile(r"^(vectors|scales|nodes)(-[0-9a-f]+)?\.(npy|jsonl)$")
+# Loads retried when a persist replaces the files a reader is opening
+LOAD_ATTEMPTS = 3
+
+
+def quantize(vectors, dtype):
+    """
+    Normalizes (cosine) and quantizes float32 vectors.
+    Returns (stored_vectors, scales); scales is None for float16.
+    int8 uses one symmetric scale per vector: v ~= q * scale.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.maximum(norms, 1e-12)
+
+    if dtype == "float16":
+        return vectors.astype(np.float16), None
+
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales = np.maximum(scales, 1e-12).astype(np.float32)
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales
+
+
+def score_all(vectors, scales, query):
+    """Cosine scores of a normalized float32 query against every stored row, block by block."""
+    scores = np.empty(vectors.shape[0], dtype=np.float32)
+    for start in range(0, vectors.shape[0], SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        scores[start:start + len(block)] = block @ query
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def dequantize(vectors, scales):
+    """Dequantized float32 copy of the stored vectors (used to fit projections at ingest)."""
+    full = np.asarray(vectors, dtype=np.float32)
+    if scales is not None:
+        full = full * scales[:, None]
+    return full
+
+
+def _match_value(field, operator, value):
+    # List fields (e.g. "articles") match when any element does, as in Qdrant
+    values = field if isinstance(field, list) else [field]
+    if operator == FilterOperator.EQ:
+        return value in values
+    if operator == FilterOperator.NE:
+        return value not in values
+    if operator == FilterOperator.IN:
+        return any(v in value for v in values)
+    if operator == FilterOperator.NIN:
+        return not any(v in value for v in values)
+    if operator == FilterOperator.CONTAINS:
+        return isinstance(field, list) and value in field
+    comparisons = {
+        FilterOperator.GT: lambda v: v > value, FilterOperator.GTE: lambda v: v >= value,
+        FilterOperator.LT: lambda v: v < value, FilterOperator.LTE: lambda v: v <= value,
+    }
+    if operator in comparisons:
+        return any(v is not None and comparisons[operator](v) for v in values)
+    raise ValueError(f"MmapVectorStore does not support filter operator '{operator}'")
+
+
+def payload_matches(payload, filters):
+    """Evaluates llama_index MetadataFilters (nested, AND/OR) against one stored payload."""
+    results = []
+    for item in filters.filters:
+        if isinstance(item, MetadataFilters):
+            results.append(payload_matches(payload, item))
+        elif item.key not in payload:
+            results.append(item.operator in (FilterOperator.NE, FilterOperator.NIN))
+        else:
+            results.append(_match_value(payload[item.key], item.operator, item.value))
+    if filters.condition == FilterCondition.OR:
+        return any(results)
+    return all(results)
+
+
+def top_k(scores, k):
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx])]
+    # Removed rows score -inf; never return them when k exceeds the live rows
+    return idx[np.isfinite(scores[idx])]
+
+
+class MmapVectorStore(BasePydanticVectorStore):
+    """
+    Local vector store that keeps quantized (float16/int8) vectors in a .npy file
+    opened with mmap_mode="r". Read-only query processes share the vectors through
+    the OS page cache, start instantly and take no lock, unlike local-mode Qdrant.
+
+    Layout of persist_dir (<gen> changes on every persist, see persist()):
+        meta.json           dtype, dim, count and the data file names below
+        vectors-<gen>.npy   (count, dim) float16 or int8
+        scales-<gen>.npy    (count,) float32 per-vector scale, int8 only
+        nodes-<gen>.jsonl   one serialized node per row (same format as the Qdrant payloads)
+        prefilter/          optional reduced-dimension copy for two-stage search (see build_prefilter)
+
+    With prefilter_candidates > 0 and a prefilter on disk, queries first scan the
+    reduced copy for that many candidates and re-score only those with the full vectors.
+    Queries with metadata filters score only the matching rows (exact, no prefilter).
+    """
+    stores_text: bool = True
+    flat_metadata: bool = False
+
+    persist_dir: str
+    dtype: str = "float16"
+    prefilter_candidates: int = 0
+
+    _prefilter: Any = PrivateAttr(default=None)
+    _vectors: Any = PrivateAttr(default=None)
+    _scales: Any = PrivateAttr(default=None)
+    _payloads: list = PrivateAttr(default_factory=list)
+    _pending_vectors: list = PrivateAttr(default_factory=list)
+    _pending_payloads: list = PrivateAttr(default_factory=list)
+    _removed: set = PrivateAttr(default_factory=set)
+    _filter_rows: dict = PrivateAttr(default_factory=dict)
+
+    def __init__(self, persist_dir, dtype="float16", **kwargs):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+        super().__init__(persist_dir=persist_dir, dtype=dtype, **kwargs)
+        if os.path.exists(os.path.join(persist_dir, "meta.json")):
+            self._load()
+
+    @classmethod
+    def class_name(cls):
+        return "MmapVectorStore"
+
+    @property
+    def client(self):
+        return None
+
+    def __len__(self):
+        return (0 if self._vectors is None else len(self._vectors)) + len(self._pending_payloads)
+
+    # --- Loading / persisting ---
+
+    def _load(self):
+        # A persist in another process may swap the files between reading meta.json and
+        # opening them; re-reading meta.json then finds the new, complete set
+        for attempt in range(1, LOAD_ATTEMPTS + 1):
+            try:
+                self._load_files()
+                break
+            except (FileNotFoundError, ValueError) as e:
+                if attempt == LOAD_ATTEMPTS:
+                    raise RuntimeError(f"Could not load a consistent index from {self.persist_dir}: {e}")
+                time.sleep(0.1 * attempt)
+        self._removed = set()
+        self._filter_rows = {}
+        self._prefilter = ReducedPrefilter.load(self.persist_dir, expected_count=len(self._vectors))
+
+    def _load_files(self):
+        with open(os.path.join(self.persist_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        files = meta.get("files", LEGACY_FILES)
+        dtype = meta["dtype"]
+        vectors = np.load(os.path.join(self.persist_dir, files["vectors"]), mmap_mode="r")
+        scales = np.load(os.path.join(self.persist_dir, files["scales"])) if dtype == "int8" else None
+        with open(os.path.join(self.persist_dir, files["nodes"]), "r", encoding="utf-8") as f:
+            payloads = [json.loads(line) for line in f]
+        # Rows, scales and payloads must all describe the same persist
+        counts = {len(vectors), len(payloads), meta["count"]} | ({len(scales)} if scales is not None else set())
+        if len(counts) != 1:
+            raise ValueError(f"row counts disagree (meta {meta['count']}, vectors {len(vectors)}, "
+                             f"nodes {len(payloads)})")
+        self.dtype, self._vectors, self._scales, self._payloads = dtype, vectors, scales, payloads
+
+    def dequantized_vectors(self):
+        return dequantize(self._vectors, self._scales)
+
+    def sample_rows(self, limit):
+        """(payloads, float32 vectors) of the first limit persisted rows."""
+        if self._vectors is None:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        scales = self._scales[:limit] if self._scales is not None else None
+        return self._payloads[:limit], dequantize(self._vectors[:limit], scales)
+
+    def build_prefilter(self, dim=256, method="pca"):
+        """Fits the reduced projection on the persisted vectors and saves the reduced copy."""
+        if self._vectors is None:
+            raise RuntimeError("Persist the index before building a prefilter")
+        start = time.perf_counter()
+        full = self.dequantized_vectors()
+        self._prefilter = ReducedPrefilter.build(full, dim=dim, method=method)
+        self._prefilter.save(self.persist_dir)
+        print(f"Prefilter: {method} {full.shape[1]} -> {dim} dims over {len(full)} vectors "
+              f"in {time.perf_counter() - start:.2f}s")
+        return self._prefilter
+
+    def persist(self, persist_path=None, fs=None):
+        """
+        Writes pending rows (and drops deleted ones). Data files get a new generation
+        name and meta.json, which names them, is replaced last: a reader sees either the
+        old or the new set, never a mix. Older generations are deleted afterwards (open
+        mmaps of them stay valid).
+        """
+        os.makedirs(self.persist_dir, exist_ok=True)
+
+        keep = [i for i in range(len(self._payloads)) if i not in self._removed]
+        parts, scale_parts = [], []
+        if self._vectors is not None and keep:
+            parts.append(np.asarray(self._vectors[keep]))
+            if self._scales is not None:
+                scale_parts.append(self._scales[keep])
+        if self._pending_vectors:
+            new_vectors, new_scales = quantize(self._pending_vectors, self.dtype)
+            parts.append(new_vectors)
+            if new_scales is not None:
+                scale_parts.append(new_scales)
+        if not parts:
+            print("MmapVectorStore: nothing to persist.")
+            return
+
+        vectors = np.concatenate(parts)
+        payloads = [self._payloads[i] for i in keep] + self._pending_payloads
+
+        def write_atomic(name, writer):
+            tmp = os.path.join(self.persist_dir, name + ".tmp")
+            with open(tmp, "wb") as f:
+                writer(f)
+            os.replace(tmp, os.path.join(self.persist_dir, name))
+
+        generation = f"{time.time_ns():x}"
+        files = {"vectors": f"vectors-{generation}.npy", "nodes": f"nodes-{generation}.jsonl"}
+        write_atomic(files["vectors"], lambda f: np.save(f, vectors))
+        if self.dtype == "int8":
+            files["scales"] = f"scales-{generation}.npy"
+            write_atomic(files["scales"], lambda f: np.save(f, np.concatenate(scale_parts)))
+        write_atomic(files["nodes"], lambda f: f.write(
+            "".join(json.dumps(p, ensure_ascii=False) + "\n" for p in payloads).encode("utf-8")))
+        # Any reduced copy now describes the old rows; build_prefilter() must be re-run
+        shutil.rmtree(os.path.join(self.persist_dir, PREFILTER_DIRNAME), ignore_errors=True)
+        # meta.json last: readers treat it as the commit marker
+        meta = {"dtype": self.dtype, "dim": int(vectors.shape[1]), "count": int(vectors.shape[0]), "files": files}
+        write_atomic("meta.json", lambda f: f.write(json.dumps(meta).encode("utf-8")))
+        for name in os.listdir(self.persist_dir):
+            if DATA_FILE.match(name) and name not in files.values():
+                os.remove(os.path.join(self.persist_dir, name))
+
+        self._pending_vectors, self._pending_payloads = [], []
+        self._load()
+        print(f"MmapVectorStore: saved {len(payloads)} vectors ({self.dtype}) to {self.persist_dir}")
+
+    # --- BasePydanticVectorStore API ---
+
+    def add(self, nodes, **add_kwargs):
+        ids = []
+        for node in nodes:
+            payload = node_to_metadata_dict(node, remove_text=False, flat_metadata=self.flat_metadata)
+            payload["id"] = node.node_id
+            self._pending_vectors.append(node.get_embedding())
+            self._pending_payloads.append(payload)
+            ids.append(node.node_id)
+        return ids
+
+    def delete(self, ref_doc_id, **delete_kwargs):
+        for i, payload in enumerate(self._payloads):
+            if payload.get("doc_id") == ref_doc_id or payload.get("ref_doc_id") == ref_doc_id:
+                self._removed.add(i)
+        self._filter_rows = {}
+        keep = [i for i, p in enumerate(self._pending_payloads)
+                if p.get("doc_id") != ref_doc_id and p.get("ref_doc_id") != ref_doc_id]
+        self._pending_vectors = [self._pending_vectors[i] for i in keep]
+        self._pending_payloads = [self._pending_payloads[i] for i in keep]
+
+    def query(self, query, **kwargs):
+        if self._vectors is None or len(self._vectors) == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+
+        q = np.asarray(query.query_embedding, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+
+        if query.filters is not None and query.filters.filters:
+            return self._filtered_query(q, query.similarity_top_k, query.filters)
+
+        if self.prefilter_candidates and self._prefilter is not None:
+            return self._two_stage_query(q, query.similarity_top_k)
+
+        scores = score_all(self._vectors, self._scales, q)
+        if self._removed:
+            scores[list(self._removed)] = -np.inf
+        rows = top_k(scores, query.similarity_top_k)
+        return self._result(rows, scores[rows])
+
+    def query_batch(self, embeddings, k):
+        """Full-vector search for many queries with one (rows x queries) matmul per block."""
+        if self._vectors is None or len(self._vectors) == 0:
+            return [VectorStoreQueryResult(nodes=[], similarities=[], ids=[]) for _ in embeddings]
+
+        queries = np.asarray(embeddings, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        scores = np.empty((len(self._vectors), len(queries)), dtype=np.float32)
+        for start in range(0, len(self._vectors), SCORE_BLOCK_ROWS):
+            block = np.asarray(self._vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ queries.T
+        if self._scales is not None:
+            scores *= self._scales[:, None]
+        if self._removed:
+            scores[list(self._removed)] = -np.inf
+
+        results = []
+        for j in range(len(queries)):
+            rows = top_k(scores[:, j], k)
+            results.append(self._result(rows, scores[rows, j]))
+        return results
+
+    def matching_rows(self, filters):
+        """Row numbers whose payload matches filters; cached per filter set until the rows change."""
+        key = repr(filters)
+        rows = self._filter_rows.get(key)
+        if rows is None:
+            rows = np.array([i for i, payload in enumerate(self._payloads)
+                             if i not in self._removed and payload_matches(payload, filters)], dtype=np.int64)
+            self._filter_rows[key] = rows
+        return rows
+
+    def _filtered_query(self, q, k, filters):
+        # Filter first, then score only the surviving rows
+        rows = self.matching_rows(filters)
+        if len(rows) == 0:
+            return VectorStoreQueryResult(nodes=[], similarities=[], ids=[])
+        scores = np.asarray(self._vectors[rows], dtype=np.float32) @ q
+        if self._scales is not None:
+            scores *= self._scales[rows]
+        best = top_k(scores, k)
+        return self._result(rows[best], scores[best])
+
+    def _two_stage_query(self, q, k):
+        # Stage 1: candidates from the reduced copy; Stage 2: exact re-score on full vectors
+        rows = np.sort(self._prefilter.candidates(q, self.prefilter_candidates + len(self._removed)))
+        if self._removed:
+            rows = rows[~np.isin(rows, list(self._removed))]
+        scores = np.asarray(self._vectors[rows], dtype=np.float32) @ q
+        if self._scales is not None:
+            scores *= self._scales[rows]
+        best = top_k(scores, k)
+        return self._result(rows[best], scores[best])
+
+    def _result(self, rows, row_scores):
+        nodes, similarities, ids = [], [], []
+        for row, score in zip(rows, row_scores):
+            payload = self._payloads[int(row)]
+            node = metadata_dict_to_node(payload)
+            nodes.append(node)
+            similarities.append(float(score))
+            ids.append(payload["id"])
+        return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
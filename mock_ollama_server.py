@@ -0,0 +1,226 @@
+import json
+import time
+import random
+import select
+import socket
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Simulated model speed, roughly qwen3:8b on a mid-range GPU
+DEFAULT_PROMPT_EVAL_RATE = 800.0   # prompt tokens/s
+DEFAULT_EVAL_RATE = 35.0           # generated tokens/s
+DEFAULT_RESPONSE_TOKENS = 150
+DEFAULT_LOAD_TIME = 3.0            # seconds, paid by the first request per model
+# Requests generating at once; like OLLAMA_NUM_PARALLEL, the rest wait for a slot
+DEFAULT_PARALLEL = 1
+
+FILLER = "هذا نص تجريبي من خادم المحاكاة ".split()
+
+
+def estimate_tokens(text):
+    """Rough BPE token count (~4 chars per token) for simulated prompt-eval time."""
+    return max(1, len(text) // 4)
+
+
+class MockOllama:
+    """Shared simulation state: model residency and generation slots."""
+    def __init__(self, prompt_eval_rate=DEFAULT_PROMPT_EVAL_RATE, eval_rate=DEFAULT_EVAL_RATE,
+                 response_tokens=DEFAULT_RESPONSE_TOKENS, load_time=DEFAULT_LOAD_TIME,
+                 parallel=DEFAULT_PARALLEL, jitter=0.1):
+        self.prompt_eval_rate = prompt_eval_rate
+        self.eval_rate = eval_rate
+        self.response_tokens = response_tokens
+        self.load_time = load_time
+        self.jitter = jitter
+        self.slots = threading.Semaphore(parallel)
+        self.loaded = set()
+        self.lock = threading.Lock()
+        # Generations abandoned because the client hung up (Ollama stops on disconnect)
+        self.aborted = []
+
+    def _jittered(self, seconds):
+        return max(0.0, seconds * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def load(self, model):
+        """Returns the simulated load duration (0 once the model is resident)."""
+        with self.lock:
+            if model in self.loaded:
+                return 0.0
+            self.loaded.add(model)
+        time.sleep(self.load_time)
+        return self.load_time
+
+    def _wait(self, seconds, connected):
+        # Like Ollama, stop working on a prompt as soon as the client disconnects
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            if connected is not None and not connected():
+                with self.lock:
+                    self.aborted.append(time.perf_counter())
+                raise ConnectionResetError("client disconnected")
+            time.sleep(min(0.05, max(end - time.perf_counter(), 0)))
+
+    def run(self, model, prompt, emit, stream, connected=None):
+        """
+        Simulates one generation: waits for a slot, loads the model if needed, spends
+        prompt-eval time, then produces tokens at eval_rate. emit(chunk) sends a chunk;
+        connected() (streaming only) reports whether the client is still there.
+        """
+        start = time.perf_counter()
+        with self.slots:
+            load_s = self.load(model)
+            if not prompt:
+                # Empty prompt = load only (OllamaClient.warmup)
+                emit({"model": model, "response": "", "done": True,
+                      "load_duration": int(load_s * 1e9), "total_duration": int((time.perf_counter() - start) * 1e9)})
+                return
+
+            prompt_tokens = estimate_tokens(prompt)
+            prompt_eval_s = self._jittered(prompt_tokens / self.prompt_eval_rate)
+            self._wait(prompt_eval_s, connected)
+
+            eval_start = time.perf_counter()
+            tokens = []
+            per_token = 1.0 / self.eval_rate
+            for i in range(self.response_tokens):
+                self._wait(self._jittered(per_token), connected)
+                token = FILLER[i % len(FILLER)] + " "
+                tokens.append(token)
+                if stream:
+                    emit({"model": model, "response": token, "done": False})
+            eval_s = time.perf_counter() - eval_start
+
+        final = {
+            "model": model,
+            "response": "" if stream else "".join(tokens),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((time.perf_counter() - start) * 1e9),
+            "load_duration": int(load_s * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_eval_s * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(eval_s * 1e9),
+        }
+        emit(final)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    sim = None
+
+    def log_message(self, format, *args):
+        pass  # Keep load-test output readable
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": m} for m in sorted(self.sim.loaded)]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "mock"})
+        else:
+            self._send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        model = body.get("model", "mock")
+        stream = body.get("stream", True)  # Ollama streams unless told otherwise
+
+        if self.path == "/api/generate":
+            prompt, chat = body.get("prompt", ""), False
+        elif self.path == "/api/chat":
+            messages = body.get("messages", [])
+            prompt, chat = "\n".join(m.get("content", "") for m in messages), True
+        else:
+            self._send_json({"error": "not found"}, status=404)
+            return
+
+        def shape(chunk):
+            if chat:
+                chunk = dict(chunk)
+                chunk["message"] = {"role": "assistant", "content": chunk.pop("response", "")}
+            return chunk
+
+        # A load-only request (empty prompt) gets a single JSON object, streaming or not
+        if not stream or not prompt:
+            result = {}
+            self.sim.run(model, prompt, result.update, stream=False)
+            self._send_json(shape(result))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def emit(chunk):
+            data = (json.dumps(shape(chunk), ensure_ascii=False) + "\n").encode("utf-8")
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            self.sim.run(model, prompt, emit, stream=True, connected=self._connected)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client cancelled, as OllamaClient.generate_stream does on cancel_event
+
+    def _connected(self):
+        # A closed connection reads as readable with no data
+        readable, _, _ = select.select([self.connection], [], [], 0)
+        if not readable:
+            return True
+        try:
+            return self.connection.recv(1, socket.MSG_PEEK) != b""
+        except OSError:
+            return False
+
+    def _send_json(self, payload, status=200):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_mock_server(host="127.0.0.1", port=0, **sim_options):
+    """Starts the mock on a background thread; returns (server, base_url). port=0 picks a free port."""
+    handler = type("MockOllamaHandler", (_Handler,), {"sim": MockOllama(**sim_options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_sim_arguments(parser):
+    parser.add_argument("--prompt-eval-rate", type=float, default=DEFAULT_PROMPT_EVAL_RATE)
+    parser.add_argument("--eval-rate", type=float, default=DEFAULT_EVAL_RATE)
+    parser.add_argument("--response-tokens", type=int, default=DEFAULT_RESPONSE_TOKENS)
+    parser.add_argument("--load-time", type=float, default=DEFAULT_LOAD_TIME)
+    parser.add_argument("--parallel", type=int, default=DEFAULT_PARALLEL)
+
+
+def sim_options(args):
+    return {
+        "prompt_eval_rate": args.prompt_eval_rate,
+        "eval_rate": args.eval_rate,
+        "response_tokens": args.response_tokens,
+        "load_time": args.load_time,
+        "parallel": args.parallel,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock of the Ollama generate/chat API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    add_sim_arguments(parser)
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.host, args.port, **sim_options(args))
+    print(f"Mock Ollama listening on {url} (set OLLAMA_HOST={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
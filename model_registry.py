@@ -0,0 +1,274 @@
+import os
+import gc
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from instrumentation import get_metrics
+
+# One copy of each heavy model per process (BGE-M3, Marker), loaded on first use and
+# shared by every stage that runs in that process.
+# Device for shared models: "auto" (cuda when available), "cpu" or "cuda"
+MODEL_DEVICE = os.environ.get("HR_MODEL_DEVICE", "auto")
+# torch intra-op threads for shared models (0 = torch default)
+MODEL_THREADS = int(os.environ.get("HR_MODEL_THREADS", "0"))
+# Unload a model after this many idle seconds (0 = keep it until the process exits).
+# Only models taken through ModelRegistry.use() are unloaded: get() callers keep their
+# reference, so dropping the registry's copy would free nothing and load a second one
+MODEL_IDLE_UNLOAD_S = float(os.environ.get("HR_MODEL_IDLE_UNLOAD", "0"))
+
+
+def resolve_device(device=None):
+    device = device or MODEL_DEVICE
+    if device != "auto":
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where it cannot be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """Peak resident set size in bytes (Unix only), else None."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+
+def _gpu_allocated():
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        return torch.cuda.memory_allocated()
+    return None
+
+
+def _load_bge_m3(backend, device, num_threads):
+    from quantized_embedding import load_embed_model
+    return load_embed_model(backend=backend, device=device, num_threads=num_threads)
+
+
+def _load_marker(device):
+    from marker.models import create_model_dict
+    return create_model_dict(device=device)
+
+
+class ModelRegistry:
+    """
+    Lazily loaded, process-wide models keyed by (name, options). Each entry records its
+    load time, the RSS (and CUDA memory) it added, how often it was requested and when
+    it was last used; idle entries can be unloaded by a background timer.
+    """
+    def __init__(self, idle_unload_s=MODEL_IDLE_UNLOAD_S):
+        self.idle_unload_s = idle_unload_s
+        self._loaders = {"bge-m3": _load_bge_m3, "marker": _load_marker}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._reaper = None
+
+    def register(self, name, loader):
+        """Adds a model kind; loader(**options) builds it."""
+        self._loaders[name] = loader
+
+    def get(self, name, **options):
+        """The shared model for (name, options), loading it on first request; pinned against idle unload."""
+        return self._acquire(name, options, pin=True)["model"]
+
+    def find(self, name, **options):
+        """An already loaded model of this kind whose options include these, else None (never loads)."""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry["name"] == name and all(entry["options"].get(k) == v for k, v in options.items()):
+                    return self._touch(entry, lease=False, pin=True)["model"]
+        return None
+
+    def _acquire(self, name, options, lease=False, pin=False):
+        key = (name, tuple(sorted(options.items())))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Loads of different models may overlap; the same model is loaded once
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._touch(entry, lease, pin)
+            entry = self._load(name, options)
+            with self._lock:
+                self._entries[key] = entry
+                return self._touch(entry, lease, pin)
+
+    def _touch(self, entry, lease, pin):
+        # Caller holds self._lock, so the idle timer cannot drop the entry in between
+        entry["requests"] += 1
+        entry["in_use"] += 1 if lease else 0
+        entry["pinned"] = entry["pinned"] or pin
+        entry["last_used"] = time.monotonic()
+        return entry
+
+    def _load(self, name, options):
+        if MODEL_THREADS:
+            import torch
+            torch.set_num_threads(MODEL_THREADS)
+        print(f"Loading shared model '{name}' {dict(options)}...")
+        rss_before, gpu_before = current_rss(), _gpu_allocated()
+        start = time.perf_counter()
+        with get_metrics().stage(f"load_model_{name}"):
+            model = self._loaders[name](**options)
+        rss_after, gpu_after = current_rss(), _gpu_allocated()
+        entry = {
+            "name": name,
+            "options": dict(options),
+            "model": model,
+            "load_s": time.perf_counter() - start,
+            "rss_bytes": rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            "gpu_bytes": gpu_after - gpu_before if gpu_before is not None and gpu_after is not None else None,
+            "requests": 0,
+            "in_use": 0,
+            "pinned": False,
+            "last_used": time.monotonic(),
+        }
+        get_metrics().count("model_loads")
+        print(f"Model '{name}' loaded in {entry['load_s']:.1f}s"
+              + (f" (+{entry['rss_bytes'] / 2**20:.0f} MB RSS)" if entry["rss_bytes"] is not None else ""))
+        self._start_reaper()
+        return entry
+
+    @contextmanager
+    def use(self, name, **options):
+        """get() for a bounded piece of work; the idle timer never unloads a model while it is in use."""
+        entry = self._acquire(name, options, lease=True)
+        try:
+            yield entry["model"]
+        finally:
+            with self._lock:
+                entry["in_use"] -= 1
+                entry["last_used"] = time.monotonic()
+
+    def unload(self, name=None, idle_for=None):
+        """
+        Drops models (all, or one kind), optionally only those idle for idle_for seconds.
+        Idle unloading skips models handed out by get(), whose callers may still hold them.
+        """
+        now = time.monotonic()
+        with self._lock:
+            keys = [key for key, entry in self._entries.items()
+                    if (name is None or entry["name"] == name) and entry["in_use"] == 0
+                    and (idle_for is None or (not entry["pinned"] and now - entry["last_used"] >= idle_for))]
+            dropped = [self._entries.pop(key) for key in keys]
+        if not dropped:
+            return []
+        for entry in dropped:
+            entry["model"] = None
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        for entry in dropped:
+            print(f"Unloaded model '{entry['name']}' {entry['options']}")
+            get_metrics().count("model_unloads")
+        return [entry["name"] for entry in dropped]
+
+    def _start_reaper(self):
+        if not self.idle_unload_s or self._reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(max(1.0, min(self.idle_unload_s / 2, 30.0)))
+                self.unload(idle_for=self.idle_unload_s)
+
+        self._reaper = threading.Thread(target=reap, daemon=True, name="model-idle-unload")
+        self._reaper.start()
+
+    def report(self):
+        """Loaded models with load time, memory added, requests and idle time; plus process RSS."""
+        now = time.monotonic()
+        with self._lock:
+            models = [dict({key: entry[key] for key in ("name", "options", "load_s", "rss_bytes", "gpu_bytes",
+                                                         "requests", "in_use", "pinned")}, idle_s=now - entry["last_used"])
+                      for entry in self._entries.values()]
+        return {"models": models, "rss_bytes": current_rss(), "peak_rss_bytes": peak_rss()}
+
+    def summary_lines(self):
+        report = self.report()
+        lines = [f"Shared models (process RSS {_mb(report['rss_bytes'])}, peak {_mb(report['peak_rss_bytes'])}):"]
+        for model in report["models"]:
+            lines.append(f"  {model['name']:<10} {model['options']}  loaded in {model['load_s']:.1f}s, "
+                         f"+{_mb(model['rss_bytes'])} RSS, {model['requests']} requests, idle {model['idle_s']:.0f}s")
+        return lines
+
+
+def _mb(n):
+    return f"{n / 2**20:.0f} MB" if n is not None else "n/a"
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """Process-wide ModelRegistry shared by every pipeline stage."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
+
+
+def _embed_options(backend, device, num_threads):
+    from quantized_embedding import EMBED_BACKEND, EMBED_THREADS
+    backend = backend or EMBED_BACKEND
+    # The int8 backends are CPU-only
+    device = resolve_device(device) if backend == "torch" else "cpu"
+    return {"backend": backend, "device": device,
+            "num_threads": (EMBED_THREADS or MODEL_THREADS) if num_threads is None else num_threads}
+
+
+def get_embed_model(backend=None, device=None, num_threads=None):
+    """
+    Shared BGE-M3 (HR_EMBED_BACKEND by default; ingest passes backend="torch" for fp32 vectors).
+    Pinned: callers that keep the model (the query engine) are never idle-unloaded.
+    """
+    return get_registry().get("bge-m3", **_embed_options(backend, device, num_threads))
+
+
+@contextmanager
+def use_embed_model(backend=None, device=None, num_threads=None):
+    """
+    get_embed_model() for a bounded piece of work (ingest, vision table embedding): once
+    released, HR_MODEL_IDLE_UNLOAD may unload it unless a get() caller pinned the same model.
+    """
+    with get_registry().use("bge-m3", **_embed_options(backend, device, num_threads)) as model:
+        yield model
+
+
+def get_marker_models(device=None):
+    """Shared Marker artifact dict (layout, OCR, table models)."""
+    return get_registry().get("marker", device=resolve_device(device))
+
+
+def get_query_embed_model():
+    """
+    BGE-M3 for question embedding: the HR_EMBED_BACKEND model on CPU (the GPU is left to
+    Ollama), unless this process already loaded that backend for ingest, which is reused.
+    """
+    from quantized_embedding import EMBED_BACKEND
+    loaded = get_registry().find("bge-m3", backend=EMBED_BACKEND)
+    return loaded if loaded is not None else get_embed_model(device="cpu")
@@ -0,0 +1,317 @@
+import os
+import time
+import json
+import base64
+import socket
+import threading
+from collections import deque
+import httpx
+from instrumentation import get_metrics
+
+# Shared Ollama access for the query CLI and the vision pipeline.
+# One pooled HTTP connection set per process, models pinned with keep_alive,
+# a hard deadline on every call and a bounded number of retries.
+OLLAMA_HOST = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")
+DEFAULT_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_RETRIES = 2
+
+# Errors worth retrying: connection drops, timeouts and Ollama 5xx (e.g. model loading)
+RETRYABLE_STATUS = {500, 502, 503, 504}
+# Per-call entries kept for summary()/last(); long-running processes keep only the newest
+MAX_RECORDED_CALLS = 1000
+
+
+class OllamaError(RuntimeError):
+    pass
+
+
+class StreamCancel:
+    """
+    Cancels a generate_stream from another thread. A plain threading.Event is only
+    checked between chunks; set() here also shuts down the open connection, so a stream
+    still waiting for its first token ends at once and Ollama stops working on the prompt.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._response = None
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            response = self._response
+        if response is not None:
+            _shutdown(response)
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+            cancelled = self._event.is_set()
+        if cancelled:
+            _shutdown(response)
+
+    def detach(self):
+        with self._lock:
+            self._response = None
+
+
+def _shutdown(response):
+    # Closing the response alone does not wake a read blocked in another thread
+    stream = response.extensions.get("network_stream")
+    sock = stream.get_extra_info("socket") if stream is not None else None
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class OllamaMetrics:
+    """
+    Collects per-call timings reported by Ollama (load, prompt eval, generation) for the
+    last max_calls answer calls (warmups are not recorded). Ollama reports durations in
+    nanoseconds; everything here is stored in seconds.
+    """
+    def __init__(self, max_calls=MAX_RECORDED_CALLS):
+        self._lock = threading.Lock()
+        self.calls = deque(maxlen=max_calls)
+        self.total_calls = 0
+
+    def record(self, model, endpoint, result, wall_time, attempts):
+        prompt_tokens = result.get("prompt_eval_count", 0) or 0
+        eval_tokens = result.get("eval_count", 0) or 0
+        eval_s = (result.get("eval_duration", 0) or 0) / 1e9
+        entry = {
+            "model": model,
+            "endpoint": endpoint,
+            "wall_s": wall_time,
+            "attempts": attempts,
+            "load_s": (result.get("load_duration", 0) or 0) / 1e9,
+            "prompt_eval_s": (result.get("prompt_eval_duration", 0) or 0) / 1e9,
+            "prompt_tokens": prompt_tokens,
+            "eval_s": eval_s,
+            "eval_tokens": eval_tokens,
+            "eval_tokens_per_s": eval_tokens / eval_s if eval_s else 0.0,
+        }
+        with self._lock:
+            self.calls.append(entry)
+            self.total_calls += 1
+        run = get_metrics()
+        run.count("llm_calls")
+        run.count("llm_retries", attempts - 1)
+        run.count("llm_prompt_tokens", prompt_tokens)
+        run.count("llm_eval_tokens", eval_tokens)
+        return entry
+
+    def summary(self):
+        """Aggregates over the recorded (most recent) calls; calls_total counts every call."""
+        with self._lock:
+            calls, total = list(self.calls), self.total_calls
+        if not calls:
+            return {"calls": 0, "calls_total": total}
+        eval_s = sum(c["eval_s"] for c in calls)
+        eval_tokens = sum(c["eval_tokens"] for c in calls)
+        return {
+            "calls": len(calls),
+            "calls_total": total,
+            "retries": sum(c["attempts"] - 1 for c in calls),
+            # A load_s well above zero means the model was evicted and reloaded
+            "cold_loads": sum(1 for c in calls if c["load_s"] > 1.0),
+            "load_s_total": sum(c["load_s"] for c in calls),
+            "prompt_eval_s_total": sum(c["prompt_eval_s"] for c in calls),
+            "prompt_tokens_total": sum(c["prompt_tokens"] for c in calls),
+            "eval_tokens_total": eval_tokens,
+            "eval_tokens_per_s": eval_tokens / eval_s if eval_s else 0.0,
+            "wall_s_max": max(c["wall_s"] for c in calls),
+        }
+
+    def last(self):
+        with self._lock:
+            return self.calls[-1] if self.calls else None
+
+
+def _encode_image(image):
+    """Ollama expects base64 images; accept file paths or raw bytes like the ollama package does."""
+    if isinstance(image, bytes):
+        return base64.b64encode(image).decode("ascii")
+    if os.path.exists(image):
+        with open(image, "rb") as f:
+            return base64.b64encode(f.read()).decode("ascii")
+    return image  # Already base64
+
+
+class OllamaClient:
+    """
+    Thin client over the Ollama REST API with connection pooling, keep-alive
+    residency, per-call deadlines and retries.
+    """
+    def __init__(self, host=OLLAMA_HOST, keep_alive=DEFAULT_KEEP_ALIVE,
+                 timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, max_connections=8):
+        self.host = host.rstrip("/")
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.retries = retries
+        self.metrics = OllamaMetrics()
+        self._http = httpx.Client(
+            base_url=self.host,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout, connect=5.0),
+        )
+
+    def close(self):
+        self._http.close()
+
+    # --- Public API ---
+
+    def chat(self, model, messages, options=None, timeout=None, keep_alive=None, fmt=None):
+        messages = [self._prepare_message(m) for m in messages]
+        payload = self._payload(model, keep_alive, options, fmt, messages=messages)
+        return self._call("/api/chat", payload, timeout)
+
+    def generate(self, model, prompt, options=None, timeout=None, keep_alive=None, fmt=None):
+        payload = self._payload(model, keep_alive, options, fmt, prompt=prompt)
+        return self._call("/api/generate", payload, timeout)
+
+    def generate_stream(self, model, prompt, options=None, timeout=None, keep_alive=None,
+                        cancel_event=None):
+        """
+        Yields generate chunks as they arrive. The deadline covers the whole stream;
+        setting cancel_event ends the stream and closes the connection, which makes Ollama
+        stop generating. Pass a StreamCancel to also interrupt a read that is still waiting.
+        Failures before the first chunk are retried like other calls; once chunks have
+        been yielded the stream cannot be replayed, so a later failure raises OllamaError.
+        """
+        payload = self._payload(model, keep_alive, options, None, prompt=prompt)
+        payload["stream"] = True
+        deadline = time.monotonic() + (timeout or self.timeout)
+        start = time.perf_counter()
+        last_error = None
+
+        attach = getattr(cancel_event, "attach", None)
+        for attempt in range(1, self.retries + 2):
+            if time.monotonic() >= deadline or (cancel_event is not None and cancel_event.is_set()):
+                break
+            streaming = False
+            try:
+                with self._http.stream("POST", "/api/generate", json=payload,
+                                       timeout=self._attempt_timeout(deadline)) as response:
+                    if attach is not None:
+                        attach(response)
+                    if response.status_code != 200:
+                        response.read()
+                        error = OllamaError(f"Ollama returned {response.status_code}: {response.text[:200]}")
+                        if response.status_code not in RETRYABLE_STATUS:
+                            raise error
+                        last_error = error
+                    else:
+                        for line in response.iter_lines():
+                            if cancel_event is not None and cancel_event.is_set():
+                                return
+                            if time.monotonic() > deadline:
+                                raise OllamaError(f"Generation exceeded deadline of {timeout or self.timeout}s")
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            if chunk.get("error"):
+                                raise OllamaError(chunk["error"])
+                            if chunk.get("done"):
+                                self.metrics.record(model, "/api/generate", chunk,
+                                                    time.perf_counter() - start, attempt)
+                            streaming = True
+                            yield chunk
+                        return
+            except httpx.TransportError as e:  # Connect errors, read timeouts, dropped sockets
+                if cancel_event is not None and cancel_event.is_set():
+                    return
+                if streaming:
+                    raise OllamaError(f"Stream interrupted after partial output: {e}") from e
+                last_error = e
+            finally:
+                if attach is not None:
+                    cancel_event.detach()
+
+            backoff = min(0.5 * (2 ** (attempt - 1)), max(deadline - time.monotonic(), 0))
+            time.sleep(backoff)
+
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        raise OllamaError(f"/api/generate stream failed after {attempt} attempt(s) "
+                          f"within {timeout or self.timeout}s: {last_error}")
+
+    def warmup(self, model, keep_alive=None):
+        """Load a model into memory ahead of the first real request (empty prompt = load only)."""
+        print(f"Warming up Ollama model {model}...")
+        payload = {"model": model, "keep_alive": keep_alive or self.keep_alive}
+        # Not an answer: kept out of the call metrics (its load_s would read as a cold load)
+        return self._call("/api/generate", payload, timeout=max(self.timeout, 300.0), record=False)
+
+    # --- Internals ---
+
+    def _payload(self, model, keep_alive, options, fmt, **fields):
+        payload = {"model": model, "stream": False, "keep_alive": keep_alive or self.keep_alive}
+        if options:
+            payload["options"] = options
+        if fmt:
+            payload["format"] = fmt
+        payload.update(fields)
+        return payload
+
+    def _prepare_message(self, message):
+        if not message.get("images"):
+            return message
+        message = dict(message)
+        message["images"] = [_encode_image(img) for img in message["images"]]
+        return message
+
+    def _attempt_timeout(self, deadline):
+        remaining = max(deadline - time.monotonic(), 0.1)
+        return httpx.Timeout(remaining, connect=min(5.0, remaining))
+
+    def _call(self, endpoint, payload, timeout, record=True):
+        deadline = time.monotonic() + (timeout or self.timeout)
+        start = time.perf_counter()
+        last_error = None
+
+        for attempt in range(1, self.retries + 2):
+            if time.monotonic() >= deadline:
+                break
+            try:
+                response = self._http.post(endpoint, json=payload,
+                                           timeout=self._attempt_timeout(deadline))
+                if response.status_code in RETRYABLE_STATUS:
+                    last_error = OllamaError(f"Ollama returned {response.status_code}: {response.text[:200]}")
+                elif response.status_code != 200:
+                    raise OllamaError(f"Ollama returned {response.status_code}: {response.text[:200]}")
+                else:
+                    result = response.json()
+                    if record:
+                        self.metrics.record(payload["model"], endpoint, result,
+                                            time.perf_counter() - start, attempt)
+                    return result
+            except httpx.TransportError as e:  # Connect errors, read timeouts, dropped sockets
+                last_error = e
+
+            # Exponential backoff, but never sleep past the deadline
+            backoff = min(0.5 * (2 ** (attempt - 1)), max(deadline - time.monotonic(), 0))
+            time.sleep(backoff)
+
+        raise OllamaError(f"{endpoint} failed after {attempt} attempt(s) "
+                          f"within {timeout or self.timeout}s: {last_error}")
+
+
+_shared_client = None
+_shared_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client so every stage reuses the same connection pool."""
+    global _shared_client
+    with _shared_lock:
+        if _shared_client is None:
+            _shared_client = OllamaClient()
+        return _shared_client
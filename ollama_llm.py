@@ -0,0 +1,56 @@
+from typing import Any
+from pydantic import Field, PrivateAttr
+from llama_index.core.llms import CustomLLM, CompletionResponse, LLMMetadata
+from llama_index.core.llms.callbacks import llm_completion_callback
+from ollama_client import get_client
+
+
+class SharedOllamaLLM(CustomLLM):
+    """
+    llama_index LLM backed by the shared OllamaClient, so query-time generation
+    uses the same pooled connections, keep_alive pinning and deadlines as the
+    vision pipeline.
+    """
+    model: str = Field(default="qwen3:8b")
+    context_window: int = Field(default=8192)
+    num_output: int = Field(default=1024)
+    timeout: float = Field(default=120.0)
+    temperature: float = Field(default=0.1)
+
+    _client: Any = PrivateAttr()
+
+    def __init__(self, client=None, **kwargs):
+        super().__init__(**kwargs)
+        self._client = client or get_client()
+
+    @property
+    def client(self):
+        return self._client
+
+    @property
+    def metadata(self):
+        return LLMMetadata(
+            context_window=self.context_window,
+            num_output=self.num_output,
+            model_name=self.model,
+        )
+
+    def _options(self):
+        return {"temperature": self.temperature, "num_ctx": self.context_window}
+
+    @llm_completion_callback()
+    def complete(self, prompt, formatted=False, **kwargs):
+        result = self._client.generate(self.model, prompt, options=self._options(),
+                                       timeout=self.timeout)
+        return CompletionResponse(text=result.get("response", ""), raw=result)
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt, formatted=False, **kwargs):
+        text = ""
+        # Callers with their own latency budget pass a shorter timeout (deadline_answer.py)
+        for chunk in self._client.generate_stream(self.model, prompt, options=self._options(),
+                                                  timeout=kwargs.get("timeout", self.timeout),
+                                                  cancel_event=kwargs.get("cancel_event")):
+            delta = chunk.get("response", "")
+            text += delta
+            yield CompletionResponse(text=text, delta=delta, raw=chunk)
@@ -2,38 +2,41 @@ import os
 # Fix for "OMP: Error #15: Initializing libiomp5md.dll"
 os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 
-import torch
 from marker.converters.pdf import PdfConverter
-from marker.models import create_model_dict
+from instrumentation import get_metrics
+from model_registry import get_registry, resolve_device
 
-def parse_with_marker(pdf_path):
+def parse_with_marker(pdf_path, output_file=None):
     print(f"Processing: {pdf_path}")
+    run = get_metrics()
     
-    # basic check for GPU
-    device = "cuda" if torch.cuda.is_available() else "cpu"
+    # GPU when available (HR_MODEL_DEVICE overrides)
+    device = resolve_device()
     print(f"Using device: {device}")
     
     print("Loading Marker models (this may download large weights on first run)...")
     try:
-        # Load models
-        model_dict = create_model_dict(device=device)
+        # Load models once per process (timed as "load_model_marker"); later PDFs reuse them,
+        # and the lease keeps the idle-unload timer away while converting
+        with get_registry().use("marker", device=device) as model_dict:
+            # Initialize converter
+            print("Initializing PdfConverter...")
+            converter = PdfConverter(
+                artifact_dict=model_dict,
+            )
         
-        # Initialize converter
-        print("Initializing PdfConverter...")
-        converter = PdfConverter(
-            artifact_dict=model_dict,
-        )
-        
-        print("Converting PDF...")
-        # The converter directly returns a MarkdownOutput object
-        rendered = converter(pdf_path)
+            print("Converting PDF...")
+            # The converter directly returns a MarkdownOutput object
+            with run.stage("marker_convert") as stage:
+                rendered = converter(pdf_path)
+                stage.add("pages", len(rendered.metadata.get("page_stats", [])))
         
         # Extract content
         full_text = rendered.markdown
         metadata = rendered.metadata
         
         # Save output
-        output_file = pdf_path.replace(".pdf", "_marker.md")
+        output_file = output_file or pdf_path.replace(".pdf", "_marker.md")
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(full_text)
             
@@ -50,6 +53,11 @@ def parse_with_marker(pdf_path):
         print(f"\nError during Marker processing: {e}")
         import traceback
         traceback.print_exc()
+        run.count("marker_errors")
+        output_file = None
+
+    run.export("parse_with_marker")
+    return output_file
 
 if __name__ == "__main__":
     parse_with_marker("sharjah_hr_law 8.pdf")
@@ -0,0 +1,98 @@
+import os
+import gzip
+import json
+import hashlib
+
+# Raw per-page pdfplumber output (unrepaired text lines, raw table cells), so iterating
+# on repair_text / bidi handling re-runs only the cheap cleanup pass, not the layout analysis.
+# Layout: <PAGE_CACHE_DIR>/<pdf sha256[:16]>/<kind>-<settings hash>/pNNNN.json.gz
+PAGE_CACHE_DIR = os.environ.get("HR_PAGE_CACHE_DIR", "pdf_page_cache")
+# "0" always re-extracts (and writes nothing)
+PAGE_CACHE_ENABLED = os.environ.get("HR_PAGE_CACHE", "1") != "0"
+# Bump when the shape of the cached page data changes
+CACHE_FORMAT = 1
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def settings_hash(kind, settings):
+    """Everything that changes the raw output: extractor kind, its settings, the pdfplumber version."""
+    import pdfplumber
+    key = {"kind": kind, "settings": settings, "pdfplumber": pdfplumber.__version__, "format": CACHE_FORMAT}
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+class PageCache:
+    """Gzipped JSON entry per (PDF, extractor settings, page); pages.json records the page count."""
+    def __init__(self, pdf_path, kind, settings, cache_dir=PAGE_CACHE_DIR):
+        self.dir = os.path.join(cache_dir, file_sha256(pdf_path)[:16], f"{kind}-{settings_hash(kind, settings)}")
+
+    def _page_path(self, page_number):
+        return os.path.join(self.dir, f"p{page_number:04d}.json.gz")
+
+    def page_count(self):
+        try:
+            with open(os.path.join(self.dir, "pages.json"), "r", encoding="utf-8") as f:
+                return json.load(f)["pages"]
+        except FileNotFoundError:
+            return None
+
+    def set_page_count(self, pages):
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, "pages.json"), "w", encoding="utf-8") as f:
+            json.dump({"pages": pages}, f)
+
+    def get(self, page_number):
+        try:
+            with gzip.open(self._page_path(page_number), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, page_number, data):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp_path = self._page_path(page_number) + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self._page_path(page_number))
+
+
+def cached_pages(pdf_path, kind, settings, extract_page, stage=None):
+    """
+    Returns [(page_number, raw)] for every page of pdf_path. Cached pages are read back;
+    the PDF is only opened when some page is missing, and extract_page(page) runs for those
+    pages alone. Hits/misses are counted on the instrumentation stage if one is given.
+    """
+    cache = PageCache(pdf_path, kind, settings) if PAGE_CACHE_ENABLED else None
+
+    page_count = cache.page_count() if cache else None
+    if page_count is not None:
+        pages = [(n, cache.get(n)) for n in range(1, page_count + 1)]
+        if all(raw is not None for _, raw in pages):
+            if stage:
+                stage.add("page_cache_hits", page_count)
+            return pages
+
+    import pdfplumber
+    pages = []
+    with pdfplumber.open(pdf_path) as pdf:
+        if cache:
+            cache.set_page_count(len(pdf.pages))
+        for n, page in enumerate(pdf.pages, 1):
+            raw = cache.get(n) if cache else None
+            if raw is None:
+                raw = extract_page(page)
+                if cache:
+                    cache.put(n, raw)
+                if stage:
+                    stage.add("page_cache_misses")
+            elif stage:
+                stage.add("page_cache_hits")
+            pages.append((n, raw))
+    return pages
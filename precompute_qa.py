@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import argparse
+from datetime import datetime
+from instrumentation import get_metrics
+from arabic_normalize import normalize_arabic
+
+# Offline stage after embed_process: the local LLM writes likely questions + concise answers
+# for every chunk and table, the questions get their own vector index, and the query CLI
+# answers a close paraphrase of a stored question without retrieval or generation.
+QA_PAIRS_PATH = "qa_pairs.jsonl"
+# Kept next to the text index it was built from (indexes/<version>/qa_index) when
+# versioned builds are in use, see qa_index_path()
+QA_INDEX_PATH = "qa_index"
+QA_MODEL = os.environ.get("HR_QA_MODEL", "qwen3:8b")
+QUESTIONS_PER_CHUNK = int(os.environ.get("HR_QA_PER_CHUNK", "3"))
+# Cosine similarity a question must reach against a stored question to reuse its answer
+QA_MATCH_THRESHOLD = float(os.environ.get("HR_QA_MATCH", "0.9"))
+# Bump when the prompt changes; pairs from an older prompt are regenerated
+PROMPT_VERSION = 1
+# Chunks shorter than this carry no answerable content (headings, image refs)
+MIN_CHUNK_CHARS = 80
+
+# Ordinals (normalize_arabic forms) that pick a grade/article while barely moving the
+# embedding: "بدل السكن للدرجة الثالثة" and "...الرابعة" are near-identical vectors
+# ("الحادي عشر" = 1 + 10)
+ORDINAL_STEMS = ["اول", "ثاني", "ثالث", "رابع", "خامس", "سادس", "سابع", "ثامن", "تاسع", "عاشر"]
+ORDINAL_WORDS = dict([(f"ال{stem}", n) for n, stem in enumerate(ORDINAL_STEMS, 1)]
+                     + [(f"ال{stem}ه", n) for n, stem in enumerate(ORDINAL_STEMS, 1)]
+                     + [("الاولي", 1), ("الحادي", 1), ("الحاديه", 1)])
+
+QA_PROMPT = """You are preparing an FAQ for the Sharjah HR law (Executive Regulation No. 12 of 2021).
+Read the passage below and write up to {n} questions an employee would realistically ask
+that this passage answers, each with a concise, factual answer taken only from the passage.
+Write the questions and answers in the language of the passage.
+
+Passage:
+{text}
+
+Return ONLY JSON: {{"pairs": [{{"question": "...", "answer": "..."}}]}}
+If the passage answers nothing useful (e.g. only a heading), return {{"pairs": []}}."""
+
+
+def chunk_key(text):
+    """Stable id of a chunk's content (node ids change on every chunking run)."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def question_anchors(question):
+    """
+    The numbers a question turns on: digits (article, grade, amount) and ordinal
+    words, "الثانية عشرة" counting as 12. A stored answer is only reused when these match.
+    """
+    from article_router import detect_reference
+    words = re.findall(r"\w+", normalize_arabic(question))
+    anchors = {word for word in words if word.isdigit()}
+    for i, word in enumerate(words):
+        n = ORDINAL_WORDS.get(word)
+        if n:
+            teen = i + 1 < len(words) and words[i + 1] in ("عشر", "عشره")
+            anchors.add(str(n + 10 if teen else n))
+    reference = detect_reference(question)
+    if reference:
+        anchors.add(":".join(reference))
+    return anchors
+
+
+def qa_index_path(version=None):
+    """indexes/<version>/qa_index (the promoted version by default), else QA_INDEX_PATH."""
+    from vector_backend import INDEXES_DIR, current_version
+    version = version or current_version()
+    return os.path.join(INDEXES_DIR, version, QA_INDEX_PATH) if version else QA_INDEX_PATH
+
+
+def load_pairs(path=QA_PAIRS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def parse_pairs(content, limit=QUESTIONS_PER_CHUNK):
+    """Question/answer pairs from the model output; tolerant of think blocks and code fences."""
+    content = re.sub(r"<think>.*?</think>", "", content, flags=re.DOTALL)
+    content = content.replace("```json", "").replace("```", "").strip()
+    try:
+        pairs = json.loads(content).get("pairs", [])
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    pairs = [{"question": str(p.get("question", "")).strip(), "answer": str(p.get("answer", "")).strip()}
+             for p in pairs if isinstance(p, dict)]
+    return [p for p in pairs if p["question"] and p["answer"]][:limit]
+
+
+def generate_pairs(md_file_path="sharjah_hr_law 8_marker.md", pairs_path=QA_PAIRS_PATH, model=QA_MODEL,
+                   limit=None):
+    """
+    Asks the LLM for Q/A pairs chunk by chunk and appends them to pairs_path as they
+    arrive, so an interrupted run resumes with the first chunk that has no pairs yet.
+    Every pair records its source chunk (key, text, location) and how it was produced.
+    """
+    from chunk_process import load_and_chunk
+    from deadline_answer import source_label
+    from ollama_client import get_client
+
+    run = get_metrics()
+    client = get_client()
+    done = {p["chunk_key"] for p in load_pairs(pairs_path) if p.get("prompt_version") == PROMPT_VERSION}
+
+    # 1. Same chunks as the text index; identical texts are asked about once
+    nodes = load_and_chunk(md_file_path)
+    todo, seen = [], set(done)
+    for node in nodes:
+        text = node.get_content()
+        key = chunk_key(text)
+        if len(text) >= MIN_CHUNK_CHARS and key not in seen:
+            seen.add(key)
+            todo.append((key, node))
+    if limit:
+        todo = todo[:limit]
+    print(f"Q/A generation: {len(done)} chunks done earlier, {len(todo)} to go ({model})")
+
+    # 2. One LLM call per chunk, appended immediately
+    with open(pairs_path, "a", encoding="utf-8") as f, run.stage("qa_generate", chunks=len(todo)) as stage:
+        for i, (key, node) in enumerate(todo, 1):
+            result = client.generate(model, QA_PROMPT.format(n=QUESTIONS_PER_CHUNK, text=node.get_content()),
+                                     options={"temperature": 0.2}, fmt="json", timeout=300.0)
+            pairs = parse_pairs(result.get("response", ""))
+            if pairs is None:
+                print(f"  [{i}/{len(todo)}] unparseable output, chunk {key} will be retried next run")
+                run.count("qa_parse_errors")
+                continue
+            meta = {k: node.metadata[k] for k in ("type", "doc_id", "chapter", "articles", "page", "original_index")
+                    if k in node.metadata}
+            created = datetime.now().isoformat(timespec="seconds")
+            # A chunk with no useful pairs still gets a marker record, so it is not asked again
+            for pair in pairs or [{"question": None, "answer": None}]:
+                f.write(json.dumps(dict(pair, chunk_key=key, source=source_label(node), metadata=meta,
+                                        chunk_text=node.get_content(), model=model,
+                                        prompt_version=PROMPT_VERSION, created=created),
+                                   ensure_ascii=False) + "\n")
+            f.flush()
+            stage.add("pairs", len(pairs))
+            print(f"  [{i}/{len(todo)}] {len(pairs)} pairs from {source_label(node)}")
+    run.export("precompute_qa")
+
+
+def build_qa_index(md_file_path="sharjah_hr_law 8_marker.md", pairs_path=QA_PAIRS_PATH, version=None):
+    """
+    Embeds the stored questions of the chunks the text index holds now into a separate
+    mmap index next to that index version (rebuilt whole, then swapped in). Pairs of
+    chunks that changed or disappeared since they were generated are left out.
+    Like the text index, a promoted version is never rewritten: build for an unpromoted
+    version, then promote it.
+    """
+    from llama_index.core.schema import TextNode
+    from chunk_process import load_and_chunk
+    from mmap_vector_store import MmapVectorStore
+    from model_registry import use_embed_model
+    from vector_backend import writable_store_path
+
+    # indexes/<version>/qa_index has the same layout as a backend store directory
+    index_path = writable_store_path(qa_index_path(version), backend=QA_INDEX_PATH)
+    current_keys = {chunk_key(node.get_content()) for node in load_and_chunk(md_file_path)}
+    pairs = [p for p in load_pairs(pairs_path) if p.get("question") and p.get("prompt_version") == PROMPT_VERSION
+             and p["chunk_key"] in current_keys]
+    if not pairs:
+        print("No Q/A pairs to index.")
+        return 0
+
+    run = get_metrics()
+    with use_embed_model(backend="torch") as embed_model, run.stage("qa_embed", questions=len(pairs)):
+        vectors = embed_model.get_text_embedding_batch([p["question"] for p in pairs], show_progress=True)
+
+    # Only the question is embedded; the answer and provenance ride along as metadata
+    stored_keys = ["answer", "source", "chunk_key", "chunk_text", "model", "created"]
+    nodes = []
+    for pair, vector in zip(pairs, vectors):
+        node = TextNode(text=pair["question"], embedding=vector,
+                        metadata={key: pair[key] for key in stored_keys})
+        node.excluded_embed_metadata_keys = list(stored_keys)
+        node.excluded_llm_metadata_keys = list(stored_keys)
+        nodes.append(node)
+
+    tmp_path = index_path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    store = MmapVectorStore(persist_dir=tmp_path)
+    store.add(nodes)
+    store.persist()
+    # Unversioned layout: move the old index aside first, so readers never find the path empty
+    old_path = index_path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(index_path):
+        os.replace(index_path, old_path)
+    os.replace(tmp_path, index_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    print(f"Q/A index: {len(nodes)} questions saved to '{index_path}'")
+    return len(nodes)
+
+
+class QAIndex:
+    """
+    Query-time lookup of precomputed answers by question similarity. Built for one
+    index version; following the promoted version, it stops answering once another
+    version is promoted (its chunks may have changed).
+    """
+    def __init__(self, index_path=QA_INDEX_PATH, threshold=QA_MATCH_THRESHOLD, version=None, follow_current=False):
+        from mmap_vector_store import MmapVectorStore
+        self.store = MmapVectorStore(persist_dir=index_path)
+        self.threshold = threshold
+        self.version = version
+        self.follow_current = follow_current
+
+    def lookup(self, embedding, question):
+        """{path, answer, source, question, chunk_text, score} for a close enough stored question, else None."""
+        from llama_index.core.vector_stores import VectorStoreQuery
+        from vector_backend import current_version
+        if self.follow_current and current_version() != self.version:
+            return None
+        result = self.store.query(VectorStoreQuery(query_embedding=embedding, similarity_top_k=1))
+        if not result.nodes or result.similarities[0] < self.threshold:
+            return None
+        node, meta = result.nodes[0], result.nodes[0].metadata
+        # Same wording with another grade or article number is a different question
+        if question_anchors(question) != question_anchors(node.get_content()):
+            get_metrics().count("qa_index_anchor_mismatches")
+            return None
+        get_metrics().count("qa_index_hits")
+        return {"path": "precomputed_qa", "answer": meta["answer"], "source": meta["source"],
+                "question": node.get_content(), "chunk_text": meta["chunk_text"],
+                "score": result.similarities[0]}
+
+
+def load_qa_index(version=None):
+    """The Q&A index of version (default: follow the promoted one), or None if it has none."""
+    from vector_backend import current_version
+    follow_current = version is None
+    version = version or current_version()
+    index_path = qa_index_path(version)
+    if not os.path.exists(os.path.join(index_path, "meta.json")):
+        return None
+    return QAIndex(index_path, version=version, follow_current=follow_current)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate Q/A pairs per chunk with the local LLM and index them.")
+    parser.add_argument("--md", default="sharjah_hr_law 8_marker.md")
+    parser.add_argument("--model", default=QA_MODEL)
+    parser.add_argument("--limit", type=int, default=None, help="only this many new chunks in this run")
+    parser.add_argument("--index-only", action="store_true", help="rebuild the question index from qa_pairs.jsonl")
+    parser.add_argument("--version", default=None, help="unpromoted index version to build for (required once a version is promoted)")
+    args = parser.parse_args()
+
+    if not args.index_only:
+        generate_pairs(args.md, model=args.model, limit=args.limit)
+    build_qa_index(args.md, version=args.version)
@@ -0,0 +1,203 @@
+import os
+import time
+import numpy as np
+from typing import Any
+from pydantic import Field, PrivateAttr
+from llama_index.core.embeddings import BaseEmbedding
+
+EMBED_MODEL_NAME = "BAAI/bge-m3"
+ONNX_CACHE_DIR = os.path.join("onnx_models", "bge-m3")
+# "torch" (fp32 HuggingFaceEmbedding), "onnx" (int8 ONNX Runtime) or "torch-int8"
+EMBED_BACKEND = os.environ.get("HR_EMBED_BACKEND", "torch")
+EMBED_THREADS = int(os.environ.get("HR_EMBED_THREADS", "0"))
+# BGE-M3's context length; the fp32 HuggingFaceEmbedding used at ingest truncates here too,
+# so long chunks get the same input on every backend
+MAX_TOKENS = 8192
+
+
+def export_onnx_int8(model_name=EMBED_MODEL_NAME, cache_dir=ONNX_CACHE_DIR):
+    """
+    Exports the model to ONNX and applies dynamic int8 quantization (once; cached on disk).
+    Returns the path of the quantized model file.
+    """
+    quantized_path = os.path.join(cache_dir, "model_quantized.onnx")
+    if os.path.exists(quantized_path):
+        return quantized_path
+
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    print(f"Exporting {model_name} to ONNX (one-time, several minutes)...")
+    start = time.perf_counter()
+    model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+    model.save_pretrained(cache_dir)
+    AutoTokenizer.from_pretrained(model_name).save_pretrained(cache_dir)
+
+    print("Quantizing ONNX model to int8 (dynamic)...")
+    quantizer = ORTQuantizer.from_pretrained(cache_dir)
+    config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+    # BGE-M3 fp32 weights exceed the 2GB protobuf limit, so keep weights as external data
+    quantizer.quantize(save_dir=cache_dir, quantization_config=config, use_external_data_format=True)
+    print(f"ONNX int8 model ready in {time.perf_counter() - start:.0f}s: {quantized_path}")
+    return quantized_path
+
+
+class QuantizedBGEM3Embedding(BaseEmbedding):
+    """
+    CPU BGE-M3 dense encoder with int8 weights, either through ONNX Runtime
+    ("onnx") or torch dynamic quantization ("torch-int8").
+    Produces the same CLS-pooled, L2-normalized vectors as the fp32 model.
+    """
+    model_name: str = Field(default=EMBED_MODEL_NAME)
+    backend: str = Field(default="onnx")
+    num_threads: int = Field(default=0)
+    max_length: int = Field(default=MAX_TOKENS)
+    cache_dir: str = Field(default=ONNX_CACHE_DIR)
+
+    _tokenizer: Any = PrivateAttr(default=None)
+    _session: Any = PrivateAttr(default=None)
+    _input_names: Any = PrivateAttr(default=None)
+    _model: Any = PrivateAttr(default=None)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        start = time.perf_counter()
+        if self.backend == "onnx":
+            self._load_onnx()
+        elif self.backend == "torch-int8":
+            self._load_torch_int8()
+        else:
+            raise ValueError(f"Unknown quantized backend '{self.backend}' (expected 'onnx' or 'torch-int8')")
+        print(f"BGE-M3 ({self.backend}) loaded in {time.perf_counter() - start:.1f}s")
+
+    @classmethod
+    def class_name(cls):
+        return "QuantizedBGEM3Embedding"
+
+    def _load_onnx(self):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        model_path = export_onnx_int8(self.model_name, self.cache_dir)
+        options = ort.SessionOptions()
+        if self.num_threads:
+            options.intra_op_num_threads = self.num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self._session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self._session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(self.cache_dir)
+
+    def _load_torch_int8(self):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        model = AutoModel.from_pretrained(self.model_name)
+        model.eval()
+        self._model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+
+    def _encode(self, texts):
+        if self._session is not None:
+            inputs = self._tokenizer(texts, padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="np")
+            feed = {k: v.astype(np.int64) for k, v in inputs.items() if k in self._input_names}
+            hidden = self._session.run(None, feed)[0]
+        else:
+            import torch
+            inputs = self._tokenizer(texts, padding=True, truncation=True,
+                                     max_length=self.max_length, return_tensors="pt")
+            with torch.inference_mode():
+                hidden = self._model(**inputs).last_hidden_state.numpy()
+
+        cls = hidden[:, 0].astype(np.float32)
+        cls /= np.maximum(np.linalg.norm(cls, axis=1, keepdims=True), 1e-12)
+        return cls.tolist()
+
+    def _get_query_embedding(self, query):
+        return self._encode([query])[0]
+
+    async def _aget_query_embedding(self, query):
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text):
+        return self._encode([text])[0]
+
+    def _get_text_embeddings(self, texts):
+        return self._encode(texts)
+
+
+def load_embed_model(backend=None, device="cpu", num_threads=None):
+    """The embedding model for the selected backend (fp32 torch by default)."""
+    backend = backend or EMBED_BACKEND
+    if backend != "torch" and device != "cpu":
+        raise ValueError(f"The int8 '{backend}' backend runs on CPU only (got device='{device}')")
+    num_threads = EMBED_THREADS if num_threads is None else num_threads
+    if backend == "torch":
+        from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+        if num_threads:
+            import torch
+            torch.set_num_threads(num_threads)
+        return HuggingFaceEmbedding(model_name=EMBED_MODEL_NAME, device=device)
+    return QuantizedBGEM3Embedding(backend=backend, num_threads=num_threads)
+
+
+def _stored_sample(vector_store, sample):
+    """(payloads, vectors) of up to sample stored chunks, from either backend."""
+    if hasattr(vector_store, "sample_rows"):
+        return vector_store.sample_rows(sample)
+    points, _ = vector_store.client.scroll(collection_name=vector_store.collection_name, limit=sample,
+                                           with_payload=True, with_vectors=True)
+    return [p.payload for p in points], np.array([p.vector for p in points], dtype=np.float32)
+
+
+def parity_check(embed_model, vector_store=None, sample=64):
+    """
+    Re-embeds a sample of stored chunks with embed_model and reports cosine agreement
+    with the fp32 vectors already in the text index (1.0 = identical direction).
+    On the mmap backend the stored side carries its own float16/int8 rounding.
+    """
+    from llama_index.core.schema import MetadataMode
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+    from vector_backend import open_vector_store, close_vector_store
+
+    own_store = vector_store is None
+    vector_store = vector_store or open_vector_store()
+    try:
+        payloads, stored = _stored_sample(vector_store, sample)
+    finally:
+        if own_store:
+            close_vector_store(vector_store)
+    if not payloads:
+        print("Parity check: index is empty.")
+        return None
+
+    # Re-create exactly the text that was embedded at ingest (content + embed metadata)
+    texts = [metadata_dict_to_node(p).get_content(metadata_mode=MetadataMode.EMBED) for p in payloads]
+    stored = np.array(stored, dtype=np.float32)
+    stored /= np.maximum(np.linalg.norm(stored, axis=1, keepdims=True), 1e-12)
+
+    start = time.perf_counter()
+    fresh = np.array(embed_model.get_text_embedding_batch(texts), dtype=np.float32)
+    elapsed = time.perf_counter() - start
+    fresh /= np.maximum(np.linalg.norm(fresh, axis=1, keepdims=True), 1e-12)
+
+    cosines = (stored * fresh).sum(axis=1)
+    report = {
+        "samples": len(payloads),
+        "cosine_mean": float(cosines.mean()),
+        "cosine_min": float(cosines.min()),
+        "cosine_p5": float(np.percentile(cosines, 5)),
+        "ms_per_chunk": 1000 * elapsed / len(payloads),
+    }
+    print(f"Parity vs stored fp32 vectors: mean {report['cosine_mean']:.4f}, "
+          f"p5 {report['cosine_p5']:.4f}, min {report['cosine_min']:.4f} "
+          f"({report['ms_per_chunk']:.1f} ms/chunk over {report['samples']} chunks)")
+    return report
+
+
+if __name__ == "__main__":
+    # Export (if needed) and compare the selected backend against the stored fp32 vectors
+    parity_check(load_embed_model(EMBED_BACKEND if EMBED_BACKEND != "torch" else "onnx"))
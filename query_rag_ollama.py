@@ -1,54 +1,321 @@
-import qdrant_client
-from llama_index.core import VectorStoreIndex, Settings
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.vector_stores.qdrant import QdrantVectorStore
-from llama_index.llms.ollama import Ollama
+import os
+import time
+import argparse
+import threading
+from contextlib import contextmanager
+# Light imports only: heavy stacks (llama_index, torch, qdrant) load in build_query_engine()
+from table_fact_store import TableFactStore, FACTS_DB
+from article_router import load_router, article_index_path
+from search_scope import detect_scope, scope_filters
+from deadline_answer import answer_with_deadline, ANSWER_BUDGET_S
+
+# Written by Vision_RAG_Pipeline/step04_table_embedder.py
+VISION_QDRANT_PATH = os.path.join("Vision_RAG_Pipeline", "qdrant_vision_db")
+VISION_COLLECTION_NAME = "vision_tables"
+# User confirmed model: qwen3:8b
+LLM_MODEL = "qwen3:8b"
+# Context tokens handed to the LLM per question; prompt eval time grows with this
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("HR_CONTEXT_TOKENS", "1500"))
+# Cross-encoder rerank stage; set HR_RERANK_MODEL="" to go straight from retrieval to the packer
+RERANK_MODEL = os.environ.get("HR_RERANK_MODEL", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANK_TOP_N = int(os.environ.get("HR_RERANK_TOP_N", "3"))
+# Direct article/chapter references: "direct" prints the article text as-is when the
+# question only asks for it, "llm" always answers with that article as the only context.
+# Questions about an article ("does Article 12 apply to contractors?") always take the llm path
+ARTICLE_MODE = os.environ.get("HR_ARTICLE_MODE", "direct")
+
+
+def source_filters(question):
+    """
+    FanOutRetriever scope_fn: when the question names a table, chapter or article, text
+    chunks are filtered on it. Vision table summaries only carry type/page, so they stay
+    unfiltered for a tables-only scope and are skipped for anything narrower.
+    """
+    scope = detect_scope(question)
+    if not scope:
+        return {}
+    filters = {"text": scope_filters(scope)}
+    if set(scope) != {"type"}:
+        filters["tables"] = None
+    return filters
+
+
+class StartupTimer:
+    """Wall-clock breakdown of startup phases (phases may overlap across threads)."""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.phases.append((name, start - self.t0, end - start))
+
+    def report(self):
+        lines = ["Startup timing (start offset / duration):"]
+        for name, offset, duration in sorted(self.phases, key=lambda p: p[1]):
+            lines.append(f"  {name:<28} +{offset:6.2f}s  {duration:6.2f}s")
+        lines.append(f"  {'elapsed since start':<28} {time.perf_counter() - self.t0:14.2f}s")
+        return "\n".join(lines)
+
+
+def build_query_engine(timer=None, model_name=LLM_MODEL, index_version=None):
+    """
+    Imports the heavy stacks and builds the retrieval/generation pipeline.
+    Returns a dict with the engine and its stages (used by the CLI and batch tools).
+    index_version pins the text index to one build instead of following indexes/CURRENT.
+    """
+    timer = timer or StartupTimer()
+
+    with timer.phase("import llama_index"):
+        import qdrant_client
+        from llama_index.core import Settings
+        from llama_index.core.query_engine import RetrieverQueryEngine
+        from ollama_llm import SharedOllamaLLM
+        from fanout_retriever import FanOutRetriever, vision_table_source
+        from vector_backend import VECTOR_BACKEND
+        from index_versions import VersionedTextSource
+        from context_packer import TokenBudgetPacker
+        from cross_encoder_rerank import CrossEncoderRerank
+        from precompute_qa import load_qa_index
 
-def query_rag_with_ollama():
     # 1. Setup Encoding (BGE-M3)
-    print("Initializing BGE-M3 Embedding Model...")
-    embed_model = HuggingFaceEmbedding(model_name="BAAI/bge-m3", device="cpu") # Force CPU to avoid VRAM conflicts if small GPU
-    Settings.embed_model = embed_model
-    
+    # HR_EMBED_BACKEND=onnx|torch-int8 selects an int8 CPU encoder (see quantized_embedding.py)
+    with timer.phase("load embedding model"):
+        from quantized_embedding import EMBED_BACKEND
+        from model_registry import get_query_embed_model
+        print(f"Initializing BGE-M3 Embedding Model (backend: {EMBED_BACKEND})...")
+        embed_model = get_query_embed_model() # CPU to avoid VRAM conflicts if small GPU
+        Settings.embed_model = embed_model
+
     # 2. Setup Ollama (The Brain)
-    # User confirmed model: qwen3:8b
-    model_name = "qwen3:8b" 
-    print(f"Initializing Ollama ({model_name})...")
-    llm = Ollama(model=model_name, request_timeout=360.0)
+    # Shared client: pooled connections, model pinned with keep_alive, bounded deadline per answer
+    llm = SharedOllamaLLM(model=model_name, timeout=180.0)
     Settings.llm = llm
 
-    # 3. Connect to Local Qdrant
-    print("Connecting to Database...")
-    client = qdrant_client.QdrantClient(path="./qdrant_db")
-    vector_store = QdrantVectorStore(client=client, collection_name="hr_law_collection")
-    
-    # 4. Load Index & Create Query Engine
-    index = VectorStoreIndex.from_vector_store(vector_store=vector_store)
-    
-    # Create the engine
-    # similarity_top_k=5: Gives the LLM 5 pieces of evidence (tables/articles) to read before answering
-    query_engine = index.as_query_engine(similarity_top_k=5)
-    
+    # 3. Connect to the text index (Qdrant or mmap backend) + vision table summaries
+    # The text index follows indexes/CURRENT, so a promoted build is picked up without a restart
+    with timer.phase("open vector stores"):
+        print(f"Connecting to Database (backend: {VECTOR_BACKEND})...")
+        text_source = VersionedTextSource(version=index_version)
+        sources = {"text": text_source.as_source()}
+
+        if os.path.exists(VISION_QDRANT_PATH):
+            vision_client = qdrant_client.QdrantClient(path=VISION_QDRANT_PATH)
+            sources["tables"] = vision_table_source(vision_client, VISION_COLLECTION_NAME)
+        else:
+            print(f"Vision table index not found at {VISION_QDRANT_PATH}, searching text only.")
+
+    # 4. Create Query Engine
+    # One query embedding, both stores searched in parallel, merged by reciprocal-rank fusion.
+    # Questions naming a table/chapter/article search only that part of the index (source_filters).
+    # Without reranking: top_k=8 candidates (at most 2 vision table summaries); the packer keeps
+    # only what fits the token budget and is close in score to the best hit.
+    # With reranking: a wider, cheap pool of 16 is re-scored by the cross-encoder and only
+    # the best RERANK_TOP_N reach the packer (rerank scores are probabilities, so no score gap).
+    postprocessors = []
+    if RERANK_MODEL:
+        with timer.phase("load reranker"):
+            retriever = FanOutRetriever(sources, top_k=16, per_source_k=16, quotas={"text": 16, "tables": 4},
+                                        scope_fn=source_filters)
+            reranker = CrossEncoderRerank(model=RERANK_MODEL, top_n=RERANK_TOP_N)
+            reranker.load()
+            postprocessors.append(reranker)
+            packer = TokenBudgetPacker(token_budget=CONTEXT_TOKEN_BUDGET, max_score_gap=1.0)
+    else:
+        reranker = None
+        retriever = FanOutRetriever(sources, top_k=8, quotas={"text": 8, "tables": 2}, scope_fn=source_filters)
+        packer = TokenBudgetPacker(token_budget=CONTEXT_TOKEN_BUDGET)
+    postprocessors.append(packer)
+    query_engine = RetrieverQueryEngine.from_args(retriever, llm=llm, node_postprocessors=postprocessors)
+
+    # 5. Precomputed Q&A (precompute_qa.py): a close match to a stored question skips generation
+    qa_index = load_qa_index(index_version)
+    if qa_index is not None:
+        print(f"Precomputed Q&A index loaded ({len(qa_index.store)} questions).")
+
+    return {
+        "engine": query_engine,
+        "retriever": retriever,
+        "postprocessors": postprocessors,
+        "reranker": reranker,
+        "packer": packer,
+        "embed_model": embed_model,
+        "llm": llm,
+        "qa_index": qa_index,
+    }
+
+
+class BackgroundLoader:
+    """
+    Builds the query engine and warms up the Ollama model on background threads
+    while the prompt is already accepting input.
+    """
+    def __init__(self, timer, model_name=LLM_MODEL, index_version=None):
+        self.timer = timer
+        self.model_name = model_name
+        self.index_version = index_version
+        self.rag = None
+        self.error = None
+        self._ready = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._build, daemon=True).start()
+        threading.Thread(target=self._warmup, daemon=True).start()
+        return self
+
+    def _build(self):
+        try:
+            self.rag = build_query_engine(self.timer, self.model_name, self.index_version)
+        except Exception as e:
+            self.error = e
+        finally:
+            self._ready.set()
+
+    def _warmup(self):
+        # Loading qwen3:8b into Ollama overlaps with the embedding model load
+        try:
+            with self.timer.phase("ollama warmup"):
+                from ollama_client import get_client
+                get_client().warmup(self.model_name)
+        except Exception as e:
+            print(f"\nWarning: Ollama warmup failed ({e}); the first answer will load the model.")
+
+    def get(self):
+        if not self._ready.is_set():
+            print("(Still loading models, your question will be answered as soon as they are ready...)")
+        self._ready.wait()
+        if self.error is not None:
+            raise RuntimeError(f"Query engine failed to load: {self.error}")
+        return self.rag
+
+
+def find_direct_answer(query_text, router, facts, routed=None):
+    """
+    Deterministic fast paths: an article/chapter reference or an exact table fact.
+    Returns {path, answer, source} or None when the question needs retrieval.
+    A caller that already routed the question passes routed (and no router).
+    """
+    routed = router.route(query_text) if router else routed
+    if routed and routed["display"]:
+        return {"path": routed["kind"], "answer": routed["text"], "source": routed["title"]}
+    fact = facts.lookup(query_text) if facts else None
+    if fact:
+        return {"path": "table_fact", "answer": fact["answer"], "source": fact["citation"]}
+    return None
+
+
+def answer_direct(query_text, router, facts, loader):
+    """Article references and table facts: answered without retrieval or (by default) the LLM."""
+    routed = router.route(query_text) if router else None
+    if routed and routed["kind"] == "article" and (ARTICLE_MODE == "llm" or not routed["display"]):
+        from llama_index.core.schema import NodeWithScore, TextNode, QueryBundle
+        rag = loader.get()
+        print("Thinking (article context only)...")
+        node = NodeWithScore(node=TextNode(text=routed["text"]), score=1.0)
+        response = rag["engine"].synthesize(QueryBundle(query_text), [node])
+        print("\n--- Answer ---")
+        print(response)
+        print(f"Source: {routed['title']}")
+        return True
+
+    direct = find_direct_answer(query_text, None, facts, routed=routed)
+    if direct is None:
+        return False
+    if direct["path"] == "table_fact":
+        print("\n--- Answer (table lookup) ---")
+        print(direct["answer"])
+        print(f"Source: {direct['source']}")
+    else:
+        print(f"\n--- {direct['source']} ---")
+        print(direct["answer"])
+    return True
+
+
+def query_rag_with_ollama(index_version=None):
+    timer = StartupTimer()
+    loader = BackgroundLoader(timer, index_version=index_version).start()
+
+    # Structured table facts (built by table_fact_store.py) and the article/chapter index
+    # (written by chunk_process.load_and_chunk) are cheap, so they answer while models load
+    with timer.phase("load fact/article indexes"):
+        facts = TableFactStore(FACTS_DB) if os.path.exists(FACTS_DB) else None
+        router = load_router(article_index_path(index_version) if index_version else None)
+
     print("\n" + "="*50)
-    print(f"RAG System Ready! (Using {model_name})")
-    print("Ask about HR laws, benefits tables, grades, etc.")
+    print(f"RAG System Starting (Using {LLM_MODEL}) - models load in the background")
+    print("Ask about HR laws, benefits tables, grades, etc. Type 'timing' for the startup report.")
     print("="*50)
 
     while True:
         query_text = input("\nQuestion [q to quit]: ")
         if query_text.lower() == 'q':
             break
-            
+        if query_text.lower() == 'timing':
+            print(timer.report())
+            continue
+
+        # A failed model/index load only disables answers that need it; direct answers keep working
+        try:
+            if answer_direct(query_text, router, facts, loader):
+                continue
+            rag = loader.get()
+        except RuntimeError as e:
+            print(f"\nError: {e}")
+            continue
+        # One embedding serves both the precomputed question lookup and retrieval
+        embedding = rag["embed_model"].get_query_embedding(query_text)
+        qa = rag["qa_index"].lookup(embedding, query_text) if rag["qa_index"] else None
+        if qa:
+            print(f"\n--- Answer (precomputed, matched \"{qa['question']}\", similarity {qa['score']:.2f}) ---")
+            print(qa["answer"])
+            print(f"Source: {qa['source']}")
+            continue
+
         print("Thinking...")
-        response = query_engine.query(query_text)
-        
-        print("\n--- Answer ---")
-        print(response)
-        
+        # Within the latency budgets (HR_TTFT_BUDGET / HR_ANSWER_BUDGET) or an extractive fallback
+        fallback = False
+        if ANSWER_BUDGET_S > 0:
+            result = answer_with_deadline(rag, query_text, embedding=embedding)
+            fallback = result["fallback"]
+            print("\n--- Answer ---")
+            print(result["answer"])
+            if not fallback and result["sources"]:
+                print(f"Sources: {'; '.join(result['sources'])}")
+        else:
+            from llama_index.core.schema import QueryBundle
+            response = rag["engine"].query(QueryBundle(query_text, embedding=embedding))
+            print("\n--- Answer ---")
+            print(response)
+
+        reranker, packer = rag["reranker"], rag["packer"]
+        if reranker is not None and reranker.last_report:
+            rr = reranker.last_report
+            print(f"\n(rerank: {rr['kept']}/{rr['candidates']} candidates in {rr['rerank_ms']:.0f} ms)")
+
+        packed = packer.last_report
+        if packed:
+            print(f"\n(context: {packed['kept']}/{packed['candidates']} chunks, "
+                  f"{packed['trimmed']} trimmed, ~{packed['context_tokens']} tokens)")
+
+        stats = rag["llm"].client.metrics.last()
+        if stats and not fallback:
+            print(f"\n(load {stats['load_s']:.2f}s | prompt eval {stats['prompt_eval_s']:.2f}s "
+                  f"for {stats['prompt_tokens']} tokens | {stats['eval_tokens_per_s']:.1f} tok/s)")
+
         # Verify Sources (Optional - good for debugging)
         # print("\n(Sources used:)")
         # for node in response.source_nodes:
         #     print(f"- Score {node.score:.2f}: {node.node.get_content()[:50]}...")
 
 if __name__ == "__main__":
-    query_rag_with_ollama()
+    parser = argparse.ArgumentParser(description="Interactive HR law questions over the local RAG index.")
+    parser.add_argument("--version", default=None, help="index version to query (default: follow the promoted one)")
+    args = parser.parse_args()
+    query_rag_with_ollama(args.version)
@@ -0,0 +1,126 @@
+import os
+import json
+import time
+import numpy as np
+
+PREFILTER_DIRNAME = "prefilter"
+
+
+def fit_projection(vectors, dim, method="pca"):
+    """
+    Fits a projection from the full BGE-M3 space down to `dim` dimensions.
+    method="pca": top principal components of the stored vectors.
+    method="truncate": keep the first `dim` coordinates (no fitting, weaker for BGE-M3).
+    Returns (mean, components) with components of shape (dim, full_dim).
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    full_dim = vectors.shape[1]
+    if dim >= full_dim:
+        raise ValueError(f"Reduced dim {dim} must be smaller than the full dim {full_dim}")
+
+    if method == "truncate":
+        return np.zeros(full_dim, dtype=np.float32), np.eye(dim, full_dim, dtype=np.float32)
+    if method != "pca":
+        raise ValueError(f"Unknown projection method '{method}'")
+
+    mean = vectors.mean(axis=0)
+    # SVD of the centered data; rows of vt are the principal directions
+    _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+    components = vt[:dim]
+    if components.shape[0] < dim:
+        # Fewer vectors than requested dims: pad so the shapes stay fixed
+        pad = np.zeros((dim - components.shape[0], full_dim), dtype=np.float32)
+        components = np.vstack([components, pad])
+    return mean.astype(np.float32), components.astype(np.float32)
+
+
+def project(vectors, mean, components):
+    reduced = (np.asarray(vectors, dtype=np.float32) - mean) @ components.T
+    norms = np.linalg.norm(reduced, axis=-1, keepdims=True)
+    return reduced / np.maximum(norms, 1e-12)
+
+
+class ReducedPrefilter:
+    """
+    First retrieval stage: a reduced-dimension float16 copy of the index that is
+    cheap to scan. It only nominates candidates; the caller re-scores them with
+    the full vectors.
+    """
+    def __init__(self, mean, components, reduced, method):
+        self.mean = mean
+        self.components = components
+        self.reduced = reduced
+        self.method = method
+
+    @property
+    def dim(self):
+        return self.components.shape[0]
+
+    @classmethod
+    def build(cls, vectors, dim=256, method="pca"):
+        mean, components = fit_projection(vectors, dim, method)
+        reduced = project(vectors, mean, components).astype(np.float16)
+        return cls(mean, components, reduced, method)
+
+    def candidates(self, query, n):
+        """Row indices of the n best rows in reduced space (unordered)."""
+        q = project(query, self.mean, self.components)
+        scores = np.asarray(self.reduced, dtype=np.float32) @ q
+        n = min(n, len(scores))
+        return np.argpartition(-scores, n - 1)[:n]
+
+    def save(self, index_dir):
+        out = os.path.join(index_dir, PREFILTER_DIRNAME)
+        os.makedirs(out, exist_ok=True)
+        np.savez(os.path.join(out, "projection.npz"), mean=self.mean, components=self.components)
+        np.save(os.path.join(out, "reduced.npy"), self.reduced)
+        with open(os.path.join(out, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "method": self.method, "count": len(self.reduced)}, f)
+
+    @classmethod
+    def load(cls, index_dir, expected_count=None):
+        """Returns None when no prefilter exists or it was built for a different index."""
+        out = os.path.join(index_dir, PREFILTER_DIRNAME)
+        if not os.path.exists(os.path.join(out, "meta.json")):
+            return None
+        with open(os.path.join(out, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if expected_count is not None and meta["count"] != expected_count:
+            print(f"Prefilter at {out} is stale ({meta['count']} rows vs {expected_count}); ignoring it.")
+            return None
+        projection = np.load(os.path.join(out, "projection.npz"))
+        reduced = np.load(os.path.join(out, "reduced.npy"), mmap_mode="r")
+        return cls(projection["mean"], projection["components"], reduced, meta["method"])
+
+
+def measure_recall(store, queries, k=5, candidates=(20, 50, 100)):
+    """
+    Recall@k of two-stage search against full search on the same MmapVectorStore,
+    for several candidate-set sizes. `queries` is an array of query embeddings.
+    """
+    from llama_index.core.vector_stores import VectorStoreQuery
+
+    original = store.prefilter_candidates
+    report = {"k": k, "queries": len(queries), "by_candidates": {}}
+    try:
+        store.prefilter_candidates = 0
+        start = time.perf_counter()
+        exact = [set(store.query(VectorStoreQuery(query_embedding=list(q), similarity_top_k=k)).ids)
+                 for q in queries]
+        report["full_ms_per_query"] = 1000 * (time.perf_counter() - start) / max(len(queries), 1)
+
+        for n in candidates:
+            store.prefilter_candidates = n
+            start = time.perf_counter()
+            hits = 0
+            for q, truth in zip(queries, exact):
+                found = set(store.query(VectorStoreQuery(query_embedding=list(q), similarity_top_k=k)).ids)
+                hits += len(found & truth)
+            elapsed = time.perf_counter() - start
+            report["by_candidates"][n] = {
+                "recall": hits / max(sum(len(t) for t in exact), 1),
+                "ms_per_query": 1000 * elapsed / max(len(queries), 1),
+            }
+    finally:
+        store.prefilter_candidates = original
+    return report
@@ -0,0 +1,34 @@
+import re
+from arabic_normalize import normalize_arabic
+from article_router import detect_reference
+
+# Questions about a table ("جدول الدرجات", "allowance table") search table chunks only
+TABLE_WORDS = re.compile(r"جدول|جداول|\btables?\b")
+
+
+def detect_scope(question):
+    """
+    The part of the corpus a question names, as metadata field -> value (see
+    chunk_process.LOCATION_METADATA_KEYS): {"type": "table"}, {"articles": 45},
+    {"chapter": "2-1"} or {"bab": 2} for a whole chapter, or None when it names none.
+    """
+    scope = {}
+    if TABLE_WORDS.search(normalize_arabic(question)):
+        scope["type"] = "table"
+
+    reference = detect_reference(question)
+    if reference:
+        kind, key = reference
+        if kind == "article":
+            scope["articles"] = int(key.split()[0])
+        elif key.endswith("-0"):
+            scope["bab"] = int(key.split("-")[0])
+        else:
+            scope["chapter"] = key
+    return scope or None
+
+
+def scope_filters(scope):
+    """llama_index MetadataFilters (all conditions must hold) for a detect_scope() result."""
+    from llama_index.core.vector_stores import MetadataFilters, MetadataFilter
+    return MetadataFilters(filters=[MetadataFilter(key=key, value=value) for key, value in scope.items()])
@@ -0,0 +1,135 @@
+import os
+import time
+import multiprocessing as mp
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+import numpy as np
+
+# Worker processes for sharded ingest: "0" = embed in-process (default), "auto" = one
+# worker per AUTO_THREADS_PER_WORKER cores, or an explicit count
+EMBED_WORKERS = os.environ.get("HR_EMBED_WORKERS", "0")
+AUTO_THREADS_PER_WORKER = 4
+# BGE-M3 dense vector size
+EMBED_DIM = 1024
+# Chunks per task; small shards keep workers evenly busy when chunk lengths vary
+SHARD_SIZE = 64
+
+# Thread pools of torch and the BLAS libraries, sized once when they are first imported
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# Per-process state, set by _init_worker
+_worker = {}
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def resolve_workers(workers=None):
+    """Number of worker processes for a workers setting ("auto", "0", 4, ...)."""
+    workers = EMBED_WORKERS if workers is None else workers
+    if str(workers).lower() == "auto":
+        return max(1, available_cores() // AUTO_THREADS_PER_WORKER)
+    return int(workers)
+
+
+@contextmanager
+def _worker_thread_caps(threads):
+    """
+    Sets the thread caps in the parent's environment while workers are started. A spawned
+    worker imports numpy (this module, the parent's main module) before any initializer
+    runs, so the caps must already be in the environment it starts with.
+    """
+    saved = {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+    os.environ.update({var: str(threads) for var in THREAD_ENV_VARS})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def _init_worker(shm_name, n_rows, dim, threads):
+    from multiprocessing import util
+    from model_registry import get_embed_model
+
+    # fp32 torch like in-process ingest, whatever HR_EMBED_BACKEND selects for queries
+    _worker["model"] = get_embed_model(backend="torch", device="cpu", num_threads=threads)
+    _worker["shm"] = shared_memory.SharedMemory(name=shm_name)
+    _worker["out"] = np.ndarray((n_rows, dim), dtype=np.float32, buffer=_worker["shm"].buf)
+    # Detach at worker exit; the parent unlinks the segment
+    util.Finalize(None, _close_worker, exitpriority=10)
+
+
+def _close_worker():
+    _worker.pop("out", None)
+    shm = _worker.pop("shm", None)
+    if shm is not None:
+        shm.close()
+
+
+def _embed_shard(task):
+    start, texts = task
+    vectors = np.asarray(_worker["model"].get_text_embedding_batch(texts), dtype=np.float32)
+    # Each shard owns a disjoint row range, so writes need no locking
+    _worker["out"][start:start + len(texts)] = vectors
+    return len(texts)
+
+
+def embed_texts_sharded(texts, workers, shard_size=SHARD_SIZE, dim=EMBED_DIM):
+    """
+    Embeds texts across `workers` processes, each with its own BGE-M3 instance and
+    cores // workers threads. Vectors are written straight into a shared-memory
+    array at their input position, so the result order is deterministic.
+    Returns a float32 array of shape (len(texts), dim).
+    """
+    if not texts:
+        return np.zeros((0, dim), dtype=np.float32)
+    threads = max(1, available_cores() // workers)
+    shm = shared_memory.SharedMemory(create=True, size=len(texts) * dim * 4)
+    try:
+        tasks = [(start, texts[start:start + shard_size]) for start in range(0, len(texts), shard_size)]
+        print(f"Sharded embedding: {len(texts)} chunks, {workers} workers x {threads} threads, "
+              f"{len(tasks)} shards")
+
+        # spawn: forking a process that already imported torch is not safe
+        ctx = mp.get_context("spawn")
+        start_time = time.perf_counter()
+        # N workers x `threads` each, so they don't oversubscribe the cores
+        with _worker_thread_caps(threads), \
+                ctx.Pool(workers, initializer=_init_worker, initargs=(shm.name, len(texts), dim, threads)) as pool:
+            done = 0
+            for count in pool.imap_unordered(_embed_shard, tasks):
+                done += count
+                print(f"  {done}/{len(texts)} chunks embedded", end="\r")
+            # Let workers exit normally (runs _close_worker) instead of being terminated
+            pool.close()
+            pool.join()
+        elapsed = time.perf_counter() - start_time
+        print(f"\nEmbedded {len(texts)} chunks in {elapsed:.1f}s "
+              f"({len(texts) / elapsed if elapsed else 0.0:.1f} chunks/sec, including model load)")
+
+        return np.ndarray((len(texts), dim), dtype=np.float32, buffer=shm.buf).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def embed_nodes_sharded(nodes, workers):
+    """
+    Sets node.embedding for every node from a sharded run. VectorStoreIndex skips
+    nodes that already carry an embedding, so indexing then only upserts.
+    """
+    from llama_index.core.schema import MetadataMode
+
+    # Same text the in-process path embeds: content plus embed-visible metadata
+    texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+    vectors = embed_texts_sharded(texts, workers)
+    for node, vector in zip(nodes, vectors):
+        node.embedding = vector.tolist()
+    return nodes
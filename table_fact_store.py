@@ -0,0 +1,282 @@
+import os
+import re
+import json
+import sqlite3
+import time
+from arabic_normalize import compact, char_ngrams, normalize_arabic, normalize_digits
+
+TABLES_JSON = "extracted_tables.json"
+FACTS_DB = "table_facts.sqlite"
+
+# Minimum share of a column header's character trigrams that must appear in the question
+MIN_HEADER_SCORE = 0.6
+# The best cell must beat every competing fact (other row/column, same or another table) by this much
+MIN_SCORE_MARGIN = 0.15
+MAX_HEADER_ROWS = 3
+# Answer cells: an amount with an optional unit, or a few words of clean Arabic
+VALUE_UNITS = {"درهم", "دراهم", "سنه", "سنوات", "سنتان", "سنتين", "شهر", "اشهر", "شهرا", "يوم", "يوما", "ايام",
+               "ساعه", "ساعات", "اسبوع", "اسابيع"}
+NUMERIC_VALUE = re.compile(r"^\(?\d[\d,.]*\)?\s*%?(?:\s+(\w+))?$")
+MAX_TEXT_VALUE_WORDS = 4
+MAX_TEXT_VALUE_CHARS = 40
+# Grade rows are labelled with ordinals ("الخامسة"); "للدرجة 5" names the same row
+GRADE_NUMBER = re.compile(r"درجه\s*(?:رقم\s*)?\(?(\d+)|\bgrade\s*(\d+)")
+GRADE_ORDINAL_KEYS = {1: "اولي", 2: "ثانيه", 3: "ثالثه", 4: "رابعه", 5: "خامسه", 6: "سادسه", 7: "سابعه",
+                      8: "ثامنه", 9: "تاسعه", 10: "عاشره", 11: "حاديهعشره", 12: "ثانيهعشره",
+                      13: "ثالثهعشره", 14: "رابعهعشره"}
+# PDF lam-alef glitches in header/label text: "ا ألساسي" -> "الأساسي", "ا النتقال" -> "الانتقال"
+SPLIT_LAM_ALEF = re.compile(r"(?<!\S)ا ([أإا])ل")
+
+SCHEMA = """
+CREATE TABLE tables (
+    id INTEGER PRIMARY KEY,
+    page INTEGER,
+    table_index INTEGER,
+    header_rows INTEGER,
+    n_rows INTEGER,
+    n_cols INTEGER
+);
+CREATE TABLE cells (
+    table_id INTEGER,
+    row INTEGER,
+    col INTEGER,
+    row_label TEXT,
+    row_key TEXT,
+    col_header TEXT,
+    col_key TEXT,
+    value TEXT,
+    value_key TEXT
+);
+CREATE INDEX idx_cells_row_key ON cells(row_key);
+CREATE INDEX idx_cells_value_key ON cells(value_key);
+CREATE INDEX idx_cells_table_row ON cells(table_id, row);
+"""
+
+
+def _clean(cell):
+    return re.sub(r"\s*\n\s*", " ", str(cell or "")).strip()
+
+
+def clean_label(text):
+    """Display form of a header or row label: replacement/private-use characters and split lam-alef fixed."""
+    text = re.sub("[\ufffd\ue000-\uf8ff]", "", text)
+    text = SPLIT_LAM_ALEF.sub(r"ال\1", text)
+    return re.sub(r"\s+", " ", text).strip(" \u064b")
+
+
+def _is_value(cell):
+    """Amount/count-like cell: "55,000 درهم", "(12)", "8 سنوات", "50%"."""
+    return bool(re.match(r"^\W*\d", normalize_digits(cell)))
+
+
+def _looks_reversed(word):
+    """pdfplumber sometimes emits RTL words back to front: "مهرد", "ةوالع", "ىس..قأ"."""
+    return word[0] in "ةى" or (len(word) > 3 and word.endswith("لا"))
+
+
+def is_answer_value(value):
+    """
+    Cell fit to be printed as an answer: an amount ("13,875", "(12)", "50%", "6 سنوات")
+    or a short clean phrase ("إنذار كتابي"). Rejects merged-cell dumps, replacement
+    characters and reversed text.
+    """
+    if not value or "\ufffd" in value:
+        return False
+    text = normalize_arabic(value)
+    match = NUMERIC_VALUE.match(text)
+    if match:
+        return match.group(1) is None or match.group(1) in VALUE_UNITS
+    words = text.split()
+    if len(words) > MAX_TEXT_VALUE_WORDS or len(text) > MAX_TEXT_VALUE_CHARS:
+        return False
+    letters = [c for c in text if not c.isspace()]
+    arabic = [c for c in letters if "\u0621" <= c <= "\u064a"]
+    # Reversal shows in the raw letters (normalize_arabic folds ة and ى)
+    return len(arabic) >= 0.8 * len(letters) and not any(_looks_reversed(w) for w in value.split())
+
+
+def label_keys(label):
+    """
+    Match keys for a row label: one per alternative ("المدير العام / مدير الدائرة"),
+    without the leading article so "للرئيس" still matches "الرئيس".
+    """
+    keys = set()
+    for part in re.split(r"/|،|\sأ ?و\s", label):
+        key = compact(part)
+        if key.startswith("ال") and len(key) > 4:
+            key = key[2:]
+        if len(key) >= 3 or key.isdigit():
+            keys.add(key)
+    return keys
+
+
+def detect_header_rows(rows):
+    """
+    Leading rows without amount-like cells are headers; the first row holding a
+    value ("55,000 درهم", "(12)") starts the data. Capped at MAX_HEADER_ROWS.
+    """
+    count = 0
+    for row in rows[:MAX_HEADER_ROWS]:
+        if any(_is_value(c) for c in row if c):
+            break
+        count += 1
+    if count >= len(rows):
+        # All-text table (e.g. penalties): treat only the first row as header
+        count = 1 if len(rows) > 1 else 0
+    return count
+
+
+def column_headers(header_rows, n_cols):
+    """
+    Joins stacked header rows per column. Columns were reversed for RTL display in
+    extract_tables_final, so a merged header cell sits at the right end of its span:
+    empty header cells inherit from their right-hand neighbour.
+    """
+    headers = [[] for _ in range(n_cols)]
+    for row in header_rows:
+        filled = list(row) + [""] * (n_cols - len(row))
+        for col in range(n_cols - 2, -1, -1):
+            if not filled[col]:
+                filled[col] = filled[col + 1]
+        for col, cell in enumerate(filled):
+            if cell and cell not in headers[col]:
+                headers[col].append(cell)
+    return [" / ".join(parts) for parts in headers]
+
+
+def build_fact_store(json_path=TABLES_JSON, db_path=FACTS_DB):
+    """Loads extract_tables_final's JSON output into an indexed SQLite fact store."""
+    print(f"Building table fact store from {json_path}...")
+    start = time.perf_counter()
+
+    with open(json_path, "r", encoding="utf-8") as f:
+        tables = json.load(f)
+
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+
+    cell_count = 0
+    for table_id, table in enumerate(tables):
+        rows = [[_clean(c) for c in row] for row in table["data"]]
+        if not rows:
+            continue
+        n_cols = max(len(r) for r in rows)
+        header_count = detect_header_rows(rows)
+        headers = [clean_label(h) for h in column_headers(rows[:header_count], n_cols)]
+
+        conn.execute("INSERT INTO tables VALUES (?, ?, ?, ?, ?, ?)",
+                     (table_id, table["page"], table["table_index"], header_count, len(rows), n_cols))
+
+        label = ""
+        for r, row in enumerate(rows[header_count:], start=header_count):
+            # Row label: first text cell (the rightmost column in the original layout);
+            # empty labels continue the previous row (vertically merged cells)
+            row_label = next((c for c in row if c and not _is_value(c)), "")
+            if row_label:
+                label = clean_label(row_label)
+            records = []
+            for col, value in enumerate(row):
+                if not value or value == row_label:
+                    continue
+                header = headers[col] if col < len(headers) else ""
+                records.append((table_id, r, col, label, compact(label), header, compact(header),
+                                value, compact(value)))
+            conn.executemany("INSERT INTO cells VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", records)
+            cell_count += len(records)
+
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+    print(f"Fact store saved to '{db_path}': {len(tables)} tables, {cell_count} cells "
+          f"in {time.perf_counter() - start:.2f}s")
+
+
+class TableFactStore:
+    """
+    Answers exact-fact questions (row label + column header present in the question)
+    straight from the SQLite store, without retrieval or generation.
+    """
+    def __init__(self, db_path=FACTS_DB):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        # Row labels are few; keep their match keys in memory for substring matching
+        self.row_keys = {}
+        for table_id, row, row_label in self.conn.execute(
+                "SELECT DISTINCT table_id, row, row_label FROM cells WHERE row_key != ''"):
+            for key in label_keys(row_label):
+                self.row_keys.setdefault(key, []).append((table_id, row))
+
+    def lookup(self, question):
+        """
+        Returns {answer, citation, ...} for the one cell the question clearly points at,
+        or None. A competing fact (another row or column, in this or another table) within
+        MIN_SCORE_MARGIN of the best makes the question ambiguous, and so does one fact with
+        different values in different schedules; both fall through to retrieval.
+        """
+        q_key = compact(question)
+        q_grams = char_ngrams(question)
+        numbers = set(re.findall(r"\d+", normalize_digits(question)))
+        for match in GRADE_NUMBER.finditer(normalize_arabic(question)):
+            ordinal = GRADE_ORDINAL_KEYS.get(int(match.group(1) or match.group(2)))
+            if ordinal:
+                q_key += ordinal
+
+        # 1. Row labels named in the question; a key that only opens a longer matched label is
+        # not a match of its own ("الثانية" of "الثانية عشرة")
+        matched = [key for key in self.row_keys
+                   if key in numbers or (not key.isdigit() and key in q_key)]
+        matched = [key for key in matched if not any(key != other and other.startswith(key) for other in matched)]
+
+        # 2. Score every answerable cell of those rows by its column header
+        cells = {}
+        for row_key in matched:
+            for table_id, row in self.row_keys[row_key]:
+                for col, row_label, col_header, value in self.conn.execute(
+                        "SELECT col, row_label, col_header, value FROM cells WHERE table_id = ? AND row = ?",
+                        (table_id, row)):
+                    header_grams = char_ngrams(col_header)
+                    if not header_grams or not is_answer_value(value):
+                        continue
+                    score = len(header_grams & q_grams) / len(header_grams)
+                    if score >= MIN_HEADER_SCORE:
+                        cells[(table_id, row, col)] = (score, table_id, row_label, col_header, value)
+        if not cells:
+            return None
+
+        # 3. One fact = (row label, column header); it may repeat across schedules
+        facts = {}
+        for cell in cells.values():
+            facts.setdefault((compact(cell[2]), compact(cell[3])), []).append(cell)
+        ranked = sorted(facts.values(), key=lambda found: max(c[0] for c in found), reverse=True)
+        score = max(c[0] for c in ranked[0])
+        if len(ranked) > 1 and max(c[0] for c in ranked[1]) > score - MIN_SCORE_MARGIN:
+            return None
+
+        # The same row/column with different values in several schedules (e.g. basic salary
+        # per grading system) cannot be answered without knowing which schedule is meant
+        found = sorted(ranked[0], key=lambda c: c[1])
+        if len({compact(c[4]) for c in found}) > 1:
+            return None
+        _, table_id, row_label, col_header, value = found[0]
+        page, table_index = self._table(table_id)
+        answer = f"{row_label} | {col_header}: {value}"
+        return {
+            "answer": answer,
+            "citation": f"Table {table_index} on page {page} ({TABLES_JSON})",
+            "page": page,
+            "table_index": table_index,
+            "row_label": row_label,
+            "column": col_header,
+            "value": value,
+            "score": score,
+        }
+
+    def _table(self, table_id):
+        return self.conn.execute("SELECT page, table_index FROM tables WHERE id = ?", (table_id,)).fetchone()
+
+
+if __name__ == "__main__":
+    build_fact_store()
@@ -0,0 +1,72 @@
+import os
+import json
+import pytest
+from conftest import ROOT
+from article_router import ArticleRouter, article_index_path, build_article_index, detect_reference, is_display_request
+
+
+@pytest.fixture(scope="module")
+def index():
+    with open(os.path.join(ROOT, "sharjah_hr_law 8_marker.md"), "r", encoding="utf-8") as f:
+        return build_article_index([f.read()])
+
+
+@pytest.fixture(scope="module")
+def router(index, tmp_path_factory):
+    path = tmp_path_factory.mktemp("articles") / "article_index.json"
+    path.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    return ArticleRouter(str(path))
+
+
+def test_every_article_heading_is_found(index):
+    numbers = {article["number"] for article in index["articles"].values()}
+    # Articles 95 and 110 have no heading in the Marker output
+    assert set(range(1, 129)) - numbers == {95, 110}
+    assert "40 مكرر" in index["articles"] and "104 مكرر" in index["articles"]
+
+
+def test_cross_reference_is_not_a_heading(index):
+    # "... بالمادة (110) من هذه اللائحة" in Article 52 must not start an article
+    assert "110" not in index["articles"]
+    assert "المادة (53)" in index["articles"]["53"]["title"]
+
+
+def test_article_74_heading_with_subtitle(index):
+    assert index["articles"]["74"]["title"].startswith("الإجازات الاستثنائية المادة (74)")
+
+
+@pytest.mark.parametrize("question, reference", [
+    ("ما نص المادة ١٢؟", ("article", "12")),
+    ("What does Article 45 say?", ("article", "45")),
+    ("المادة (40) مكرر", ("article", "40 مكرر")),
+    ("ما هي مواد الباب الثاني", ("chapter", "2-0")),
+])
+def test_detect_reference(question, reference):
+    assert detect_reference(question) == reference
+
+
+@pytest.mark.parametrize("question, display", [
+    ("ما نص المادة 12؟", True),
+    ("show article 12", True),
+    ("هل تنطبق المادة 12 على المتعاقدين؟", False),
+    ("كم مدة الإجازة في المادة 65", False),
+])
+def test_display_request(question, display):
+    assert is_display_request(question) == display
+
+
+def test_route_marks_questions_about_an_article(router):
+    assert router.route("ما نص المادة 12؟")["display"] is True
+    assert router.route("هل تنطبق المادة 12 على المتعاقدين؟")["display"] is False
+
+
+def test_article_index_path_follows_the_promoted_version(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert article_index_path() == "article_index.json"
+    os.makedirs(os.path.join("indexes", "v1"))
+    (tmp_path / "indexes" / "CURRENT").write_text("v1\n")
+    # A version built before the article index was kept in it falls back to the root file
+    assert article_index_path() == "article_index.json"
+    (tmp_path / "indexes" / "v1" / "article_index.json").write_text("{}")
+    assert article_index_path() == os.path.join("indexes", "v1", "article_index.json")
+    assert article_index_path("v2") == os.path.join("indexes", "v2", "article_index.json")
@@ -0,0 +1,28 @@
+from dedup_chunks import dedup_nodes
+
+BOILERPLATE = "حكومة الشارقة - دائرة الموارد البشرية - اللائحة التنفيذية لقانون الموارد البشرية رقم 12 لسنة 2021"
+
+
+class FakeNode:
+    def __init__(self, text, **metadata):
+        self.text = text
+        self.metadata = dict(metadata, type="text")
+        self.excluded_embed_metadata_keys = []
+        self.excluded_llm_metadata_keys = []
+
+
+def test_merged_duplicates_keep_every_article(tmp_path):
+    nodes = [FakeNode(BOILERPLATE, articles=[12], page=4),
+             FakeNode("نص مختلف تماما عن الإجازات السنوية وبدل السكن للموظفين"),
+             FakeNode(BOILERPLATE + " ", articles=[45, 12], page=20)]
+    kept = dedup_nodes(nodes, report_path=str(tmp_path / "dedup_report.json"))
+    assert len(kept) == 2
+    assert kept[0].metadata["articles"] == [12, 45]
+    assert kept[0].metadata["duplicate_count"] == 2
+    assert kept[0].metadata["page"] == 4
+
+
+def test_unmerged_nodes_are_untouched(tmp_path):
+    nodes = [FakeNode(BOILERPLATE, articles=[3]), FakeNode("نص مختلف تماما عن الإجازات السنوية وبدل السكن")]
+    kept = dedup_nodes(nodes, report_path=str(tmp_path / "dedup_report.json"))
+    assert [node.metadata.get("articles") for node in kept] == [[3], None]
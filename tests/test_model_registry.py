@@ -0,0 +1,38 @@
+from model_registry import ModelRegistry
+
+
+def make_registry():
+    registry = ModelRegistry(idle_unload_s=0)
+    registry.register("fake", lambda size: object())
+    return registry
+
+
+def test_idle_unload_skips_models_from_get():
+    registry = make_registry()
+    registry.get("fake", size=1)
+    assert registry.unload(idle_for=0) == []
+    assert registry.unload() == ["fake"]
+
+
+def test_idle_unload_drops_released_use():
+    registry = make_registry()
+    with registry.use("fake", size=1):
+        assert registry.unload(idle_for=0) == []
+    assert registry.unload(idle_for=0) == ["fake"]
+
+
+def test_find_reuses_loaded_model_without_loading():
+    registry = make_registry()
+    assert registry.find("fake", size=1) is None
+    model = registry.get("fake", size=1)
+    assert registry.find("fake", size=1) is model
+    assert registry.find("fake") is model
+    assert registry.find("fake", size=2) is None
+
+
+def test_get_pins_a_model_leased_before():
+    registry = make_registry()
+    with registry.use("fake", size=1):
+        pass
+    registry.get("fake", size=1)
+    assert registry.unload(idle_for=0) == []
@@ -0,0 +1,46 @@
+import time
+import threading
+from mock_ollama_server import start_mock_server
+from ollama_client import OllamaClient, StreamCancel
+
+
+def test_cancel_drops_connection_while_waiting_for_first_token():
+    # ~5s of prompt eval: the TTFT budget below runs out long before the first token
+    server, url = start_mock_server(load_time=0.0, prompt_eval_rate=100.0, response_tokens=5, jitter=0.0)
+    client = OllamaClient(host=url, retries=0)
+    cancel = StreamCancel()
+    chunks, finished = [], threading.Event()
+
+    def generate():
+        for chunk in client.generate_stream("mock", "x" * 2000, timeout=60.0, cancel_event=cancel):
+            chunks.append(chunk)
+        finished.set()
+
+    try:
+        threading.Thread(target=generate, daemon=True).start()
+        time.sleep(0.5)  # TTFT budget missed
+        cancelled_at = time.perf_counter()
+        cancel.set()
+
+        assert finished.wait(1.0), "stream kept waiting after cancel"
+        deadline = time.perf_counter() + 2.0
+        while not server.RequestHandlerClass.sim.aborted and time.perf_counter() < deadline:
+            time.sleep(0.05)
+        aborted = server.RequestHandlerClass.sim.aborted
+        assert aborted and aborted[0] - cancelled_at < 1.0
+        assert chunks == []
+    finally:
+        client.close()
+        server.shutdown()
+
+
+def test_stream_completes_without_cancel():
+    server, url = start_mock_server(load_time=0.0, eval_rate=200.0, response_tokens=5, jitter=0.0)
+    client = OllamaClient(host=url, retries=0)
+    try:
+        chunks = list(client.generate_stream("mock", "hello", timeout=10.0, cancel_event=StreamCancel()))
+        assert chunks[-1]["done"]
+        assert len(chunks) == 6
+    finally:
+        client.close()
+        server.shutdown()
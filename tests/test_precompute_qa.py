@@ -0,0 +1,22 @@
+import pytest
+from precompute_qa import question_anchors
+
+
+@pytest.mark.parametrize("first, second", [
+    ("كم بدل السكن للدرجة الثالثة؟", "ما بدل السكن للدرجة الرابعة"),
+    ("ما نص المادة 12؟", "ما نص المادة 13؟"),
+    ("راتب الدرجة الثانية عشرة", "راتب الدرجة الثانية"),
+    ("كم يوم إجازة الحج؟", "كم يوم إجازة الحج للدرجة 5؟"),
+])
+def test_different_numbers_do_not_match(first, second):
+    assert question_anchors(first) != question_anchors(second)
+
+
+@pytest.mark.parametrize("first, second", [
+    ("كم بدل السكن للدرجة الثالثة؟", "ما هو بدل السكن للدرجة 3"),
+    ("راتب الدرجة الحادية عشرة", "راتب الدرجة ١١"),
+    ("ما نص المادة ١٢", "ماذا تقول المادة (12)؟"),
+    ("كم يوم إجازة الحج؟", "ما مدة إجازة الحج"),
+])
+def test_paraphrases_match(first, second):
+    assert question_anchors(first) == question_anchors(second)
@@ -0,0 +1,23 @@
+import os
+import multiprocessing as mp
+import sharded_embed
+from sharded_embed import embed_texts_sharded, _worker_thread_caps, THREAD_ENV_VARS
+
+
+def _thread_env():
+    return {var: os.environ.get(var) for var in THREAD_ENV_VARS}
+
+
+def test_spawned_workers_start_with_thread_caps():
+    before = _thread_env()
+    with _worker_thread_caps(3), mp.get_context("spawn").Pool(1) as pool:
+        env = pool.apply(_thread_env)
+    assert env == {var: "3" for var in THREAD_ENV_VARS}
+    assert _thread_env() == before
+
+
+def test_no_texts_starts_no_workers(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("worker pool started")
+    monkeypatch.setattr(sharded_embed.mp, "get_context", no_pool)
+    assert embed_texts_sharded([], workers=2).shape == (0, sharded_embed.EMBED_DIM)
@@ -0,0 +1,75 @@
+import os
+import pytest
+from conftest import ROOT
+from table_fact_store import TableFactStore, build_fact_store, clean_label, is_answer_value
+
+
+@pytest.fixture(scope="module")
+def facts(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp("facts") / "table_facts.sqlite")
+    build_fact_store(os.path.join(ROOT, "extracted_tables.json"), db_path)
+    return TableFactStore(db_path)
+
+
+def test_conflicting_schedules_are_not_answered(facts):
+    # Grade 5 basic salary is 13,875 (page 92), 6,749 (pages 93, 100) or 28,500 (page 94)
+    # depending on the grading system; the question does not say which
+    assert facts.lookup("ما هو الراتب الأساسي للدرجة الخامسة") is None
+    assert facts.lookup("الراتب الاساسي للدرجة 5") is None
+
+
+def test_digit_grade_matches_ordinal_row(facts):
+    fact = facts.lookup("كم الراتب الأساسي للدرجة 12")
+    assert fact is not None
+    assert fact["value"] == "2,104"
+    assert fact["row_label"] == "الثانية عشرة"
+
+
+def test_stored_headers_are_cleaned(facts):
+    fact = facts.lookup("كم الراتب الأساسي للدرجة الثانية عشرة")
+    assert fact["column"] == "الراتب الأساسي"
+    assert "\ufffd" not in fact["answer"]
+
+
+def test_garbled_housing_allowance_cell_is_not_an_answer(facts):
+    # Grade 1's housing allowance cell on page 93 is a merged, reversed-text dump
+    assert facts.lookup("كم بدل السكن للدرجة الأولى؟") is None
+
+
+def test_no_answer_from_another_table_or_column(facts):
+    # The minimum stay for grade 3 is a merged (empty) cell; "minimum work experience"
+    # on page 101 must not stand in for it
+    assert facts.lookup("ما هو الحد الأدنى للبقاء في الدرجة الثالثة") is None
+
+
+def test_two_rows_named_is_ambiguous(facts):
+    assert facts.lookup("الراتب الأساسي للدرجة الخامسة والسادسة") is None
+
+
+def test_longer_row_label_wins_over_its_prefix(facts):
+    fact = facts.lookup("كم الراتب الأساسي للدرجة الثانية عشرة")
+    assert fact is not None
+    assert fact["value"] == "2,104"
+
+
+@pytest.mark.parametrize("value, ok", [
+    ("13,875", True),
+    ("(12)", True),
+    ("6 سنوات", True),
+    ("50%", True),
+    ("إنذار كتابي", True),
+    ("066 مهرد", False),
+    ("ةوالع ةوالع", False),
+    ("بزعألل جوزتملل\n04% 06%\nدحب دحب", False),
+])
+def test_answer_values(value, ok):
+    assert is_answer_value(value) is ok
+
+
+@pytest.mark.parametrize("raw, clean", [
+    ("الراتب ا ألسا\ufffdسي", "الراتب الأساسي"),
+    ("بدل ا النتقال", "بدل الانتقال"),
+    ("ً الحد ا ألق\ufffdصى للراتب الشامل شهريا", "الحد الأقصى للراتب الشامل شهريا"),
+])
+def test_clean_label(raw, clean):
+    assert clean_label(raw) == clean
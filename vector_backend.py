@@ -0,0 +1,149 @@
+import os
+
+# Which store holds the text index: "qdrant" (local-mode Qdrant, ./qdrant_db)
+# or "mmap" (MmapVectorStore, shareable read-only across query processes)
+VECTOR_BACKEND = os.environ.get("HR_VECTOR_BACKEND", "qdrant")
+# Storage precision for the mmap backend: "float16" or "int8"
+VECTOR_DTYPE = os.environ.get("HR_VECTOR_DTYPE", "float16")
+# Two-stage search (mmap only): reduced dims fitted at ingest (0 = off) and
+# how many candidates the reduced stage hands to full-vector re-scoring
+PREFILTER_DIM = int(os.environ.get("HR_PREFILTER_DIM", "0"))
+PREFILTER_CANDIDATES = int(os.environ.get("HR_PREFILTER_CANDIDATES", "100"))
+
+QDRANT_PATH = "./qdrant_db"
+MMAP_PATH = "./mmap_index"
+COLLECTION_NAME = "hr_law_collection"
+
+# Payload fields filtered on at query time (see search_scope.py); Qdrant indexes them so
+# filtered searches skip non-matching points before scoring
+PAYLOAD_INDEXES = {
+    "type": "keyword",
+    "doc_id": "keyword",
+    "chapter": "keyword",
+    "bab": "integer",
+    "articles": "integer",
+    "page": "integer",
+}
+
+# Versioned builds (index_versions.py): indexes/<version>/<backend>/, with the live
+# version named in indexes/CURRENT. Without a CURRENT pointer the paths above are used.
+INDEXES_DIR = "indexes"
+CURRENT_POINTER = os.path.join(INDEXES_DIR, "CURRENT")
+
+
+def current_version():
+    """Name of the promoted index version, or None when versioned builds are not in use."""
+    try:
+        with open(CURRENT_POINTER, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_store_path(version, backend=None):
+    return os.path.join(INDEXES_DIR, version, backend or VECTOR_BACKEND)
+
+
+def active_store_path(backend=None):
+    """Store directory queries should read: the promoted version if any, else the legacy path."""
+    backend = backend or VECTOR_BACKEND
+    version = current_version()
+    if version:
+        path = version_store_path(version, backend)
+        if os.path.isdir(path):
+            return path
+        print(f"Warning: version '{version}' has no {backend} index, using the default path.")
+    return MMAP_PATH if backend == "mmap" else QDRANT_PATH
+
+
+def writable_store_path(path=None, backend=None):
+    """
+    Store directory an ingest may write to: path, else the legacy path. Once a version is
+    promoted its store is read-only (query processes hold it open); writers must build a
+    new version instead (index_versions.build_version / fork_version).
+    """
+    backend = backend or VECTOR_BACKEND
+    version = current_version()
+    live = version_store_path(version, backend) if version else None
+    path = path or live or (MMAP_PATH if backend == "mmap" else QDRANT_PATH)
+    if live and os.path.abspath(path) == os.path.abspath(live):
+        raise RuntimeError(f"'{path}' is the live index version '{version}'; build a new version instead "
+                           f"(python index_versions.py build)")
+    return path
+
+
+def open_vector_store(backend=None, path=None, collection_name=COLLECTION_NAME, dtype=None, write=False):
+    """
+    Returns the llama_index vector store for the text index.
+    Both backends plug into VectorStoreIndex / FanOutRetriever the same way.
+    Readers default to the promoted version; write=True is for ingest (see writable_store_path).
+    """
+    backend = backend or VECTOR_BACKEND
+    path = writable_store_path(path, backend) if write else path or active_store_path(backend)
+
+    if backend == "qdrant":
+        import qdrant_client
+        from llama_index.vector_stores.qdrant import QdrantVectorStore
+        client = qdrant_client.QdrantClient(path=path)
+        return QdrantVectorStore(client=client, collection_name=collection_name)
+
+    if backend == "mmap":
+        from mmap_vector_store import MmapVectorStore
+        return MmapVectorStore(persist_dir=path, dtype=dtype or VECTOR_DTYPE,
+                               prefilter_candidates=PREFILTER_CANDIDATES if PREFILTER_DIM else 0)
+
+    raise ValueError(f"Unknown vector backend '{backend}' (expected 'qdrant' or 'mmap')")
+
+
+def close_vector_store(vector_store):
+    """Releases the store; local-mode Qdrant keeps its folder locked until the client closes."""
+    client = getattr(vector_store, "client", None)
+    if client is not None and hasattr(client, "close"):
+        client.close()
+
+
+def ensure_payload_indexes(client, collection_name, fields=None):
+    """Creates the Qdrant payload indexes that are missing (local mode accepts but does not need them)."""
+    from qdrant_client.http import models
+    schema = {"keyword": models.PayloadSchemaType.KEYWORD, "integer": models.PayloadSchemaType.INTEGER}
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field, kind in (fields or PAYLOAD_INDEXES).items():
+        if field not in existing:
+            client.create_payload_index(collection_name=collection_name, field_name=field,
+                                        field_schema=schema[kind])
+
+
+def finalize_vector_store(vector_store, golden_path=None):
+    """
+    Flush anything the backend buffers in memory after indexing. For Qdrant this
+    creates the payload indexes used by filtered search.
+    For the mmap backend with HR_PREFILTER_DIM set, also fits the reduced projection
+    and reports two-stage recall against full search for the golden-set questions.
+    """
+    if not hasattr(vector_store, "persist_dir"):
+        client = getattr(vector_store, "client", None)
+        if client is not None and client.collection_exists(vector_store.collection_name):
+            ensure_payload_indexes(client, vector_store.collection_name)
+        return
+    vector_store.persist()
+
+    if PREFILTER_DIM:
+        from reduced_prefilter import measure_recall
+        from benchmark_retrieval import load_golden_set, GOLDEN_SET_PATH
+        from model_registry import get_query_embed_model
+
+        vector_store.build_prefilter(dim=PREFILTER_DIM)
+        golden_path = golden_path or GOLDEN_SET_PATH
+        if not os.path.exists(golden_path):
+            print(f"No golden set at {golden_path}; two-stage recall not measured.")
+            return
+        # Real questions through the query-time encoder: stored chunk vectors would find
+        # themselves top-1 in both stages and inflate the recall
+        questions = [item["question"] for item in load_golden_set(golden_path)]
+        queries = get_query_embed_model().get_text_embedding_batch(questions)
+        candidates = sorted({PREFILTER_CANDIDATES // 2, PREFILTER_CANDIDATES, PREFILTER_CANDIDATES * 2})
+        report = measure_recall(vector_store, queries, k=5, candidates=candidates)
+        print(f"Two-stage recall@{report['k']} vs full search over {report['queries']} golden-set questions "
+              f"(full: {report['full_ms_per_query']:.2f} ms/query):")
+        for n, stats in report["by_candidates"].items():
+            print(f"  candidates={n}: recall {stats['recall']:.3f}, {stats['ms_per_query']:.2f} ms/query")